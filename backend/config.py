@@ -21,10 +21,43 @@ class Config:
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
     OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "300"))
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # How long Ollama keeps the model loaded
+    OLLAMA_AUTO_PULL = os.getenv("OLLAMA_AUTO_PULL", "True").lower() == "true"  # Pull mistral:7b if Ollama has no models
+    OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))  # Keep-alive connections in the shared pool
+    
+    # Inference Scheduler Settings
+    OLLAMA_SLOTS = int(os.getenv("OLLAMA_SLOTS", "1"))  # Concurrent generations sent to Ollama
+    LOCAL_LLM_SLOTS = int(os.getenv("LOCAL_LLM_SLOTS", "1"))  # llama-cpp model is not re-entrant
+    LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+    LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "300"))
+    
+    # Backend Routing Settings
+    LLM_HEALTH_CHECK_INTERVAL = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL", "15"))  # seconds
+    LLM_ROUTER_EWMA_ALPHA = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.3"))
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "3"))
+    LLM_BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30"))  # seconds
+    
+    # Local llama-cpp Settings
+    LLM_PREFIX_CACHE_BYTES = int(os.getenv("LLM_PREFIX_CACHE_BYTES", str(1024 * 1024 * 1024)))  # 1GB of saved KV states, 0 disables
+    LLM_USE_MMAP = os.getenv("LLM_USE_MMAP", "True").lower() == "true"  # Map GGUF weights instead of reading them into RAM
+    LLM_USE_MLOCK = os.getenv("LLM_USE_MLOCK", "False").lower() == "true"  # Pin weights in RAM (prevents swapping)
+    
+    # Model Memory Settings
+    MODEL_RAM_BUDGET_MB = int(os.getenv("MODEL_RAM_BUDGET_MB", "0"))  # 0 = unlimited
+    MODEL_IDLE_CHECK_INTERVAL = float(os.getenv("MODEL_IDLE_CHECK_INTERVAL", "30"))  # seconds
+    LLM_IDLE_TIMEOUT = float(os.getenv("LLM_IDLE_TIMEOUT", "0"))  # seconds unused before unloading, 0 = never
+    EMBEDDER_IDLE_TIMEOUT = float(os.getenv("EMBEDDER_IDLE_TIMEOUT", "0"))
+    WHISPER_IDLE_TIMEOUT = float(os.getenv("WHISPER_IDLE_TIMEOUT", "300"))
     
     # Embedding Settings
-    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
-    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")  # Ollama model for the "ollama" backend
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fp32")  # fp32, int8 (dynamically quantized, CPU) or ollama
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # torch intra-op threads, 0 = torch default
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # max texts per micro-batch
+    EMBEDDING_BATCH_RETRIES = int(os.getenv("EMBEDDING_BATCH_RETRIES", "2"))  # retries per ingestion batch
+    EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))  # how long a micro-batch waits for company
+    EMBEDDING_CACHE_MEMORY_BYTES = int(os.getenv("EMBEDDING_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))  # in-memory LRU budget
+    EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "True").lower() == "true"  # also keep vectors in SQLite
     
     # Data Directory (Windows-compatible)
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,6 +66,22 @@ class Config:
     # Database Settings
     DB_PATH = os.getenv("DB_PATH", os.path.join(DRAVIS_DATA_DIR, "dravis.db"))
     CHROMA_PATH = os.getenv("CHROMA_PATH", os.path.join(DRAVIS_DATA_DIR, "chroma_db"))
+    HNSW_SPACE = os.getenv("HNSW_SPACE", "l2")  # l2, ip or cosine (Chroma collections only)
+    HNSW_M = int(os.getenv("HNSW_M", "16"))  # graph links per node: recall and memory go up with it
+    HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))  # build-time candidate list
+    HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "10"))  # query-time candidate list: recall vs latency
+    HNSW_REBUILD_ON_START = os.getenv("HNSW_REBUILD_ON_START", "False").lower() == "true"  # rebuild when build settings changed
+    CHROMA_SHARD_PER_DOCUMENT = os.getenv("CHROMA_SHARD_PER_DOCUMENT", "False").lower() == "true"  # one collection per document
+    VECTOR_STORE_QUERY_WORKERS = int(os.getenv("VECTOR_STORE_QUERY_WORKERS", "4"))  # threads for fanning a query out to shards
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")  # chroma or segments (backend/rag/rag_store.py)
+    VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(DRAVIS_DATA_DIR, "vector_store"))
+    VECTOR_STORE_MAX_SEGMENTS = int(os.getenv("VECTOR_STORE_MAX_SEGMENTS", "16"))  # more triggers a merge of the smaller half
+    VECTOR_STORE_COMPACT_DELETED_RATIO = float(os.getenv("VECTOR_STORE_COMPACT_DELETED_RATIO", "0.3"))  # rewrite segments this deleted
+    VECTOR_STORE_QUANTIZATION = os.getenv("VECTOR_STORE_QUANTIZATION", "none")  # none, int8 (4x smaller) or pq (16x); both backends
+    VECTOR_STORE_CODES_PATH = os.getenv("VECTOR_STORE_CODES_PATH", os.path.join(DRAVIS_DATA_DIR, "vector_codes"))  # chroma backend's compressed tier
+    VECTOR_STORE_RERANK_FACTOR = int(os.getenv("VECTOR_STORE_RERANK_FACTOR", "8"))  # top_k x this re-ranked at full precision
+    VECTOR_STORE_PQ_SUBSPACES = int(os.getenv("VECTOR_STORE_PQ_SUBSPACES", "0"))  # bytes per vector with pq, 0 = dim / 4
+    VECTOR_STORE_PQ_MIN_ROWS = int(os.getenv("VECTOR_STORE_PQ_MIN_ROWS", "2048"))  # smaller segments use int8 until merged
     
     # Document Settings
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(DRAVIS_DATA_DIR, "uploads"))
@@ -51,6 +100,28 @@ class Config:
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
     TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "5"))
     SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.5"))
+    RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+    LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "True").lower() == "true"  # SQLite FTS5 over chunk text
+    LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "3"))  # keyword queries this short skip the embedder
+    RRF_K = int(os.getenv("RRF_K", "60"))  # reciprocal-rank fusion constant for vector + lexical results
+    
+    # Response Cache Settings
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+    RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))  # 0 disables semantic matching
+    
+    # Question Bank Settings
+    QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "True").lower() == "true"
+    QUESTION_BANK_TARGET = int(os.getenv("QUESTION_BANK_TARGET", "5"))  # questions per page, difficulty and quiz type
+    QUESTION_BANK_BATCH = int(os.getenv("QUESTION_BANK_BATCH", "5"))  # questions per background generation
+    QUESTION_BANK_IDLE_INTERVAL = float(os.getenv("QUESTION_BANK_IDLE_INTERVAL", "10"))  # seconds between idle checks
+    QUESTION_BANK_DIFFICULTIES = os.getenv("QUESTION_BANK_DIFFICULTIES", "medium,easy,hard").split(",")
+    
+    # Answer Grading Settings
+    GRADER_ACCEPT_SIMILARITY = float(os.getenv("GRADER_ACCEPT_SIMILARITY", "0.85"))  # at or above: correct
+    GRADER_REJECT_SIMILARITY = float(os.getenv("GRADER_REJECT_SIMILARITY", "0.6"))  # below: incorrect; in between: LLM decides
+    GRADER_FUZZY_RATIO = float(os.getenv("GRADER_FUZZY_RATIO", "0.9"))  # character similarity accepted as a typo
+    GRADER_USE_LLM = os.getenv("GRADER_USE_LLM", "True").lower() == "true"
     
     # Logging Settings
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -1,16 +1,62 @@
 """ChromaDB vector store wrapper for document embeddings"""
 import os
+import hashlib
+import heapq
 import logging
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Sequence, Union
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 
+from .document_catalog import DocumentCatalog
+from .lexical_index import LexicalIndex, hybrid_retrieve
+from .retrieval_cache import RetrievalCache
+
 logger = logging.getLogger(__name__)
 
+# HNSW settings fixed when the index is built; changing them needs a rebuild
+HNSW_BUILD_KEYS = ("hnsw:space", "hnsw:M", "hnsw:construction_ef")
+
+REBUILD_SUFFIX = "_rebuild"
+
+
+def hnsw_metadata(space: str = "l2", m: int = 16, construction_ef: int = 100, search_ef: int = 10) -> Dict:
+    """Collection metadata carrying HNSW settings (the defaults are Chroma's own)"""
+    return {
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef
+    }
+
 
 class ChromaStore:
-    def __init__(self, collection_name: str = "documents", persist_directory: str = None):
+    def __init__(
+        self,
+        collection_name: str = "documents",
+        persist_directory: str = None,
+        catalog: Optional[DocumentCatalog] = None,
+        retrieval_cache: Optional[RetrievalCache] = None,
+        hnsw: Optional[Dict] = None,
+        rebuild_on_mismatch: bool = False,
+        shard_per_document: bool = False,
+        query_workers: int = 4,
+        lexical_index: Optional[LexicalIndex] = None,
+        rrf_k: int = 60,
+        compressed=None
+    ):
         self.collection_name = collection_name
+        self.catalog = catalog
+        self.retrieval_cache = retrieval_cache
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        # Optional CompressedTier (backend/rag/quantization.py) that answers vector queries from int8/pq codes
+        self.compressed = compressed
+        self.hnsw = hnsw or hnsw_metadata()
+        self.shard_per_document = shard_per_document
+        self._shards: Dict[str, object] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, query_workers), thread_name_prefix="shard-query")
         self.persist_directory = persist_directory or "./chroma_db"
         os.makedirs(self.persist_directory, exist_ok=True)
         
@@ -20,24 +66,154 @@ class ChromaStore:
             settings=Settings(anonymized_telemetry=False)
         )
         
+        self._recover_rebuilds()
+        
         # Get or create collection
         try:
             self.collection = self.client.get_collection(name=collection_name)
             logger.info(f"Loaded existing collection: {collection_name}")
         except:
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                metadata={"description": "DRAVIS document embeddings"}
+            self.collection = self._create_collection(collection_name)
+            logger.info(f"Created new collection: {collection_name} ({self.hnsw})")
+        
+        # Per-document shards are found by their metadata, whatever the current mode
+        # (chunks stored in the shared collection before sharding stay searchable too)
+        for collection in self.client.list_collections():
+            metadata = collection.metadata or {}
+            if metadata.get("shard_of") == collection_name and metadata.get("document_id"):
+                self._shards[metadata["document_id"]] = collection
+        if self._shards:
+            logger.info(f"Loaded {len(self._shards)} document shards")
+        
+        self._apply_hnsw_settings(rebuild_on_mismatch)
+        
+        if self.catalog is not None:
+            self.backfill_catalog()
+        if self.lexical_index is not None:
+            self.backfill_lexical_index()
+        if self.compressed is not None:
+            self.sync_compressed()
+    
+    def _create_collection(self, name: str, metadata: Optional[Dict] = None):
+        return self.client.create_collection(
+            name=name,
+            metadata={"description": "DRAVIS document embeddings", **(metadata or {}), **self.hnsw}
+        )
+    
+    def _recover_rebuilds(self):
+        """Finish rebuilds interrupted after the old collection was dropped; discard the rest"""
+        names = {c.name for c in self.client.list_collections()}
+        for name in names:
+            if not name.endswith(REBUILD_SUFFIX):
+                continue
+            original = name[:-len(REBUILD_SUFFIX)]
+            if original in names:
+                self.client.delete_collection(name=name)
+            else:
+                self.client.get_collection(name=name).modify(name=original)
+                logger.warning(f"Recovered collection {original} from an interrupted rebuild")
+    
+    def _all_collections(self) -> List:
+        return [self.collection, *list(self._shards.values())]
+    
+    def _apply_hnsw_settings(self, rebuild_on_mismatch: bool):
+        """Bring existing collections in line with the configured HNSW settings"""
+        stale = set()
+        for collection in self._all_collections():
+            current = collection.metadata or {}
+            stale.update(k for k in HNSW_BUILD_KEYS if current.get(k, hnsw_metadata()[k]) != self.hnsw[k])
+        if stale:
+            if rebuild_on_mismatch:
+                self.rebuild_collection()
+                return
+            logger.warning(
+                f"Collection {self.collection_name} was built with different {', '.join(sorted(stale))}; "
+                "set HNSW_REBUILD_ON_START=true (or call rebuild_collection) to apply them"
             )
-            logger.info(f"Created new collection: {collection_name}")
+        
+        # search_ef is read when the index is loaded, so it can change in place. chromadb
+        # rejects metadata naming hnsw:space here, and leaving it out resets it to l2.
+        for collection in self._all_collections():
+            current = collection.metadata or {}
+            if current.get("hnsw:search_ef") == self.hnsw["hnsw:search_ef"]:
+                continue
+            if current.get("hnsw:space", "l2") != "l2":
+                logger.warning("hnsw:search_ef of a non-l2 collection can only change through rebuild_collection")
+                continue
+            try:
+                metadata = {k: v for k, v in current.items() if k != "hnsw:space"}
+                metadata["hnsw:search_ef"] = self.hnsw["hnsw:search_ef"]
+                collection.modify(metadata=metadata)
+            except Exception as e:
+                logger.warning(f"Could not update hnsw:search_ef: {e}")
+    
+    def rebuild_collection(self, batch_size: int = 1000):
+        """
+        Copy every chunk into new collections built with the configured HNSW
+        settings (the shared collection and every shard), swapping each in
+        under its original name.
+        """
+        self.collection = self._rebuild(self.collection, batch_size)
+        for document_id, shard in list(self._shards.items()):
+            self._shards[document_id] = self._rebuild(shard, batch_size)
+        self._collection_changed()
+    
+    def _rebuild(self, collection, batch_size: int):
+        name = collection.name
+        rebuild_name = f"{name}{REBUILD_SUFFIX}"
+        try:
+            self.client.delete_collection(name=rebuild_name)
+        except Exception:
+            pass
+        extra = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+        target = self._create_collection(rebuild_name, extra)
+        
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            if batch['ids']:
+                target.add(
+                    ids=batch['ids'],
+                    embeddings=batch['embeddings'],
+                    documents=batch['documents'],
+                    metadatas=batch['metadatas']
+                )
+        
+        self.client.delete_collection(name=name)
+        target.modify(name=name)
+        logger.info(f"Rebuilt collection {name} with {total} chunks ({self.hnsw})")
+        return target
+    
+    def _shard_name(self, document_id: str) -> str:
+        # Chroma names allow only [a-zA-Z0-9._-] (3-63 chars), so hash the id
+        return f"{self.collection_name}-{hashlib.sha1(document_id.encode('utf-8')).hexdigest()[:24]}"
+    
+    def _collection_for(self, document_id: str):
+        """Collection that stores (or will store) a document's chunks"""
+        shard = self._shards.get(document_id)
+        if shard is not None or not self.shard_per_document:
+            return shard or self.collection
+        shard = self._create_collection(
+            self._shard_name(document_id),
+            {"shard_of": self.collection_name, "document_id": document_id}
+        )
+        self._shards[document_id] = shard
+        return shard
     
     def add_document_chunks(
         self,
         document_id: str,
         document_name: str,
         chunks: List[tuple],
-        embeddings: List[List[float]],
-        upload_time: str = None
+        embeddings: Union[np.ndarray, Sequence[np.ndarray]],
+        upload_time: str = None,
+        byte_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        file_path: Optional[str] = None
     ):
         """
         Add document chunks to the vector store.
@@ -46,10 +222,11 @@ class ChromaStore:
             document_id: Unique identifier for the document
             document_name: Original filename
             chunks: List of (chunk_text, metadata_dict) tuples
-            embeddings: List of embedding vectors (one per chunk)
+            embeddings: (n, dim) float32 matrix or sequence of vectors (one per chunk)
             upload_time: ISO format timestamp
+            byte_size, content_hash, file_path: Source file details for the document catalog
         """
-        if not chunks or not embeddings:
+        if not chunks or embeddings is None or len(embeddings) == 0:
             logger.warning(f"No chunks or embeddings provided for {document_id}")
             return
         
@@ -76,19 +253,36 @@ class ChromaStore:
                 metadata["upload_time"] = upload_time
             metadatas.append(metadata)
         
-        # Add to collection
-        self.collection.add(
+        # Add to collection (chromadb takes nested lists; convert only at this boundary)
+        self._collection_for(document_id).add(
             ids=ids,
             documents=documents,
-            embeddings=embeddings,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
             metadatas=metadatas
         )
         
+        if self.lexical_index is not None:
+            self.lexical_index.add_chunks(document_id, list(zip(ids, documents, metadatas)))
+        if self.compressed is not None:
+            self.compressed.add(document_id, ids, embeddings)
+        
+        self._collection_changed()
+        if self.catalog is not None:
+            self.catalog.upsert(
+                document_id,
+                document_name,
+                chunk_count=len(chunks),
+                upload_time=upload_time,
+                byte_size=byte_size,
+                content_hash=content_hash,
+                file_path=file_path
+            )
+        
         logger.info(f"Added {len(chunks)} chunks for document {document_name}")
     
     def query(
         self,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         top_k: int = 5,
         document_filter: Optional[str] = None
     ) -> List[Dict]:
@@ -96,19 +290,64 @@ class ChromaStore:
         Query the vector store for similar chunks.
         
         Args:
-            query_embedding: Query vector
+            query_embedding: Query vector (float32 array)
             top_k: Number of results to return
             document_filter: Optional document_id to filter by
         
         Returns:
             List of result dictionaries with text, metadata, and distance
         """
-        where = None
+        if self.compressed is not None:
+            return self._query_compressed(query_embedding, top_k, document_filter)
+        
+        embedding = [np.asarray(query_embedding, dtype=np.float32).tolist()]
+        
         if document_filter:
-            where = {"document_id": document_filter}
+            shard = self._shards.get(document_filter)
+            if shard is not None:
+                # A document's own shard needs no metadata filter
+                return self._query_collection(shard, embedding, top_k)
+            return self._query_collection(self.collection, embedding, top_k, where={"document_id": document_filter})
         
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
+        if not self._shards:
+            return self._query_collection(self.collection, embedding, top_k)
+        collections = list(self._shards.values())
+        if self.collection.count() > 0:
+            collections.append(self.collection)
+        
+        # Fan out to every shard concurrently, then merge the per-shard top-k lists
+        futures = [self._executor.submit(self._query_collection, c, embedding, top_k) for c in collections]
+        ranked = []
+        for future in futures:
+            try:
+                ranked.extend(future.result())
+            except Exception as e:
+                logger.error(f"Shard query failed: {e}")
+        return heapq.nsmallest(top_k, ranked, key=lambda r: r["distance"] if r["distance"] is not None else float("inf"))
+    
+    def _query_compressed(self, query_embedding: np.ndarray, top_k: int, document_filter: Optional[str]) -> List[Dict]:
+        """Rank chunks by their compressed codes (exact re-rank), then read their text from Chroma"""
+        hits = self.compressed.search(query_embedding, top_k, document_filter)
+        by_document: Dict[str, List[str]] = {}
+        for _, document_id, chunk_id in hits:
+            by_document.setdefault(document_id, []).append(chunk_id)
+        
+        # Text and metadata come from Chroma's metadata store; its HNSW index is not touched
+        stored = {}
+        for document_id, chunk_ids in by_document.items():
+            batch = (self._shards.get(document_id) or self.collection).get(ids=chunk_ids, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(batch['ids'], batch['documents'], batch['metadatas']):
+                stored[chunk_id] = (text, metadata)
+        
+        return [
+            {"id": chunk_id, "text": stored[chunk_id][0], "metadata": stored[chunk_id][1], "distance": distance}
+            for distance, _, chunk_id in hits
+            if chunk_id in stored
+        ]
+    
+    def _query_collection(self, collection, embedding: List[List[float]], top_k: int, where: Optional[Dict] = None) -> List[Dict]:
+        results = collection.query(
+            query_embeddings=embedding,
             n_results=top_k,
             where=where
         )
@@ -126,33 +365,153 @@ class ChromaStore:
         
         return formatted_results
     
+    def query_text(
+        self,
+        query_text: str,
+        embed: Callable[[str], Optional[np.ndarray]],
+        top_k: int = 5,
+        document_filter: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Query by text, serving repeated queries from the retrieval cache.
+        With a lexical index, keyword queries skip `embed` and the rest are
+        hybrid (vector + BM25); `embed` is only called on a cache miss.
+        """
+        version = None
+        if self.retrieval_cache is not None:
+            cached, version = self.retrieval_cache.get(query_text, top_k, document_filter)
+            if cached is not None:
+                return cached
+        
+        results, cacheable = hybrid_retrieve(
+            query_text,
+            embed,
+            self.query,
+            self.lexical_index,
+            top_k=top_k,
+            document_filter=document_filter,
+            rrf_k=self.rrf_k
+        )
+        
+        if cacheable and self.retrieval_cache is not None:
+            self.retrieval_cache.put(query_text, top_k, document_filter, version, results)
+        return results
+    
+    def _collection_changed(self):
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.bump()
+    
     def delete_document(self, document_id: str):
         """Delete all chunks for a specific document"""
         try:
-            # Get all chunks for this document
+            deleted = 0
+            shard = self._shards.pop(document_id, None)
+            if shard is not None:
+                # Sharded: dropping the collection removes the document and its index at once
+                deleted += shard.count()
+                self.client.delete_collection(name=shard.name)
+            
+            # Get all chunk IDs for this document
             results = self.collection.get(
-                where={"document_id": document_id}
+                where={"document_id": document_id},
+                include=[]
             )
-            
             if results['ids']:
                 self.collection.delete(ids=results['ids'])
-                logger.info(f"Deleted {len(results['ids'])} chunks for document {document_id}")
-                return len(results['ids'])
-            return 0
+                deleted += len(results['ids'])
+            
+            if self.lexical_index is not None:
+                self.lexical_index.delete_document(document_id)
+            if self.compressed is not None:
+                self.compressed.delete(document_id)
+            
+            if deleted:
+                self._collection_changed()
+                logger.info(f"Deleted {deleted} chunks for document {document_id}")
+            
+            if self.catalog is not None:
+                self.catalog.remove(document_id)
+            return deleted
         except Exception as e:
             logger.error(f"Error deleting document {document_id}: {e}")
             return 0
     
+    def get_document_chunks(self, document_id: str) -> List[Dict]:
+        """Get all chunks of a document (text and metadata) in chunk order"""
+        try:
+            shard = self._shards.get(document_id)
+            if shard is not None:
+                results = shard.get(include=["documents", "metadatas"])
+            else:
+                results = self.collection.get(
+                    where={"document_id": document_id},
+                    include=["documents", "metadatas"]
+                )
+            chunks = [
+                {"id": chunk_id, "text": text, "metadata": metadata}
+                for chunk_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            ]
+            chunks.sort(key=lambda c: c["metadata"].get("chunk_index", 0))
+            return chunks
+        except Exception as e:
+            logger.error(f"Error getting chunks for document {document_id}: {e}")
+            return []
+    
     def get_document_info(self) -> List[Dict]:
         """Get metadata about all documents in the store"""
+        if self.catalog is not None:
+            try:
+                return self.catalog.list()
+            except Exception as e:
+                logger.error(f"Error reading document catalog: {e}")
+        return self._scan_document_info()
+    
+    def backfill_catalog(self):
+        """Populate the catalog from the collection once (for stores created before the catalog existed)"""
+        if self.catalog.count() > 0 or self.get_collection_size() == 0:
+            return
+        documents = self._scan_document_info()
+        self.catalog.upsert_many(documents)
+        logger.info(f"Backfilled document catalog with {len(documents)} documents")
+    
+    def backfill_lexical_index(self):
+        """Index existing chunk text once (for stores created before the lexical index existed)"""
+        if self.lexical_index.count() > 0 or self.get_collection_size() == 0:
+            return
+        documents = self._scan_document_info()
+        for doc in documents:
+            chunks = self.get_document_chunks(doc["document_id"])
+            self.lexical_index.add_chunks(doc["document_id"], [(c["id"], c["text"], c["metadata"]) for c in chunks])
+        logger.info(f"Backfilled lexical index with {len(documents)} documents")
+    
+    def sync_compressed(self):
+        """Build compressed vectors for documents that lack them and drop those of deleted documents"""
+        stored = {doc["document_id"] for doc in self.get_document_info()}
+        present = set(self.compressed.document_ids())
+        for document_id in present - stored:
+            self.compressed.delete(document_id)
+        for document_id in stored - present:
+            shard = self._shards.get(document_id)
+            if shard is not None:
+                batch = shard.get(include=["embeddings"])
+            else:
+                batch = self.collection.get(where={"document_id": document_id}, include=["embeddings"])
+            if len(batch['ids']):
+                self.compressed.add(document_id, batch['ids'], np.asarray(batch['embeddings'], dtype=np.float32))
+        if stored - present:
+            logger.info(f"Built {self.compressed.mode} codes for {len(stored - present)} documents")
+    
+    def _scan_document_info(self) -> List[Dict]:
+        """Group chunk metadata by document (full collection scan)"""
         try:
-            # Get all documents
-            all_data = self.collection.get()
+            # Metadata only: chunk texts and embeddings are not needed to count chunks
+            metadatas = []
+            for collection in self._all_collections():
+                metadatas.extend(collection.get(include=["metadatas"])['metadatas'])
             
             # Group by document_id
             doc_info = {}
-            for i, doc_id in enumerate(all_data['ids']):
-                metadata = all_data['metadatas'][i]
+            for metadata in metadatas:
                 doc_id_key = metadata.get('document_id', 'unknown')
                 
                 if doc_id_key not in doc_info:
@@ -170,8 +529,8 @@ class ChromaStore:
             return []
     
     def get_collection_size(self) -> int:
-        """Get total number of chunks in the collection"""
+        """Get total number of chunks in the collection (and shards)"""
         try:
-            return self.collection.count()
+            return sum(c.count() for c in self._all_collections())
         except:
             return 0
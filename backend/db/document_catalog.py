@@ -0,0 +1,118 @@
+"""SQLite catalog of stored documents (one row per document, not per chunk)"""
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ["document_id", "document_name", "upload_time", "chunk_count", "byte_size", "content_hash", "file_path"]
+
+
+class DocumentCatalog:
+    """
+    Per-document summary kept in step with the vector store, so listing
+    documents never has to scan the chunk collection.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.init_db()
+
+    def init_db(self):
+        """Initialize the catalog table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS document_catalog (
+                document_id TEXT PRIMARY KEY,
+                document_name TEXT NOT NULL,
+                upload_time TEXT,
+                chunk_count INTEGER NOT NULL DEFAULT 0,
+                byte_size INTEGER,
+                content_hash TEXT,
+                file_path TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_document_catalog_name
+            ON document_catalog (document_name)
+        """)
+        conn.commit()
+        conn.close()
+
+    def upsert(
+        self,
+        document_id: str,
+        document_name: str,
+        chunk_count: int,
+        upload_time: Optional[str] = None,
+        byte_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        file_path: Optional[str] = None
+    ):
+        self.upsert_many([{
+            "document_id": document_id,
+            "document_name": document_name,
+            "upload_time": upload_time,
+            "chunk_count": chunk_count,
+            "byte_size": byte_size,
+            "content_hash": content_hash,
+            "file_path": file_path
+        }])
+
+    def upsert_many(self, documents: Iterable[Dict]):
+        now = time.time()
+        rows = [tuple(d.get(c) for c in _COLUMNS) + (now,) for d in documents]
+        if not rows:
+            return
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany(
+            f"""INSERT OR REPLACE INTO document_catalog ({", ".join(_COLUMNS)}, updated_at)
+                VALUES ({", ".join("?" * (len(_COLUMNS) + 1))})""",
+            rows
+        )
+        conn.commit()
+        conn.close()
+
+    def remove(self, document_id: str):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM document_catalog WHERE document_id = ?", (document_id,))
+        conn.commit()
+        conn.close()
+
+    def get(self, document_id: str) -> Optional[Dict]:
+        rows = self._select("WHERE document_id = ?", (document_id,))
+        return rows[0] if rows else None
+
+    def list(self) -> List[Dict]:
+        return self._select("ORDER BY upload_time")
+
+    def find_by_name(self, document_name: str) -> List[Dict]:
+        return self._select("WHERE document_name = ?", (document_name,))
+
+    def find_by_hash(self, content_hash: str) -> List[Dict]:
+        return self._select("WHERE content_hash = ?", (content_hash,))
+
+    def count(self) -> int:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM document_catalog")
+        total = cursor.fetchone()[0]
+        conn.close()
+        return total
+
+    def _select(self, clause: str = "", params: tuple = ()) -> List[Dict]:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(_COLUMNS)} FROM document_catalog {clause}", params)
+        rows = [dict(zip(_COLUMNS, row)) for row in cursor.fetchall()]
+        conn.close()
+        for row in rows:
+            row["upload_time"] = row["upload_time"] or ""
+        return rows
@@ -0,0 +1,164 @@
+"""Content-addressed embedding cache: in-memory LRU backed by SQLite"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by sha256(model name + full text), so a vector is only
+    ever reused for exactly the same input to the same model.
+
+    Recently used vectors stay in an LRU bounded by `max_bytes`; every vector
+    is also written to SQLite so known text never reaches the model again,
+    even after a restart. Pass `db_path=None` for a memory-only cache.
+    """
+
+    def __init__(self, model_name: str, db_path: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024):
+        self.model_name = model_name
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.db_path:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.init_db()
+
+    def init_db(self):
+        """Initialize the embedding cache table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                content_hash TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look up texts; returns {text: vector} for the ones that are cached"""
+        keys = {self.key(t): t for t in texts}
+        found: Dict[str, np.ndarray] = {}
+        missing = []
+
+        with self._lock:
+            for k, text in keys.items():
+                vector = self._memory.get(k)
+                if vector is not None:
+                    self._memory.move_to_end(k)
+                    found[text] = vector
+                else:
+                    missing.append(k)
+            self.hits += len(found)
+
+        if missing and self.db_path:
+            for k, vector in self._load(missing).items():
+                found[keys[k]] = vector
+                self._remember(k, vector)
+                self.disk_hits += 1
+
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """Store {text: vector} in memory and on disk"""
+        if not items:
+            return
+        rows = []
+        for text, vector in items.items():
+            k = self.key(text)
+            vector = np.asarray(vector, dtype=np.float32)
+            self._remember(k, vector)
+            rows.append((k, self.model_name, vector.tobytes(), time.time()))
+
+        if self.db_path:
+            try:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (content_hash, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                logger.error(f"Embedding cache store failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM embedding_cache WHERE model = ?", (self.model_name,))
+            conn.commit()
+            conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM embedding_cache WHERE model = ?", (self.model_name,))
+            stats["disk_entries"] = cursor.fetchone()[0]
+            conn.close()
+        return stats
+
+    def _remember(self, k: str, vector: np.ndarray):
+        """Add to the in-memory LRU, evicting the least recently used beyond the byte budget"""
+        with self._lock:
+            old = self._memory.pop(k, None)
+            if old is not None:
+                self._memory_bytes -= old.nbytes
+            self._memory[k] = vector
+            self._memory_bytes += vector.nbytes
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+
+    def _load(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                cursor.execute(
+                    f"SELECT content_hash, vector FROM embedding_cache WHERE content_hash IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for k, blob in cursor.fetchall():
+                    found[k] = np.frombuffer(blob, dtype=np.float32)
+            conn.close()
+        except Exception as e:
+            logger.error(f"Embedding cache lookup failed: {e}")
+        return found
@@ -0,0 +1,212 @@
+"""SQLite FTS5 index over chunk text, and lexical + vector hybrid retrieval"""
+import json
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+QUESTION_WORDS = {
+    "what", "why", "how", "when", "where", "who", "whom", "whose", "which",
+    "is", "are", "was", "were", "does", "do", "did", "can", "could", "should", "would",
+    "explain", "describe", "compare", "tell", "give", "list", "summarize"
+}
+
+
+class LexicalIndex:
+    """
+    BM25 keyword search over chunk text, kept in step with the vector store.
+
+    Underscores count as word characters, so code identifiers such as
+    `parse_document` are matched as one term.
+    """
+
+    def __init__(self, db_path: str, fast_path_max_terms: int = 3):
+        self.db_path = db_path
+        self.fast_path_max_terms = fast_path_max_terms
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.init_db()
+
+    def init_db(self):
+        """Initialize the FTS5 table (raises sqlite3.OperationalError without FTS5 support)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(
+                text,
+                chunk_id UNINDEXED,
+                document_id UNINDEXED,
+                metadata UNINDEXED,
+                tokenize = "unicode61 remove_diacritics 2 tokenchars '_'"
+            )
+        """)
+        # UNINDEXED columns can't be looked up without scanning the whole FTS
+        # table, so each document's FTS rowids are also kept in an indexed table
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_fts_docs'")
+        backfill = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_fts_docs (
+                fts_rowid INTEGER PRIMARY KEY,
+                document_id TEXT NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunk_fts_docs_document ON chunk_fts_docs(document_id)")
+        if backfill:
+            cursor.execute("INSERT INTO chunk_fts_docs (fts_rowid, document_id) SELECT rowid, document_id FROM chunk_fts")
+        conn.commit()
+        conn.close()
+
+    def add_chunks(self, document_id: str, chunks: Sequence[Tuple[str, str, Dict]]):
+        """Index a document's (chunk_id, text, metadata) rows, replacing any it had"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        self._delete_rows(cursor, document_id)
+        rowids = []
+        for chunk_id, text, metadata in chunks:
+            cursor.execute(
+                "INSERT INTO chunk_fts (text, chunk_id, document_id, metadata) VALUES (?, ?, ?, ?)",
+                (text, chunk_id, document_id, json.dumps(metadata))
+            )
+            rowids.append((cursor.lastrowid, document_id))
+        cursor.executemany("INSERT INTO chunk_fts_docs (fts_rowid, document_id) VALUES (?, ?)", rowids)
+        conn.commit()
+        conn.close()
+
+    def delete_document(self, document_id: str):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        self._delete_rows(cursor, document_id)
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _delete_rows(cursor: sqlite3.Cursor, document_id: str):
+        """Delete a document's FTS rows by rowid, found through the indexed side table"""
+        cursor.execute(
+            "DELETE FROM chunk_fts WHERE rowid IN (SELECT fts_rowid FROM chunk_fts_docs WHERE document_id = ?)",
+            (document_id,)
+        )
+        cursor.execute("DELETE FROM chunk_fts_docs WHERE document_id = ?", (document_id,))
+
+    def count(self) -> int:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM chunk_fts")
+        total = cursor.fetchone()[0]
+        conn.close()
+        return total
+
+    def is_keyword_query(self, query_text: str) -> bool:
+        """Quoted text, or a few terms that don't read as a question"""
+        stripped = query_text.strip()
+        if len(stripped) > 2 and stripped[0] == stripped[-1] and stripped[0] in "\"'`":
+            return True
+        terms = _TERM.findall(stripped.lower())
+        return (
+            0 < len(terms) <= self.fast_path_max_terms
+            and terms[0] not in QUESTION_WORDS
+            and not stripped.endswith("?")
+        )
+
+    def search(
+        self,
+        query_text: str,
+        top_k: int = 5,
+        document_filter: Optional[str] = None,
+        match_all: bool = False
+    ) -> List[Dict]:
+        """
+        BM25-ranked chunks containing the query's terms (any of them, or all
+        with `match_all`; quoted queries match as a phrase).
+        """
+        expression = self._match_expression(query_text, match_all)
+        if not expression:
+            return []
+
+        sql = "SELECT chunk_id, text, metadata, bm25(chunk_fts) FROM chunk_fts WHERE chunk_fts MATCH ?"
+        params = [expression]
+        if document_filter:
+            sql += " AND document_id = ?"
+            params.append(document_filter)
+        sql += " ORDER BY bm25(chunk_fts) LIMIT ?"
+        params.append(top_k)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Lexical search failed for {expression!r}: {e}")
+            rows = []
+        conn.close()
+
+        return [
+            {"id": chunk_id, "text": text, "metadata": json.loads(metadata), "distance": None, "bm25": score}
+            for chunk_id, text, metadata, score in rows
+        ]
+
+    def _match_expression(self, query_text: str, match_all: bool) -> str:
+        stripped = query_text.strip()
+        terms = _TERM.findall(stripped.lower())
+        if not terms:
+            return ""
+        if len(stripped) > 2 and stripped[0] == stripped[-1] and stripped[0] in "\"'`":
+            return '"' + " ".join(terms) + '"'
+        # Each term quoted, so FTS5 operators and syntax in user text stay literal
+        return (" AND " if match_all else " OR ").join(f'"{t}"' for t in terms)
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """Merge ranked result lists by summing 1 / (k + rank); keeps the first list's copy of each chunk"""
+    scores: Dict[str, float] = {}
+    merged: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            scores[result["id"]] = scores.get(result["id"], 0.0) + 1.0 / (k + rank)
+            merged.setdefault(result["id"], result)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**merged[chunk_id], "rrf_score": round(scores[chunk_id], 6)} for chunk_id in ranked]
+
+
+def hybrid_retrieve(
+    query_text: str,
+    embed: Callable[[str], Optional[np.ndarray]],
+    vector_query: Callable[..., List[Dict]],
+    lexical_index: Optional[LexicalIndex],
+    top_k: int = 5,
+    document_filter: Optional[str] = None,
+    rrf_k: int = 60
+) -> Tuple[List[Dict], bool]:
+    """
+    Retrieve chunks for a text query; returns (results, cacheable).
+
+    Keyword-style queries whose terms all occur in some chunk are answered
+    from the lexical index alone, without embedding the query. Otherwise
+    vector and lexical results are fused with reciprocal-rank fusion. If the
+    query cannot be embedded, lexical matches are returned but not cached.
+    """
+    if lexical_index is None:
+        query_embedding = embed(query_text)
+        if query_embedding is None:
+            return [], False
+        return vector_query(query_embedding, top_k=top_k, document_filter=document_filter), True
+
+    if lexical_index.is_keyword_query(query_text):
+        results = lexical_index.search(query_text, top_k, document_filter, match_all=True)
+        if results:
+            return results, True
+
+    candidates = top_k * 2
+    lexical = lexical_index.search(query_text, candidates, document_filter)
+    query_embedding = embed(query_text)
+    if query_embedding is None:
+        return lexical[:top_k], False
+    vector = vector_query(query_embedding, top_k=candidates, document_filter=document_filter)
+    return reciprocal_rank_fusion([vector, lexical], top_k, k=rrf_k), True
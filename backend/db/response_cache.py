@@ -0,0 +1,304 @@
+"""Persistent LLM response cache stored in SQLite alongside chat history"""
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[^\w]+|[^\w]+$", re.UNICODE)
+_CONTENT_TOKEN = re.compile(r"\w+|[+\-*/^=<>%]", re.UNICODE)
+
+# Phrasing words a semantic match may differ in; every other token (numbers,
+# operators, question words such as "when" or "who", subject terms) has to be
+# identical for two prompts to share an answer
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did",
+    "what", "whats", "can", "could",
+    "would", "should", "will", "you", "me", "i", "we", "my", "your", "it", "its",
+    "please", "tell", "explain", "describe", "define", "give", "show", "about",
+    "of", "in", "on", "for", "to", "and", "or", "with", "by", "as", "at",
+    "meaning", "definition", "briefly", "simple", "terms", "s"
+}
+
+# How many recent candidates the similarity lookup compares against
+SEMANTIC_CANDIDATES = 500
+
+
+class ResponseCache:
+    """
+    Caches LLM replies keyed by normalized prompt, mode, language and a hash
+    of the retrieved context.
+
+    When an embedding manager is supplied, a miss on the exact key falls back
+    to the most similar cached prompt with the same mode, language and context
+    (e.g. "what is photosynthesis" vs "explain photosynthesis"). A semantic
+    match also needs the same content terms (see `content_terms`), since
+    embeddings score "what is 2+3" / "what is 2+4" or "define mitosis" /
+    "define meiosis" as near-identical.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        embedding_manager=None,
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 5000,
+        similarity_threshold: float = 0.92
+    ):
+        self.db_path = db_path
+        self.embedding_manager = embedding_manager
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.init_db()
+
+    def init_db(self):
+        """Initialize cache tables"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                prompt TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                language TEXT NOT NULL,
+                context_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                last_hit REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_response_cache_scope
+            ON response_cache (mode, language, context_hash, created_at)
+        """)
+
+        # Which documents fed each cached context (for invalidation)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache_documents (
+                cache_key TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                PRIMARY KEY (cache_key, document_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_response_cache_documents_doc
+            ON response_cache_documents (document_id)
+        """)
+
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Lowercase, collapse whitespace and strip surrounding punctuation"""
+        text = _WHITESPACE.sub(" ", prompt.lower()).strip()
+        return _EDGE_PUNCTUATION.sub("", text)
+
+    @staticmethod
+    def content_terms(normalized_prompt: str) -> frozenset:
+        """Tokens of a prompt other than stopwords: numbers, operators and subject terms"""
+        return frozenset(t for t in _CONTENT_TOKEN.findall(normalized_prompt) if t not in STOPWORDS)
+
+    @staticmethod
+    def context_hash(context: Optional[str]) -> str:
+        if not context:
+            return ""
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+    def make_key(self, normalized_prompt: str, mode: str, language: str, context_hash: str) -> str:
+        raw = "\x1f".join([normalized_prompt, mode, language or "", context_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        prompt: str,
+        mode: str,
+        language: str,
+        context: Optional[str] = None
+    ) -> Optional[str]:
+        """Return a cached response, or None on a miss"""
+        normalized = self.normalize_prompt(prompt)
+        if not normalized:
+            return None
+        ctx_hash = self.context_hash(context)
+        key = self.make_key(normalized, mode, language, ctx_hash)
+        cutoff = time.time() - self.ttl_seconds
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT response FROM response_cache WHERE cache_key = ? AND created_at >= ?",
+                (key, cutoff)
+            )
+            row = cursor.fetchone()
+
+            if row is None and self._semantic_enabled():
+                key, row = self._semantic_lookup(cursor, normalized, mode, language, ctx_hash, cutoff)
+
+            if row is None:
+                conn.close()
+                self.misses += 1
+                return None
+
+            cursor.execute(
+                "UPDATE response_cache SET hits = hits + 1, last_hit = ? WHERE cache_key = ?",
+                (time.time(), key)
+            )
+            conn.commit()
+            conn.close()
+            self.hits += 1
+            return row[0]
+        except Exception as e:
+            logger.error(f"Response cache lookup failed: {e}")
+            return None
+
+    def put(
+        self,
+        prompt: str,
+        mode: str,
+        language: str,
+        response: str,
+        context: Optional[str] = None,
+        document_ids: Iterable[str] = ()
+    ):
+        """Store a response and evict expired / excess entries"""
+        normalized = self.normalize_prompt(prompt)
+        if not normalized or not response:
+            return
+        ctx_hash = self.context_hash(context)
+        key = self.make_key(normalized, mode, language, ctx_hash)
+
+        embedding = None
+        if self._semantic_enabled():
+            vector = self.embedding_manager.embed(normalized)
+            if vector is not None:
+                embedding = np.asarray(vector, dtype=np.float32).tobytes()
+
+        now = time.time()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT OR REPLACE INTO response_cache
+                   (cache_key, prompt, mode, language, context_hash, response, embedding, created_at, last_hit, hits)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)""",
+                (key, normalized, mode, language or "", ctx_hash, response, embedding, now, now)
+            )
+            cursor.execute("DELETE FROM response_cache_documents WHERE cache_key = ?", (key,))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO response_cache_documents (cache_key, document_id) VALUES (?, ?)",
+                [(key, doc_id) for doc_id in set(document_ids) if doc_id]
+            )
+            self._evict(cursor, now)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Response cache store failed: {e}")
+
+    def invalidate_documents(self, document_ids: Iterable[str]) -> int:
+        """Drop every cached response whose context came from any of these documents"""
+        doc_ids = [d for d in set(document_ids) if d]
+        if not doc_ids:
+            return 0
+
+        placeholders = ",".join("?" * len(doc_ids))
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT DISTINCT cache_key FROM response_cache_documents WHERE document_id IN ({placeholders})",
+            doc_ids
+        )
+        keys = [r[0] for r in cursor.fetchall()]
+        self._delete_keys(cursor, keys)
+        conn.commit()
+        conn.close()
+
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cached responses for {len(doc_ids)} document(s)")
+        return len(keys)
+
+    def clear(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM response_cache")
+        cursor.execute("DELETE FROM response_cache_documents")
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> dict:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM response_cache")
+        entries = cursor.fetchone()[0]
+        conn.close()
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def _semantic_enabled(self) -> bool:
+        return self.embedding_manager is not None and self.similarity_threshold > 0
+
+    def _semantic_lookup(self, cursor, normalized, mode, language, ctx_hash, cutoff):
+        """Find the closest cached prompt in the same scope above the similarity threshold"""
+        cursor.execute(
+            """SELECT cache_key, embedding, response, prompt FROM response_cache
+               WHERE mode = ? AND language = ? AND context_hash = ?
+                 AND created_at >= ? AND embedding IS NOT NULL
+               ORDER BY last_hit DESC LIMIT ?""",
+            (mode, language or "", ctx_hash, cutoff, SEMANTIC_CANDIDATES)
+        )
+        # Only rephrasings are candidates: a different number or subject term is a different question
+        terms = self.content_terms(normalized)
+        rows = [r for r in cursor.fetchall() if self.content_terms(r[3]) == terms]
+        if not rows:
+            return None, None
+
+        query = self.embedding_manager.embed(normalized)
+        if query is None:
+            return None, None
+        query = np.asarray(query, dtype=np.float32)
+
+        matrix = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        norms[norms == 0] = 1.0
+        scores = matrix @ query / norms
+
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None, None
+        logger.debug(f"Semantic cache hit (similarity {scores[best]:.3f})")
+        return rows[best][0], (rows[best][2],)
+
+    def _evict(self, cursor, now: float):
+        cursor.execute("SELECT cache_key FROM response_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        keys = [r[0] for r in cursor.fetchall()]
+
+        cursor.execute("SELECT COUNT(*) FROM response_cache")
+        excess = cursor.fetchone()[0] - len(keys) - self.max_entries
+        if excess > 0:
+            cursor.execute(
+                "SELECT cache_key FROM response_cache WHERE created_at >= ? ORDER BY last_hit ASC LIMIT ?",
+                (now - self.ttl_seconds, excess)
+            )
+            keys.extend(r[0] for r in cursor.fetchall())
+
+        self._delete_keys(cursor, keys)
+
+    def _delete_keys(self, cursor, keys: List[str]):
+        if not keys:
+            return
+        cursor.executemany("DELETE FROM response_cache WHERE cache_key = ?", [(k,) for k in keys])
+        cursor.executemany("DELETE FROM response_cache_documents WHERE cache_key = ?", [(k,) for k in keys])
@@ -0,0 +1,68 @@
+"""In-memory cache of vector-store query results, invalidated by collection version"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class RetrievalCache:
+    """
+    Maps (query text hash, top_k, filter, collection version) to ranked results.
+
+    The version increases on every write to the collection, so entries from
+    before an upload or delete can never match again; `bump()` also drops
+    them to free memory. Least recently used entries are evicted beyond
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, query_text: str, top_k: int, document_filter: Optional[str], version: int) -> Tuple:
+        digest = hashlib.sha256(query_text.encode("utf-8")).hexdigest()
+        return digest, top_k, document_filter or "", version
+
+    def get(self, query_text: str, top_k: int, document_filter: Optional[str] = None) -> Tuple[Optional[List[Dict]], int]:
+        """Return (results or None, version); store a miss under the returned version"""
+        with self._lock:
+            version = self.version
+            k = self.key(query_text, top_k, document_filter, version)
+            results = self._entries.get(k)
+            if results is None:
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(k)
+            self.hits += 1
+            return [dict(r) for r in results], version
+
+    def put(self, query_text: str, top_k: int, document_filter: Optional[str], version: int, results: List[Dict]):
+        with self._lock:
+            if version != self.version:
+                # The collection changed while this query ran
+                return
+            self._entries[self.key(query_text, top_k, document_filter, version)] = [dict(r) for r in results]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self) -> int:
+        """Mark the collection as changed"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            return self.version
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
@@ -1,27 +1,55 @@
 ﻿"""DRAVIS FastAPI Backend - Complete Implementation"""
+import time
+
+_startup_begin = time.perf_counter()
+
 import os
+import json
+import hashlib
 import logging
 import uuid
+import sqlite3
 import shutil
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from pydantic import BaseModel
 
 from backend.config import Config
 from backend.models.llm_manager import LLMManager
-from backend.models.embedding_manager import EmbeddingManager
+from backend.models.inference_scheduler import SchedulerBusyError
+from backend.models.embedding_manager import EmbeddingManager, EMBEDDING_MODEL_ID
+from backend.models.model_registry import get_registry
 from backend.rag.document_parser import parse_document, chunk_text_for_storage
-from backend.db.chroma_store import ChromaStore
+from backend.db.document_catalog import DocumentCatalog
+from backend.db.retrieval_cache import RetrievalCache
+from backend.db.lexical_index import LexicalIndex
 from backend.db.sqlite_manager import SQLiteManager
+from backend.db.response_cache import ResponseCache
+from backend.db.embedding_cache import EmbeddingCache
 from backend.speech.whisper_handler import transcribe_audio
 from backend.quiz.quiz_generator import QuizGenerator
+from backend.quiz.question_bank import QuestionBank, QuestionBankWorker
+from backend.quiz.grader import AnswerGrader
 from backend.utils.language_detector import detect_language, should_respond_in_language
 from backend.utils.pin_manager import save_pin_hash, verify_pin, pin_exists
+from backend.utils.progress import ProgressTracker
+
+# Startup-time breakdown (seconds per step), logged once and served by /api/ready
+startup_times = {"imports": round(time.perf_counter() - _startup_begin, 3)}
+
+
+@contextmanager
+def _timed(step: str):
+    start = time.perf_counter()
+    yield
+    startup_times[step] = round(time.perf_counter() - start, 3)
 
 # Ensure directories exist
 Config.ensure_directories()
@@ -49,12 +77,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-llm = LLMManager()  # Uses Ollama if available, falls back to local llama-cpp
-embedding_manager = EmbeddingManager()
-chroma_store = ChromaStore(persist_directory=Config.CHROMA_PATH)
-db_manager = SQLiteManager(db_path=Config.DB_PATH)
-quiz_generator = QuizGenerator(llm_handler=llm)
+# Initialize components. Models are not loaded here: the registry loads them
+# on first use or in the background warm-up started below.
+with _timed("llm_manager"):
+    llm = LLMManager()  # Uses Ollama if available, falls back to local llama-cpp
+with _timed("embedding_manager"):
+    embedding_manager = EmbeddingManager(cache=EmbeddingCache(
+        EMBEDDING_MODEL_ID,
+        db_path=Config.DB_PATH if Config.EMBEDDING_CACHE_PERSIST else None,
+        max_bytes=Config.EMBEDDING_CACHE_MEMORY_BYTES
+    ))
+
+
+def _create_vector_store():
+    """Open the vector store selected by VECTOR_STORE_BACKEND (chromadb is only imported when used)"""
+    catalog = DocumentCatalog(db_path=Config.DB_PATH)
+    retrieval_cache = RetrievalCache(max_entries=Config.RETRIEVAL_CACHE_MAX_ENTRIES)
+    lexical_index = None
+    if Config.LEXICAL_INDEX_ENABLED:
+        try:
+            lexical_index = LexicalIndex(Config.DB_PATH, fast_path_max_terms=Config.LEXICAL_FAST_PATH_MAX_TERMS)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Lexical index disabled (SQLite built without FTS5?): {e}")
+    if Config.VECTOR_STORE_BACKEND == "segments":
+        from backend.rag.rag_store import RagStore
+        return RagStore(
+            Config.VECTOR_STORE_PATH,
+            catalog=catalog,
+            retrieval_cache=retrieval_cache,
+            max_segments=Config.VECTOR_STORE_MAX_SEGMENTS,
+            compact_deleted_ratio=Config.VECTOR_STORE_COMPACT_DELETED_RATIO,
+            quantization=Config.VECTOR_STORE_QUANTIZATION,
+            rerank_factor=Config.VECTOR_STORE_RERANK_FACTOR,
+            pq_subspaces=Config.VECTOR_STORE_PQ_SUBSPACES,
+            pq_min_rows=Config.VECTOR_STORE_PQ_MIN_ROWS,
+            lexical_index=lexical_index,
+            rrf_k=Config.RRF_K
+        )
+    if Config.VECTOR_STORE_BACKEND == "chroma":
+        from backend.db.chroma_store import ChromaStore, hnsw_metadata
+        compressed = None
+        if Config.VECTOR_STORE_QUANTIZATION != "none":
+            from backend.rag.quantization import CompressedTier
+            try:
+                compressed = CompressedTier(
+                    Config.VECTOR_STORE_CODES_PATH,
+                    Config.VECTOR_STORE_QUANTIZATION,
+                    space=Config.HNSW_SPACE,
+                    rerank_factor=Config.VECTOR_STORE_RERANK_FACTOR,
+                    pq_subspaces=Config.VECTOR_STORE_PQ_SUBSPACES,
+                    pq_min_rows=Config.VECTOR_STORE_PQ_MIN_ROWS
+                )
+            except ValueError as e:
+                logger.warning(f"Compressed vectors disabled: {e}")
+        return ChromaStore(
+            persist_directory=Config.CHROMA_PATH,
+            catalog=catalog,
+            retrieval_cache=retrieval_cache,
+            hnsw=hnsw_metadata(Config.HNSW_SPACE, Config.HNSW_M, Config.HNSW_CONSTRUCTION_EF, Config.HNSW_SEARCH_EF),
+            rebuild_on_mismatch=Config.HNSW_REBUILD_ON_START,
+            shard_per_document=Config.CHROMA_SHARD_PER_DOCUMENT,
+            query_workers=Config.VECTOR_STORE_QUERY_WORKERS,
+            lexical_index=lexical_index,
+            rrf_k=Config.RRF_K,
+            compressed=compressed
+        )
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{Config.VECTOR_STORE_BACKEND}' (use chroma or segments)")
+
+
+with _timed("vector_store"):
+    vector_store = _create_vector_store()
+with _timed("sqlite"):
+    db_manager = SQLiteManager(db_path=Config.DB_PATH)
+    response_cache = ResponseCache(
+        db_path=Config.DB_PATH,
+        embedding_manager=embedding_manager,
+        ttl_seconds=Config.RESPONSE_CACHE_TTL,
+        max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+        similarity_threshold=Config.RESPONSE_CACHE_SIMILARITY
+    )
+    question_bank = QuestionBank(db_path=Config.DB_PATH)
+quiz_generator = QuizGenerator(llm_handler=llm, response_cache=response_cache, question_bank=question_bank)
+answer_grader = AnswerGrader(
+    embedding_manager,
+    llm=llm if Config.GRADER_USE_LLM else None,
+    accept_similarity=Config.GRADER_ACCEPT_SIMILARITY,
+    reject_similarity=Config.GRADER_REJECT_SIMILARITY,
+    fuzzy_ratio=Config.GRADER_FUZZY_RATIO
+)
+question_bank_worker = QuestionBankWorker(
+    question_bank,
+    quiz_generator,
+    vector_store,
+    llm,
+    target=Config.QUESTION_BANK_TARGET,
+    batch_size=Config.QUESTION_BANK_BATCH,
+    idle_interval=Config.QUESTION_BANK_IDLE_INTERVAL,
+    difficulties=Config.QUESTION_BANK_DIFFICULTIES
+)
+upload_progress = ProgressTracker()
+startup_times["total"] = round(time.perf_counter() - _startup_begin, 3)
+logger.info(f"Startup breakdown (s): {startup_times}")
 
 
 # Request Models
@@ -73,6 +196,17 @@ class QuizRequest(BaseModel):
     use_documents: bool = False
 
 
+class GradeItem(BaseModel):
+    answer: str
+    correct_answer: str
+    question: str = ""
+    type: str = "short_answer"  # mcq, true_false, fill_blank or short_answer
+
+
+class GradeRequest(BaseModel):
+    answers: List[GradeItem]
+
+
 class PINRequest(BaseModel):
     pin: str
 
@@ -89,75 +223,157 @@ def home():
     return {
         "status": "Backend running",
         "llm_available": llm.is_available(),
+        "llm": llm.backend_status(),
         "version": Config.API_VERSION
     }
 
 
-@app.post("/api/chat")
-async def chat(req: ChatRequest):
-    """Chat endpoint with RAG support and multi-mode"""
-    prompt = req.message.strip()
-    
-    if not prompt:
-        return {"response": "Please enter a message.", "error": "empty_message"}
-    
+# Mode-specific prompts
+MODE_PROMPTS = {
+    "normal": "",
+    "exam_prep": "Provide a concise answer optimized for 10-minute rapid revision. Be brief and focused.",
+    "practice": "After your answer, generate a follow-up practice question related to the topic.",
+    "vocabulary": "Focus on word meanings, usage, and pronunciation. Explain vocabulary clearly."
+}
+
+LLM_BUSY_MESSAGE = "DRAVIS is handling too many requests right now. Please try again in a moment."
+
+LLM_NOT_AVAILABLE_MESSAGE = "I'm DRAVIS, your offline study assistant! The LLM model is not currently loaded. You can still:\n\n• Upload and manage documents\n• Generate quizzes\n• Use document search\n• Export chat history\n\nTo enable full chat responses, please download the Mistral 7B model file and place it in backend/models/"
+
+
+def build_chat_prompt(req: ChatRequest, prompt: str) -> Tuple[str, str, List[Dict]]:
+    """
+    Build the full LLM prompt for a chat request.
+    Returns (full_prompt, detected_language, context_chunks).
+    """
     # Detect language
     detected_lang, confidence = detect_language(prompt)
     logger.info(f"Detected language: {detected_lang} (confidence: {confidence})")
     
     # Build context based on mode
     context_parts = []
+    context_chunks = []
     
     # RAG: Retrieve relevant documents if enabled
     if req.use_documents:
         try:
-            query_embedding = embedding_manager.embed(prompt)
-            if query_embedding:
-                results = chroma_store.query(query_embedding, top_k=Config.TOP_K_RESULTS)
-                if results:
-                    context_text = "\n\n".join([r["text"] for r in results[:3]])
-                    context_parts.append(f"Relevant context from documents:\n{context_text}")
+            results = vector_store.query_text(prompt, embedding_manager.embed, top_k=Config.TOP_K_RESULTS)
+            if results:
+                context_chunks = results[:3]
+                context_text = "\n\n".join([r["text"] for r in context_chunks])
+                context_parts.append(f"Relevant context from documents:\n{context_text}")
         except Exception as e:
             logger.error(f"RAG retrieval failed: {e}")
     
-    # Mode-specific prompts
-    mode_prompts = {
-        "normal": "",
-        "exam_prep": "Provide a concise answer optimized for 10-minute rapid revision. Be brief and focused.",
-        "practice": "After your answer, generate a follow-up practice question related to the topic.",
-        "vocabulary": "Focus on word meanings, usage, and pronunciation. Explain vocabulary clearly."
-    }
-    
-    mode_instruction = mode_prompts.get(req.mode, "")
+    mode_instruction = MODE_PROMPTS.get(req.mode, "")
     
-    # Build final prompt
-    full_prompt = prompt
-    if context_parts:
-        full_prompt = f"{prompt}\n\n{chr(10).join(context_parts)}"
+    # Build final prompt. Stable parts (mode instruction, retrieved context)
+    # come first so the local model can reuse their cached KV state and only
+    # prefill the question.
+    sections = []
     if mode_instruction:
-        full_prompt = f"{mode_instruction}\n\n{full_prompt}"
+        sections.append(mode_instruction)
+    sections.extend(context_parts)
     
     # Language-specific instruction
     if detected_lang == "hi" or (detected_lang == "hinglish" and confidence > 0.3):
-        full_prompt = f"Respond in {detected_lang.upper()} if appropriate, or English if needed.\n\n{full_prompt}"
+        sections.append(f"Respond in {detected_lang.upper()} if appropriate, or English if needed.")
+    
+    sections.append(prompt)
+    full_prompt = "\n\n".join(sections)
+    
+    return full_prompt, detected_lang, context_chunks
+
+
+def _context_key(context_chunks: List[Dict]) -> Tuple[str, List[str]]:
+    """Text and source document IDs of the retrieved context, for the response cache"""
+    context_text = "\n\n".join(r["text"] for r in context_chunks)
+    document_ids = [r["metadata"].get("document_id") for r in context_chunks if r.get("metadata")]
+    return context_text, document_ids
+
+
+@app.on_event("startup")
+def warm_models():
+    """Load models in the background, then prefill the mode instructions on the local model"""
+    registry = get_registry()
+    registry.configure(
+        budget_bytes=Config.MODEL_RAM_BUDGET_MB * 1024 * 1024,
+        check_interval=Config.MODEL_IDLE_CHECK_INTERVAL
+    )
+    registry.start_reaper()
+    if Config.QUESTION_BANK_ENABLED:
+        question_bank_worker.start()
+    registry.warm_async(then=lambda: llm.warm_prefixes([p for p in MODE_PROMPTS.values() if p]))
+
+
+def _sse(payload: dict) -> str:
+    """Format a payload as a Server-Sent Events message"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.get("/api/ready")
+def readiness():
+    """Readiness endpoint: reports which models are still loading (503 until warm-up finishes)"""
+    registry = get_registry()
+    ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "models": registry.status(),
+            "llm_available": llm.is_available(),
+            "retrieval_cache": vector_store.retrieval_cache.stats(),
+            "startup": startup_times
+        }
+    )
+
+
+@app.post("/api/chat")
+async def chat(req: ChatRequest):
+    """Chat endpoint with RAG support and multi-mode"""
+    prompt = req.message.strip()
+    
+    if not prompt:
+        return {"response": "Please enter a message.", "error": "empty_message"}
+    
+    # Retrieval and embedding are blocking; keep them off the event loop
+    full_prompt, detected_lang, context_chunks = await run_in_threadpool(build_chat_prompt, req, prompt)
+    context_text, context_doc_ids = _context_key(context_chunks)
+    
+    # Serve repeated / near-identical questions from the response cache
+    cached = await run_in_threadpool(response_cache.get, prompt, req.mode, detected_lang, context_text)
+    if cached is not None:
+        try:
+            db_manager.add_message(prompt, cached, use_rag=req.use_documents, mode=req.mode, language=detected_lang)
+        except Exception as e:
+            logger.error(f"Failed to save chat history: {e}")
+        return {"response": cached, "language": detected_lang, "mode": req.mode, "cached": True}
     
     # Generate response
-    reply = llm.generate(full_prompt)
+    try:
+        reply = await llm.agenerate(full_prompt)
+    except SchedulerBusyError:
+        return {"response": LLM_BUSY_MESSAGE, "error": "server_busy", "language": detected_lang, "mode": req.mode}
     
     if reply is None:
         # Fallback response when LLM is not available
         if not llm.is_available():
             return {
-                "response": "I'm DRAVIS, your offline study assistant! The LLM model is not currently loaded. You can still:\n\n• Upload and manage documents\n• Generate quizzes\n• Use document search\n• Export chat history\n\nTo enable full chat responses, please download the Mistral 7B model file and place it in backend/models/",
+                "response": LLM_NOT_AVAILABLE_MESSAGE,
                 "error": "llm_not_available",
                 "language": detected_lang,
                 "mode": req.mode
             }
         return {"response": "LLM failed to generate a response.", "error": "generation_failed"}
     
+    await run_in_threadpool(
+        response_cache.put, prompt, req.mode, detected_lang, reply,
+        context=context_text, document_ids=context_doc_ids
+    )
+    
     # Save to chat history
     try:
-        db_manager.add_message(prompt, reply, use_rag=req.use_documents)
+        db_manager.add_message(prompt, reply, use_rag=req.use_documents, mode=req.mode, language=detected_lang)
     except Exception as e:
         logger.error(f"Failed to save chat history: {e}")
     
@@ -168,9 +384,88 @@ async def chat(req: ChatRequest):
     }
 
 
+@app.post("/api/chat/stream")
+def chat_stream(req: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+    
+    Emits `{"token": ...}` events as the model produces text, then a final
+    `{"done": true, ...}` event. The full reply is saved to chat history once
+    the stream completes.
+    """
+    prompt = req.message.strip()
+    
+    if not prompt:
+        def empty_stream():
+            yield _sse({"done": True, "response": "Please enter a message.", "error": "empty_message"})
+        return StreamingResponse(empty_stream(), media_type="text/event-stream")
+    
+    full_prompt, detected_lang, context_chunks = build_chat_prompt(req, prompt)
+    context_text, context_doc_ids = _context_key(context_chunks)
+    cached = response_cache.get(prompt, req.mode, detected_lang, context_text)
+    
+    def event_stream():
+        if cached is not None:
+            try:
+                db_manager.add_message(prompt, cached, use_rag=req.use_documents, mode=req.mode, language=detected_lang)
+            except Exception as e:
+                logger.error(f"Failed to save chat history: {e}")
+            yield _sse({"token": cached})
+            yield _sse({"done": True, "response": cached, "language": detected_lang, "mode": req.mode, "cached": True})
+            return
+        
+        if not llm.is_available():
+            yield _sse({
+                "done": True,
+                "response": LLM_NOT_AVAILABLE_MESSAGE,
+                "error": "llm_not_available",
+                "language": detected_lang,
+                "mode": req.mode
+            })
+            return
+        
+        parts = []
+        try:
+            for token in llm.generate_stream(full_prompt):
+                parts.append(token)
+                yield _sse({"token": token})
+        except SchedulerBusyError:
+            yield _sse({"done": True, "response": LLM_BUSY_MESSAGE, "error": "server_busy"})
+            return
+        except Exception as e:
+            logger.error(f"Streaming generation failed: {e}")
+        
+        reply = "".join(parts).strip()
+        if not reply:
+            yield _sse({"done": True, "response": "LLM failed to generate a response.", "error": "generation_failed"})
+            return
+        
+        response_cache.put(
+            prompt, req.mode, detected_lang, reply,
+            context=context_text, document_ids=context_doc_ids
+        )
+        
+        # Save to chat history
+        try:
+            db_manager.add_message(prompt, reply, use_rag=req.use_documents, mode=req.mode, language=detected_lang)
+        except Exception as e:
+            logger.error(f"Failed to save chat history: {e}")
+        
+        yield _sse({"done": True, "response": reply, "language": detected_lang, "mode": req.mode})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload and process document"""
+async def upload_document(file: UploadFile = File(...), upload_id: Optional[str] = Form(None)):
+    """
+    Upload and process document.
+    Pass a client-chosen `upload_id` to poll `/api/upload/{upload_id}/progress` while it is processed.
+    """
     # Validate file extension
     file_ext = Path(file.filename).suffix.lower().lstrip('.')
     if file_ext not in Config.ALLOWED_EXTENSIONS:
@@ -200,7 +495,8 @@ async def upload_document(file: UploadFile = File(...)):
     
     try:
         # Parse document
-        pages = parse_document(file_path)
+        upload_progress.update(upload_id, stage="parsing")
+        pages = await run_in_threadpool(parse_document, file_path)
         
         # Chunk text
         chunks = chunk_text_for_storage(
@@ -212,9 +508,14 @@ async def upload_document(file: UploadFile = File(...)):
         if not chunks:
             raise HTTPException(status_code=400, detail="No text extracted from document")
         
-        # Generate embeddings
+        # Generate embeddings (off the event loop so progress can be polled meanwhile)
         chunk_texts = [chunk[0] for chunk in chunks]
-        embeddings = embedding_manager.embed_batch(chunk_texts)
+        upload_progress.update(upload_id, stage="embedding", done=0, total=len(chunk_texts))
+        embeddings = await run_in_threadpool(
+            embedding_manager.embed_batch,
+            chunk_texts,
+            progress=lambda done, total: upload_progress.update(upload_id, done=done, total=total)
+        )
         
         # Filter out None embeddings
         valid_chunks = []
@@ -227,15 +528,29 @@ async def upload_document(file: UploadFile = File(...)):
         if not valid_chunks:
             raise HTTPException(status_code=500, detail="Failed to generate embeddings")
         
-        # Store in ChromaDB
-        chroma_store.add_document_chunks(
+        # A re-upload of the same file makes responses built on the old copy stale
+        previous = await run_in_threadpool(vector_store.catalog.find_by_name, file.filename)
+        await run_in_threadpool(response_cache.invalidate_documents, [d["document_id"] for d in previous])
+        
+        # Store in ChromaDB (off the event loop; indexing blocks on disk and locks)
+        upload_progress.update(upload_id, stage="storing")
+        await run_in_threadpool(
+            vector_store.add_document_chunks,
             document_id=doc_id,
             document_name=file.filename,
             chunks=valid_chunks,
             embeddings=valid_embeddings,
-            upload_time=timestamp
+            upload_time=timestamp,
+            byte_size=len(file_content),
+            content_hash=hashlib.sha256(file_content).hexdigest(),
+            file_path=file_path
         )
         
+        # Pre-generate quiz questions for the document while the LLM is idle
+        if Config.QUESTION_BANK_ENABLED:
+            question_bank_worker.enqueue(doc_id)
+        
+        upload_progress.finish(upload_id)
         return {
             "success": True,
             "document_id": doc_id,
@@ -247,17 +562,27 @@ async def upload_document(file: UploadFile = File(...)):
     
     except Exception as e:
         logger.error(f"Document processing failed: {e}")
+        upload_progress.finish(upload_id, error=str(e))
         # Clean up file on error
         if os.path.exists(file_path):
             os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Document processing failed: {str(e)}")
 
 
+@app.get("/api/upload/{upload_id}/progress")
+async def get_upload_progress(upload_id: str):
+    """Stage and embedding progress of an upload started with this upload_id"""
+    progress = upload_progress.get(upload_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Unknown upload_id")
+    return progress
+
+
 @app.get("/api/documents")
 async def list_documents():
     """List all uploaded documents"""
     try:
-        docs = chroma_store.get_document_info()
+        docs = vector_store.get_document_info()
         return {"docs": docs, "count": len(docs)}
     except Exception as e:
         logger.error(f"Failed to list documents: {e}")
@@ -268,7 +593,11 @@ async def list_documents():
 async def delete_document(document_id: str):
     """Delete a document and all its chunks"""
     try:
-        deleted_count = chroma_store.delete_document(document_id)
+        # Store, cache and bank deletes block on disk and locks; keep them off the event loop
+        deleted_count = await run_in_threadpool(vector_store.delete_document, document_id)
+        await run_in_threadpool(response_cache.invalidate_documents, [document_id])
+        await run_in_threadpool(question_bank.delete_document, document_id)
+        question_bank_worker.forget(document_id)
         
         # Also delete file from uploads
         upload_files = os.listdir(Config.UPLOAD_DIR)
@@ -326,19 +655,24 @@ async def generate_quiz(req: QuizRequest):
     try:
         # Get context from documents if requested
         context = None
+        context_doc_ids = []
+        context_sources = []
         if req.use_documents:
-            query_embedding = embedding_manager.embed(req.topic)
-            if query_embedding:
-                results = chroma_store.query(query_embedding, top_k=3)
-                if results:
-                    context = "\n\n".join([r["text"] for r in results])
+            results = await run_in_threadpool(vector_store.query_text, req.topic, embedding_manager.embed, top_k=3)
+            if results:
+                context, context_doc_ids = _context_key(results)
+                context_sources = [(r["metadata"].get("document_id"), r["metadata"].get("page")) for r in results]
         
-        quiz = quiz_generator.generate_quiz(
+        # Quiz generation blocks on the LLM scheduler; run it in the threadpool
+        quiz = await run_in_threadpool(
+            quiz_generator.generate_quiz,
             topic=req.topic,
             num_questions=req.num_questions,
             difficulty=req.difficulty,
             quiz_type=req.quiz_type,
-            context=context
+            context=context,
+            document_ids=context_doc_ids,
+            sources=context_sources
         )
         
         return {
@@ -349,11 +683,87 @@ async def generate_quiz(req: QuizRequest):
             "type": req.quiz_type
         }
     
+    except SchedulerBusyError:
+        raise HTTPException(status_code=503, detail=LLM_BUSY_MESSAGE)
     except Exception as e:
         logger.error(f"Quiz generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Quiz generation failed: {str(e)}")
 
 
+@app.post("/api/quiz/stream")
+def generate_quiz_stream(req: QuizRequest):
+    """
+    Streaming quiz endpoint (Server-Sent Events).
+    
+    Questions are generated as concurrent per-question jobs and each one is
+    emitted as a `{"question": ..., "index": n}` event as soon as it is ready
+    (questions that fail or time out are filled with fallback questions),
+    followed by a final `{"done": true, "quiz": ...}` event.
+    """
+    context = None
+    context_doc_ids = []
+    context_sources = []
+    if req.use_documents:
+        results = vector_store.query_text(req.topic, embedding_manager.embed, top_k=3)
+        if results:
+            context, context_doc_ids = _context_key(results)
+            context_sources = [(r["metadata"].get("document_id"), r["metadata"].get("page")) for r in results]
+    
+    def event_stream():
+        questions = []
+        try:
+            for question in quiz_generator.generate_quiz_stream(
+                topic=req.topic,
+                num_questions=req.num_questions,
+                difficulty=req.difficulty,
+                quiz_type=req.quiz_type,
+                context=context,
+                document_ids=context_doc_ids,
+                sources=context_sources
+            ):
+                yield _sse({"question": question, "index": len(questions)})
+                questions.append(question)
+        except SchedulerBusyError:
+            yield _sse({"done": True, "error": "server_busy", "detail": LLM_BUSY_MESSAGE})
+            return
+        except Exception as e:
+            logger.error(f"Quiz generation failed: {e}")
+            yield _sse({"done": True, "error": "generation_failed", "detail": str(e)})
+            return
+        
+        yield _sse({
+            "done": True,
+            "quiz": {"questions": questions},
+            "topic": req.topic,
+            "difficulty": req.difficulty,
+            "type": req.quiz_type
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/quiz/grade")
+async def grade_quiz(req: GradeRequest):
+    """Grade all answers of a quiz in one batch"""
+    start = time.perf_counter()
+    try:
+        results = await run_in_threadpool(answer_grader.grade, [item.dict() for item in req.answers])
+    except Exception as e:
+        logger.error(f"Quiz grading failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Quiz grading failed: {str(e)}")
+    
+    return {
+        "results": results,
+        "score": sum(1 for r in results if r["correct"]),
+        "total": len(results),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+
 @app.get("/api/chat/history")
 async def get_chat_history(limit: int = 50):
     """Get chat history"""
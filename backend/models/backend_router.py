@@ -0,0 +1,200 @@
+"""Latency-aware LLM backend routing with health checks and circuit breaking"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and the
+    backend is skipped. Once `reset_timeout` seconds have passed a single trial
+    request is let through (half-open); success closes the breaker again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        now = time.time()
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_started = None
+        if self.state == self.HALF_OPEN:
+            # A trial that never reported back (e.g. cancelled) does not block forever
+            return self._trial_started is None or now - self._trial_started >= self.reset_timeout
+        return False
+
+    def on_dispatch(self):
+        if self.state == self.HALF_OPEN:
+            self._trial_started = time.time()
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_started = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_started = None
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuit breaker opened")
+            self.state = self.OPEN
+            self.opened_at = time.time()
+
+
+class BackendStats:
+    """Running performance figures for one backend"""
+
+    def __init__(self, name: str, breaker: CircuitBreaker):
+        self.name = name
+        self.breaker = breaker
+        self.healthy = False
+        self.last_check: Optional[float] = None
+        self.ewma_tokens_per_sec: Optional[float] = None
+        self.ewma_ttft: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+
+    def estimated_latency(self, max_tokens: int) -> float:
+        """Expected seconds to produce `max_tokens` tokens (0 when never measured)"""
+        if self.ewma_ttft is None or not self.ewma_tokens_per_sec:
+            return 0.0
+        return self.ewma_ttft + max_tokens / self.ewma_tokens_per_sec
+
+    def to_dict(self) -> Dict:
+        return {
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "tokens_per_sec": round(self.ewma_tokens_per_sec, 2) if self.ewma_tokens_per_sec else None,
+            "ttft_seconds": round(self.ewma_ttft, 3) if self.ewma_ttft is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_check": self.last_check
+        }
+
+
+class BackendRouter:
+    """
+    Routes each request to the single fastest healthy backend.
+
+    `probes` maps backend name to a health-check callable. Backends listed
+    first win ties (including before any measurements exist).
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Callable[[], bool]],
+        alpha: float = 0.3,
+        check_interval: float = 15.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0
+    ):
+        self._probes = probes
+        self._order = list(probes)
+        self.alpha = alpha
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stats = {
+            name: BackendStats(name, CircuitBreaker(failure_threshold, reset_timeout))
+            for name in probes
+        }
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the background health monitor"""
+        if self._monitor is not None:
+            return
+        self._monitor = threading.Thread(target=self._monitor_loop, name="llm-health-monitor", daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check_now(self, names: Optional[Iterable[str]] = None):
+        """Run health probes immediately"""
+        for name in names or self._order:
+            try:
+                healthy = bool(self._probes[name]())
+            except Exception as e:
+                logger.debug(f"Health probe for {name} failed: {e}")
+                healthy = False
+            with self._lock:
+                stats = self._stats[name]
+                if healthy != stats.healthy:
+                    logger.info(f"LLM backend {name} is now {'up' if healthy else 'down'}")
+                stats.healthy = healthy
+                stats.last_check = time.time()
+
+    def is_healthy(self, name: str) -> bool:
+        with self._lock:
+            return self._stats[name].healthy
+
+    def any_healthy(self) -> bool:
+        with self._lock:
+            return any(s.healthy for s in self._stats.values())
+
+    def choose(self, max_tokens: int = 512, exclude: Iterable[str] = ()) -> List[str]:
+        """Return the fastest healthy backend whose breaker allows traffic (empty list if none)"""
+        excluded = set(exclude)
+        with self._lock:
+            candidates = [
+                s for s in self._stats.values()
+                if s.healthy and s.name not in excluded and s.breaker.allow()
+            ]
+            if not candidates:
+                return []
+            best = min(candidates, key=lambda s: (s.estimated_latency(max_tokens), self._order.index(s.name)))
+            return [best.name]
+
+    def on_dispatch(self, name: str):
+        with self._lock:
+            self._stats[name].breaker.on_dispatch()
+
+    def record_success(self, name: str, ttft: float, tokens: int, elapsed: float):
+        """Fold a finished generation into the backend's EWMAs"""
+        with self._lock:
+            stats = self._stats[name]
+            stats.requests += 1
+            stats.breaker.record_success()
+            stats.ewma_ttft = self._ewma(stats.ewma_ttft, ttft)
+            decode_time = elapsed - ttft
+            if tokens > 1 and decode_time > 0:
+                stats.ewma_tokens_per_sec = self._ewma(stats.ewma_tokens_per_sec, (tokens - 1) / decode_time)
+
+    def record_failure(self, name: str):
+        with self._lock:
+            stats = self._stats[name]
+            stats.requests += 1
+            stats.failures += 1
+            stats.breaker.record_failure()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: self._stats[name].to_dict() for name in self._order}
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * current
+
+    def _monitor_loop(self):
+        while not self._stop.wait(self.check_interval):
+            self.check_now()
@@ -0,0 +1,144 @@
+"""Pluggable embedding backends (in-process fp32 / int8 CPU, or a remote Ollama)"""
+import logging
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackend:
+    """
+    Interface every embedding backend implements. `load()` does the heavy
+    imports and model loading, so constructing a backend is cheap.
+    """
+
+    name = "base"
+    default_model = ""
+
+    def __init__(self, model_name: str, num_threads: int = 0):
+        self.model_name = model_name
+        self.num_threads = num_threads
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vectors this backend produces (used in cache keys)"""
+        return self.model_name
+
+    def load(self) -> "EmbeddingBackend":
+        raise NotImplementedError
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix"""
+        raise NotImplementedError
+
+    def size_bytes(self) -> int:
+        """Approximate resident size of the loaded model"""
+        return 0
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Full-precision sentence-transformers model on PyTorch"""
+
+    name = "fp32"
+    default_model = "all-MiniLM-L6-v2"
+
+    def __init__(self, model_name: str, num_threads: int = 0):
+        super().__init__(model_name, num_threads)
+        self.model = None
+
+    def load(self) -> "SentenceTransformerBackend":
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads > 0:
+            torch.set_num_threads(self.num_threads)
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+        logger.info(f"Loaded sentence-transformers model: {self.model_name} ({self.name}, {torch.get_num_threads()} threads)")
+        return self
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            vectors = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def size_bytes(self) -> int:
+        total = 0
+        for value in self.model.state_dict().values():
+            # Dynamically quantized layers store packed (weight, bias) tuples
+            for tensor in value if isinstance(value, tuple) else (value,):
+                if hasattr(tensor, "element_size"):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+
+
+class QuantizedSentenceTransformerBackend(SentenceTransformerBackend):
+    """
+    The same model with every Linear layer dynamically quantized to int8.
+    Weights take ~4x less memory and matrix multiplies run on int8 kernels;
+    vectors differ slightly from fp32 (see backend/tools/embedding_parity.py).
+    """
+
+    name = "int8"
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.model_name}:{self.name}"
+
+    def load(self) -> "QuantizedSentenceTransformerBackend":
+        import torch
+
+        super().load()
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info(f"Quantized {self.model_name} Linear layers to int8")
+        return self
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeddings from Ollama's /api/embed over the shared keep-alive client,
+    one request per batch. Keeps embedding work out of the API process
+    (e.g. when Ollama runs on another machine); OLLAMA_BASE_URL selects it.
+    """
+
+    name = "ollama"
+    default_model = Config.EMBEDDING_MODEL
+
+    def __init__(self, model_name: str, num_threads: int = 0):
+        super().__init__(model_name, num_threads)
+        self.client = None
+
+    @property
+    def model_id(self) -> str:
+        return f"ollama:{self.model_name}"
+
+    def load(self) -> "OllamaEmbeddingBackend":
+        from .ollama_client import get_ollama_client
+
+        self.client = get_ollama_client()
+        # One tiny request up front: fails fast if Ollama is down or the model isn't pulled
+        dim = self.client.embed(self.model_name, ["ping"], timeout=60).shape[1]
+        logger.info(f"Using Ollama embeddings: {self.model_name} ({dim} dims) at {self.client.base_url}")
+        return self
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.client.embed(self.model_name, texts)
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    QuantizedSentenceTransformerBackend.name: QuantizedSentenceTransformerBackend,
+    OllamaEmbeddingBackend.name: OllamaEmbeddingBackend,
+}
+
+
+def create_backend(name: str, model_name: Optional[str] = None, num_threads: int = 0) -> EmbeddingBackend:
+    """Create (but don't load) an embedding backend by name, with its default model unless one is given"""
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"Unknown embedding backend '{name}' (available: {', '.join(BACKENDS)})")
+    return backend_class(model_name or backend_class.default_model, num_threads=num_threads)
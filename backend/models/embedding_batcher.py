@@ -0,0 +1,103 @@
+"""Micro-batching worker that merges concurrent embedding requests"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """
+    Collects embed requests from many threads into one `encode` call.
+
+    The worker takes the first waiting request, then keeps collecting for up
+    to `max_wait_ms` or until `max_batch` texts are gathered, encodes them in
+    a single forward pass and hands each caller its own rows. A lone request
+    therefore waits at most `max_wait_ms` longer than encoding it directly.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Optional[np.ndarray]],
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def encode(self, texts: Sequence[str], timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Encode texts as part of a shared batch; blocks until this caller's rows are ready"""
+        self._ensure_worker()
+        request = _Request(list(texts))
+        self._queue.put(request)
+        return request.future.result(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0
+        }
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Identical texts from different callers (e.g. the same query) are encoded once
+            unique = list(dict.fromkeys(t for request in batch for t in request.texts))
+            try:
+                vectors = self._encode(unique)
+                error = None if vectors is not None else RuntimeError("Embedder not available")
+            except Exception as e:
+                vectors, error = None, e
+
+            self.batches += 1
+            self.requests += len(batch)
+            if error is not None:
+                for request in batch:
+                    request.future.set_exception(error)
+                continue
+
+            rows = {text: i for i, text in enumerate(unique)}
+            for request in batch:
+                request.future.set_result(vectors[[rows[t] for t in request.texts]])
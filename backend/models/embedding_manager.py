@@ -1,85 +1,199 @@
-"""Manages text embeddings using sentence-transformers"""
+"""Manages text embeddings (sentence-transformers through a pluggable backend)"""
 import logging
-from typing import List, Optional
+import time
+from typing import Callable, Dict, List, Optional
 import numpy as np
 
+from backend.config import Config
+from backend.db.embedding_cache import EmbeddingCache
+from .model_registry import get_registry, UNAVAILABLE, FAILED
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_backends import create_backend, SentenceTransformerBackend
+
 logger = logging.getLogger(__name__)
 
-_embedder = None
+EMBEDDING_MODEL_NAME = SentenceTransformerBackend.default_model
 
+# Selected by Config.EMBEDDING_BACKEND ("fp32", "int8" or "ollama"); not loaded until first use
+_backend = create_backend(Config.EMBEDDING_BACKEND, num_threads=Config.EMBEDDING_THREADS)
 
-def get_embedder():
-    """Get or initialize sentence-transformers embedder"""
-    global _embedder
-    
-    if _embedder is not None:
-        return _embedder
-    
+# Vectors from different backends differ slightly, so they are cached separately
+EMBEDDING_MODEL_ID = _backend.model_id
+
+
+def _load_embedder():
+    """Load the embedding backend (called lazily through the model registry)"""
     try:
-        from sentence_transformers import SentenceTransformer
-        # Use a lightweight model for offline use
-        _embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("Loaded sentence-transformers model: all-MiniLM-L6-v2")
-        return _embedder
+        return _backend.load()
     except Exception as e:
-        logger.error(f"Failed to load sentence-transformers: {e}")
+        logger.error(f"Failed to load embedding backend '{_backend.name}': {e}")
         return None
 
 
+get_registry().register(
+    "embedder",
+    _load_embedder,
+    size_bytes=lambda backend: backend.size_bytes(),
+    idle_timeout=Config.EMBEDDER_IDLE_TIMEOUT
+)
+
+
+def get_embedder():
+    """Get the embedding backend, loading it on first use"""
+    return get_registry().get("embedder")
+
+
 class EmbeddingManager:
-    def __init__(self):
-        self.embedder = get_embedder()
-        self.cache = {}
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
+        # Content-hash keyed; memory-only unless a cache with a db_path is supplied
+        self.cache = cache or EmbeddingCache(EMBEDDING_MODEL_ID, max_bytes=Config.EMBEDDING_CACHE_MEMORY_BYTES)
+        # Small requests (queries) from concurrent callers share one forward pass
+        self.batcher = EmbeddingBatcher(
+            self._encode,
+            max_batch=Config.EMBEDDING_BATCH_SIZE,
+            max_wait_ms=Config.EMBEDDING_MAX_WAIT_MS
+        )
     
-    def embed(self, text: str) -> Optional[List[float]]:
-        """Generate embedding for text"""
+    @property
+    def embedder(self):
+        return get_embedder()
+    
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Generate a float32 embedding vector for text"""
         if not text or not text.strip():
             return None
+        return self.embed_batch([text])[0]
+    
+    def embed_batch(
+        self,
+        texts: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Generate float32 embeddings for multiple texts. Only texts missing from the cache reach the model.
         
-        # Check cache
-        text_key = text[:100]  # Cache key (first 100 chars)
-        if text_key in self.cache:
-            return self.cache[text_key]
+        Args:
+            texts: Texts to embed (empty ones get None)
+            progress: Optional callback(done, total) called after each batch
+        """
+        vectors: Dict[str, np.ndarray] = self.cache.get_many(t for t in texts if t and t.strip())
+        missing = list(dict.fromkeys(t for t in texts if t and t.strip() and t not in vectors))
         
-        if self.embedder is None:
-            logger.error("Embedder not available")
-            return None
+        if len(missing) >= self.batcher.max_batch:
+            # Ingestion-sized requests already fill batches; encode them directly
+            vectors.update(self._encode_in_batches(missing, len(texts) - len(missing), len(texts), progress))
+        elif missing:
+            try:
+                encoded = self.batcher.encode(missing)
+                if encoded is None:
+                    logger.error("Embedder not available")
+                else:
+                    fresh = dict(zip(missing, encoded))
+                    self.cache.put_many(fresh)
+                    vectors.update(fresh)
+            except Exception as e:
+                logger.error(f"Batch embedding failed: {e}")
         
-        try:
-            embedding = self.embedder.encode(text, convert_to_numpy=True).tolist()
-            self.cache[text_key] = embedding
-            return embedding
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
+        if progress is not None:
+            progress(len(texts), len(texts))
+        return [vectors.get(t) for t in texts]
+    
+    def embed_matrix(
+        self,
+        texts: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Optional[np.ndarray]:
+        """Embed texts into one contiguous (n, dim) float32 matrix; None if any text fails"""
+        vectors = self.embed_batch(texts, progress=progress)
+        if not vectors or any(v is None for v in vectors):
             return None
+        return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
     
-    def embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
-        """Generate embeddings for multiple texts"""
-        if not self.embedder:
-            return [None] * len(texts)
+    def _encode_in_batches(
+        self,
+        texts: List[str],
+        done: int,
+        total: int,
+        progress: Optional[Callable[[int, int], None]]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Encode texts in batches of EMBEDDING_BATCH_SIZE, sorted by length so each
+        batch pads to similar lengths. Each batch is cached as soon as it is done
+        and retried on failure; a batch that keeps failing is encoded one text at
+        a time so only the texts that really fail come back missing.
+        """
+        vectors: Dict[str, np.ndarray] = {}
+        ordered = sorted(texts, key=len)
+        batch_size = max(1, Config.EMBEDDING_BATCH_SIZE)
         
-        try:
-            embeddings = self.embedder.encode(texts, convert_to_numpy=True)
-            return [emb.tolist() for emb in embeddings]
-        except Exception as e:
-            logger.error(f"Batch embedding failed: {e}")
-            return [None] * len(texts)
+        for start in range(0, len(ordered), batch_size):
+            batch = ordered[start:start + batch_size]
+            encoded = self._encode_with_retry(batch)
+            if encoded is not None:
+                fresh = dict(zip(batch, encoded))
+            elif get_registry().state("embedder") in (UNAVAILABLE, FAILED):
+                break
+            else:
+                fresh = {}
+                for text in batch:
+                    single = self._encode_with_retry([text], retries=0)
+                    if single is not None:
+                        fresh[text] = single[0]
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+            
+            done += len(batch)
+            if progress is not None:
+                progress(done, total)
+        
+        if len(vectors) < len(texts):
+            logger.error(f"Failed to embed {len(texts) - len(vectors)} of {len(texts)} texts")
+        return vectors
     
-    def similarity(self, emb1: List[float], emb2: List[float]) -> float:
+    def _encode_with_retry(self, texts: List[str], retries: Optional[int] = None) -> Optional[np.ndarray]:
+        retries = Config.EMBEDDING_BATCH_RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                encoded = self._encode(texts)
+                if encoded is None:
+                    logger.error("Embedder not available")
+                    return None
+                return encoded
+            except Exception as e:
+                logger.warning(f"Embedding batch of {len(texts)} failed (attempt {attempt + 1}): {e}")
+                if attempt < retries:
+                    time.sleep(0.5 * (attempt + 1))
+        return None
+    
+    def _encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Run the model on texts (one forward pass); None if the embedder can't be loaded"""
+        with get_registry().use("embedder") as embedder:
+            if embedder is None:
+                return None
+            return embedder.encode(texts)
+    
+    def similarity(self, emb1: np.ndarray, emb2: np.ndarray) -> float:
         """Calculate cosine similarity between two embeddings"""
-        if not emb1 or not emb2:
+        if emb1 is None or emb2 is None or len(emb1) == 0 or len(emb2) == 0:
             return 0.0
         
         try:
-            a, b = np.array(emb1), np.array(emb2)
-            dot_product = np.dot(a, b)
-            norm_a = np.linalg.norm(a)
-            norm_b = np.linalg.norm(b)
-            
-            if norm_a == 0 or norm_b == 0:
-                return 0.0
-            
-            return float(dot_product / (norm_a * norm_b))
+            return float(self.similarity_matrix(emb1, emb2)[0, 0])
         except Exception as e:
             logger.error(f"Similarity calculation failed: {e}")
             return 0.0
+    
+    @staticmethod
+    def similarity_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity between every row of `a` (n, dim) and every row of `b` (m, dim).
+        1-D inputs are treated as a single row. Returns an (n, m) float32 matrix;
+        zero vectors score 0.
+        """
+        a = np.atleast_2d(np.asarray(a, dtype=np.float32))
+        b = np.atleast_2d(np.asarray(b, dtype=np.float32))
+        a_norm = np.linalg.norm(a, axis=1, keepdims=True)
+        b_norm = np.linalg.norm(b, axis=1, keepdims=True)
+        a_norm[a_norm == 0] = 1.0
+        b_norm[b_norm == 0] = 1.0
+        return (a / a_norm) @ (b / b_norm).T
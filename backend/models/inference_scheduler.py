@@ -0,0 +1,292 @@
+"""Long-lived inference scheduler shared by every LLM request"""
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_CHAT = 0
+PRIORITY_QUIZ = 10
+PRIORITY_BACKGROUND = 20
+
+_END = object()
+
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when the request queue is full"""
+
+
+class GenerationCancelled(Exception):
+    """Raised when a job is cancelled before it finishes"""
+
+
+class InferenceJob:
+    """A single generation request queued on the scheduler"""
+
+    def __init__(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        priority: int = PRIORITY_CHAT,
+        stream: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None
+    ):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.priority = priority
+        self.stream = stream
+        self.json_schema = json_schema  # constrain output to JSON matching this schema
+        self.backend: Optional[str] = None
+        self.failed_backends: Set[str] = set()
+        self.submitted_at = time.time()
+        self.future: Future = Future()
+        self._cancel_event = threading.Event()
+        self._tokens: Optional[queue.Queue] = queue.Queue() if stream else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set() or self.future.cancelled()
+
+    def cancel(self):
+        """Cancel the job. Queued jobs are dropped, running jobs stop at the next token."""
+        self._cancel_event.set()
+
+    def result(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Block until the full response is available"""
+        return self.future.result(timeout=timeout)
+
+    def tokens(self) -> Iterator[str]:
+        """Yield tokens as they are produced (stream jobs only).
+        Closing the iterator early cancels the job."""
+        if self._tokens is None:
+            raise RuntimeError("Job was not submitted with stream=True")
+        try:
+            while True:
+                item = self._tokens.get()
+                if item is _END:
+                    break
+                yield item
+            if self.future.done() and not self.future.cancelled():
+                error = self.future.exception()
+                if error is not None and not isinstance(error, GenerationCancelled):
+                    raise error
+        finally:
+            if not self.future.done():
+                self.cancel()
+
+    def _emit(self, token: str):
+        if self._tokens is not None:
+            self._tokens.put(token)
+
+    def _resolve(self, result: Optional[str] = None, error: Optional[BaseException] = None):
+        """Complete the job exactly once and close its token stream"""
+        if not self.future.done():
+            try:
+                if error is not None:
+                    self.future.set_exception(error)
+                else:
+                    self.future.set_result(result)
+            except Exception:
+                # Future was cancelled concurrently by its consumer
+                pass
+        if self._tokens is not None:
+            self._tokens.put(_END)
+
+
+class InferenceScheduler:
+    """
+    Priority queue in front of a fixed number of generation slots per backend.
+
+    Each job runs on exactly one backend. A job only falls over to another
+    backend if its first backend fails before producing any output.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, Callable[..., Iterator[str]]],
+        slots: Dict[str, int],
+        select_backends: Callable[[InferenceJob], List[str]],
+        max_queue: int = 32,
+        on_dispatch: Optional[Callable[[str], None]] = None,
+        on_success: Optional[Callable[[str, float, int, float], None]] = None,
+        on_failure: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Backends are called as `backend(prompt, max_tokens, temperature, json_schema=None)`.
+        `on_dispatch(backend)`, `on_success(backend, ttft, tokens, elapsed)` and
+        `on_failure(backend)` let a router observe every generation.
+        """
+        self._backends = backends
+        self._slot_counts = {name: max(1, slots.get(name, 1)) for name in backends}
+        self._free_slots = dict(self._slot_counts)
+        self._select_backends = select_backends
+        self._on_dispatch = on_dispatch
+        self._on_success = on_success
+        self._on_failure = on_failure
+        self._max_queue = max_queue
+        self._pending = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=sum(self._free_slots.values()),
+            thread_name_prefix="inference"
+        )
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="inference-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_CHAT,
+        stream: bool = False,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> InferenceJob:
+        """Queue a generation request. Raises SchedulerBusyError when the queue is full."""
+        job = InferenceJob(
+            prompt, max_tokens, temperature,
+            priority=priority, stream=stream, json_schema=json_schema
+        )
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Scheduler is shut down")
+            if len(self._pending) >= self._max_queue:
+                raise SchedulerBusyError(f"Inference queue is full ({self._max_queue} pending requests)")
+            self._push(job)
+        return job
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def is_idle(self) -> bool:
+        """True when nothing is queued or running (used to schedule background work)"""
+        with self._cond:
+            return not self._pending and all(
+                free == self._slot_counts[name] for name, free in self._free_slots.items()
+            )
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "queued": len(self._pending),
+                "free_slots": dict(self._free_slots)
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            for _, _, job in self._pending:
+                job.cancel()
+                job._resolve(error=GenerationCancelled())
+            self._pending.clear()
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False)
+
+    def _push(self, job: InferenceJob):
+        heapq.heappush(self._pending, (job.priority, next(self._counter), job))
+        self._cond.notify_all()
+
+    def _next_assignment(self):
+        """Pick the highest-priority job that has a backend with a free slot (lock held)"""
+        for entry in sorted(self._pending):
+            job = entry[2]
+            if job.cancelled:
+                self._remove(entry)
+                job._resolve(error=GenerationCancelled())
+                continue
+            candidates = [b for b in self._select_backends(job) if b not in job.failed_backends]
+            if not candidates:
+                self._remove(entry)
+                job._resolve(error=RuntimeError("No LLM backend available"))
+                continue
+            for backend in candidates:
+                if self._free_slots.get(backend, 0) > 0:
+                    self._remove(entry)
+                    return job, backend
+        return None, None
+
+    def _remove(self, entry):
+        self._pending.remove(entry)
+        heapq.heapify(self._pending)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._pending:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job, backend = self._next_assignment()
+                if job is None:
+                    # Nothing runnable right now; wait for a slot, a new job or a cancellation
+                    if self._pending:
+                        self._cond.wait(timeout=1.0)
+                    continue
+                self._free_slots[backend] -= 1
+            if self._on_dispatch:
+                self._on_dispatch(backend)
+            try:
+                self._executor.submit(self._run, job, backend)
+            except RuntimeError as e:
+                # Executor shut down (e.g. interpreter exit)
+                job._resolve(error=e)
+                return
+
+    def _run(self, job: InferenceJob, backend: str):
+        job.backend = backend
+        parts = []
+        stream = None
+        retry = False
+        start_time = time.time()
+        ttft = None
+        try:
+            stream = self._backends[backend](
+                job.prompt, job.max_tokens, job.temperature, json_schema=job.json_schema
+            )
+            for token in stream:
+                if ttft is None:
+                    ttft = time.time() - start_time
+                if job.cancelled:
+                    break
+                parts.append(token)
+                job._emit(token)
+            if job.cancelled:
+                logger.info(f"Generation cancelled on {backend} after {len(parts)} tokens")
+                job._resolve(error=GenerationCancelled())
+            else:
+                elapsed = time.time() - start_time
+                logger.info(f"{backend} generated {len(parts)} tokens in {elapsed:.2f}s")
+                if self._on_success:
+                    self._on_success(backend, ttft if ttft is not None else elapsed, len(parts), elapsed)
+                job._resolve(result="".join(parts).strip() or None)
+        except Exception as e:
+            if self._on_failure:
+                self._on_failure(backend)
+            if not parts and not job.cancelled:
+                logger.warning(f"Backend {backend} failed before producing output: {e}")
+                retry = True
+            else:
+                logger.error(f"Backend {backend} failed mid-generation: {e}")
+                job._resolve(error=e)
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                # Closing the generator stops llama-cpp evaluation / the Ollama HTTP stream
+                stream.close()
+            with self._cond:
+                self._free_slots[backend] += 1
+                if retry:
+                    # Re-queue the job for the remaining backends
+                    job.failed_backends.add(backend)
+                    self._push(job)
+                self._cond.notify_all()
@@ -1,30 +1,84 @@
 """Unified LLM Manager - Uses Ollama if available, falls back to local llama-cpp"""
+import asyncio
+import concurrent.futures
 import logging
-import time
-import requests
-from typing import Optional, Tuple
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from backend.config import Config
 from .ollama_handler import OllamaHandler as LocalLLMHandler
+from .backend_router import BackendRouter
+from .ollama_client import get_ollama_client
+from .inference_scheduler import (
+    InferenceScheduler,
+    InferenceJob,
+    GenerationCancelled,
+    PRIORITY_CHAT,
+)
 
 logger = logging.getLogger(__name__)
 
 class LLMManager:
     def __init__(self):
         self.local_llm = LocalLLMHandler()
-        self.ollama_base_url = "http://localhost:11434"
+        self.ollama = get_ollama_client()
+        self.ollama_base_url = self.ollama.base_url
         self.ollama_model = "mistral:7b"  # Default Ollama model
         self.ollama_available = False
-        self.preferred_backend = None
+        self._pull_attempted = False
         
-        # Check which backends are available
-        self._check_availability()
+        # Health monitoring, EWMA latency tracking and circuit breaking per backend.
+        # Ollama is listed first so it wins ties before anything has been measured.
+        self.router = BackendRouter(
+            probes={
+                "ollama": self._probe_ollama,
+                "local": self.local_llm.is_available,
+            },
+            alpha=Config.LLM_ROUTER_EWMA_ALPHA,
+            check_interval=Config.LLM_HEALTH_CHECK_INTERVAL,
+            failure_threshold=Config.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.LLM_BREAKER_RESET_TIMEOUT
+        )
+        
+        # The local probe is a file check; the Ollama probe is a network call,
+        # so the first full check runs in the background instead of blocking startup
+        self.router.check_now(["local"])
+        threading.Thread(target=self._check_availability, name="llm-availability", daemon=True).start()
+        self.router.start()
+        
+        # One long-lived scheduler shared by every request
+        self.scheduler = InferenceScheduler(
+            backends={
+                "ollama": self._generate_ollama_stream,
+                "local": self._generate_local_stream,
+            },
+            slots={
+                "ollama": Config.OLLAMA_SLOTS,
+                "local": Config.LOCAL_LLM_SLOTS,
+            },
+            select_backends=self._select_backends,
+            max_queue=Config.LLM_QUEUE_SIZE,
+            on_dispatch=self.router.on_dispatch,
+            on_success=self.router.record_success,
+            on_failure=self.router.record_failure
+        )
     
     def _check_availability(self):
         """Check which LLM backends are available"""
-        # Check Ollama
+        self.router.check_now()
+        
+        preferred = self.router.choose()
+        if preferred == ["ollama"]:
+            logger.info("Using Ollama as primary LLM backend")
+        elif preferred == ["local"]:
+            logger.info("Using local llama-cpp as LLM backend")
+        else:
+            logger.warning("No LLM backend available")
+    
+    def _probe_ollama(self) -> bool:
+        """Health probe for Ollama; also picks the model to use"""
         try:
-            response = requests.get(f"{self.ollama_base_url}/api/tags", timeout=3)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
+            models = self.ollama.list_models(timeout=3)
+            if models is not None:
                 if models:
                     # Try to find mistral or use first available
                     mistral_models = [m for m in models if "mistral" in m.get("name", "").lower()]
@@ -41,132 +95,190 @@ class LLMManager:
                                 break
                         if not found:
                             self.ollama_model = models[0]["name"]
+                    if not self.ollama_available:
+                        logger.info(f"Ollama available with model: {self.ollama_model}")
                     self.ollama_available = True
-                    logger.info(f"Ollama available with model: {self.ollama_model}")
                 else:
-                    # No models, try to pull mistral
-                    logger.info("Ollama available but no models. Attempting to pull mistral:7b...")
-                    try:
-                        pull_response = requests.post(
-                            f"{self.ollama_base_url}/api/pull",
-                            json={"name": "mistral:7b"},
-                            timeout=300  # 5 minutes for model download
-                        )
-                        if pull_response.status_code == 200:
-                            self.ollama_model = "mistral:7b"
-                            self.ollama_available = True
-                            logger.info("Successfully pulled mistral:7b model")
-                    except:
-                        logger.warning("Could not pull model automatically")
+                    if Config.OLLAMA_AUTO_PULL and not self._pull_attempted:
+                        # No models: pull mistral once, in its own thread so probes stay fast
+                        self._pull_attempted = True
+                        threading.Thread(target=self._pull_default_model, name="ollama-pull", daemon=True).start()
+                    self.ollama_available = False
+            else:
+                self.ollama_available = False
         except Exception as e:
             logger.debug(f"Ollama not available: {e}")
             self.ollama_available = False
-        
-        # Check local LLM
-        local_available = self.local_llm.is_available()
-        
-        # Prefer Ollama if both available (usually faster)
-        if self.ollama_available:
-            self.preferred_backend = "ollama"
-            logger.info("Using Ollama as primary LLM backend")
-        elif local_available:
-            self.preferred_backend = "local"
-            logger.info("Using local llama-cpp as LLM backend")
-        else:
-            self.preferred_backend = None
-            logger.warning("No LLM backend available")
+        return self.ollama_available
+    
+    def warm_prefixes(self, prefixes: List[str]):
+        """Prefill shared prompt prefixes on the local model so later requests skip them"""
+        if self.local_llm.is_available():
+            self.local_llm.warm_prefixes(prefixes)
+    
+    def _pull_default_model(self):
+        logger.info("Ollama available but no models. Attempting to pull mistral:7b...")
+        try:
+            if self.ollama.pull("mistral:7b", timeout=300):  # 5 minutes for model download
+                logger.info("Successfully pulled mistral:7b model")
+                self.router.check_now(["ollama"])
+        except Exception:
+            logger.warning("Could not pull model automatically")
     
     def is_available(self) -> bool:
         """Check if any LLM backend is available"""
-        return self.ollama_available or self.local_llm.is_available()
+        return self.router.any_healthy()
     
-    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7) -> Optional[str]:
+    def backend_status(self) -> Dict:
+        """Health, circuit state and measured speed of each backend"""
+        status = self.router.snapshot()
+        status["ollama"]["model"] = self.ollama_model
+        return {
+            "backends": status,
+            "preferred": next(iter(self.router.choose()), None),
+            "scheduler": self.scheduler.stats()
+        }
+    
+    def _select_backends(self, job: InferenceJob) -> List[str]:
+        """Route the job to the fastest healthy backend it has not already failed on"""
+        return self.router.choose(job.max_tokens, exclude=job.failed_backends)
+    
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_CHAT,
+        timeout: Optional[float] = None,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
         """
-        Generate response using fastest available backend.
-        Uses concurrent requests to get the fastest response.
+        Generate a response on a single backend via the shared scheduler.
+        With `json_schema`, the output is constrained to JSON matching the schema
+        (a grammar on llama-cpp, JSON mode on Ollama).
+        Raises SchedulerBusyError when the request queue is full.
         """
         if not self.is_available():
             return None
         
-        import concurrent.futures
-        
-        # Try both backends concurrently and return the first result
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            futures = {}
-            
-            # Start Ollama if available
-            if self.ollama_available:
-                futures['ollama'] = executor.submit(self._generate_ollama, prompt, max_tokens, temperature)
-            
-            # Start local LLM if available
-            if self.local_llm.is_available():
-                futures['local'] = executor.submit(self._generate_local, prompt, max_tokens, temperature)
-            
-            # Wait for first successful result
-            for future in concurrent.futures.as_completed(futures.values(), timeout=60):
-                try:
-                    result = future.result(timeout=0.1)
-                    if result:
-                        # Cancel other futures
-                        for f in futures.values():
-                            f.cancel()
-                        return result
-                except Exception as e:
-                    logger.debug(f"One backend failed: {e}")
-                    continue
-        
-        return None
-    
-    def _generate_ollama(self, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
-        """Generate using Ollama API"""
+        job = self.scheduler.submit(prompt, max_tokens, temperature, priority=priority, json_schema=json_schema)
         try:
-            # Format prompt for Mistral
-            formatted_prompt = f"[INST] {prompt} [/INST]"
-            
-            payload = {
-                "model": self.ollama_model,
-                "prompt": formatted_prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": max_tokens,
-                    "temperature": temperature
-                }
-            }
-            
-            start_time = time.time()
-            response = requests.post(
-                f"{self.ollama_base_url}/api/generate",
-                json=payload,
-                timeout=120  # 2 minutes timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                response_text = result.get("response", "").strip()
-                elapsed = time.time() - start_time
-                logger.info(f"Ollama response generated in {elapsed:.2f}s")
-                return response_text
-            else:
-                logger.error(f"Ollama API error: {response.status_code}")
-                return None
-                
-        except requests.exceptions.Timeout:
-            logger.warning("Ollama request timed out")
+            return job.result(timeout=timeout or Config.LLM_REQUEST_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            logger.warning("LLM request timed out, cancelling")
+            job.cancel()
+            return None
+        except GenerationCancelled:
             return None
         except Exception as e:
-            logger.error(f"Ollama generation failed: {e}")
+            logger.error(f"LLM generation failed: {e}")
+            return None
+    
+    def submit(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_CHAT,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Optional[InferenceJob]:
+        """
+        Queue a generation without waiting for it, so several can run concurrently.
+        Returns None if no backend is available.
+        Raises SchedulerBusyError when the request queue is full.
+        """
+        if not self.is_available():
             return None
+        return self.scheduler.submit(prompt, max_tokens, temperature, priority=priority, json_schema=json_schema)
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_CHAT,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """
+        Stream response tokens from a single backend via the shared scheduler.
+        Closing the returned iterator cancels the generation.
+        Raises SchedulerBusyError when the request queue is full.
+        """
+        if not self.is_available():
+            return iter(())
+        
+        job = self.scheduler.submit(
+            prompt, max_tokens, temperature,
+            priority=priority, stream=True, json_schema=json_schema
+        )
+        return job.tokens()
     
-    def _generate_local(self, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
-        """Generate using local llama-cpp"""
+    async def agenerate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_CHAT,
+        timeout: Optional[float] = None,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        Async counterpart of generate() for FastAPI endpoints.
+        Awaits the scheduler job without blocking the event loop; if the
+        awaiting request is cancelled, the generation is cancelled too.
+        Raises SchedulerBusyError when the request queue is full.
+        """
+        if not self.is_available():
+            return None
+        
+        job = self.scheduler.submit(prompt, max_tokens, temperature, priority=priority, json_schema=json_schema)
         try:
-            start_time = time.time()
-            result = self.local_llm.generate(prompt)
-            if result:
-                elapsed = time.time() - start_time
-                logger.info(f"Local LLM response generated in {elapsed:.2f}s")
-            return result
+            return await asyncio.wait_for(
+                asyncio.wrap_future(job.future),
+                timeout=timeout or Config.LLM_REQUEST_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning("LLM request timed out, cancelling")
+            job.cancel()
+            return None
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+        except GenerationCancelled:
+            return None
         except Exception as e:
-            logger.error(f"Local LLM generation failed: {e}")
+            logger.error(f"LLM generation failed: {e}")
             return None
-
+    
+    def _generate_ollama_stream(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Stream tokens from Ollama over the shared keep-alive connection pool"""
+        formatted_prompt = f"[INST] {prompt} [/INST]"
+        
+        return self.ollama.generate_stream(
+            self.ollama_model,
+            formatted_prompt,
+            options={
+                "num_predict": max_tokens,
+                "temperature": temperature
+            },
+            # Ollama's JSON mode guarantees syntactically valid JSON; the schema itself is in the prompt
+            format="json" if json_schema is not None else None
+        )
+    
+    def _generate_local_stream(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Stream tokens from local llama-cpp"""
+        return self.local_llm.generate_stream(
+            prompt, max_tokens=max_tokens, temperature=temperature, json_schema=json_schema
+        )
@@ -0,0 +1,297 @@
+"""
+Model lifecycle manager.
+
+Models are registered as loaders and load on first use or in a background
+warm-up. Callers borrow a model with `use(name)`, which reference-counts it
+for the duration of the request. Models that have sat unused for longer than
+their idle timeout are unloaded, and loading a model that would exceed the
+RAM budget first unloads idle models (least recently used first).
+"""
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+UNAVAILABLE = "unavailable"  # loader returned None (missing file / package)
+FAILED = "failed"
+
+
+class _Entry:
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warm: bool,
+        size_bytes: Optional[Callable[[Any], int]],
+        idle_timeout: float,
+        unloader: Optional[Callable[[Any], None]]
+    ):
+        self.name = name
+        self.loader = loader
+        self.warm = warm
+        self.size_estimator = size_bytes
+        self.idle_timeout = idle_timeout
+        self.unloader = unloader
+        self.state = PENDING
+        self.model = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.size_bytes = 0
+        self.expected_bytes = 0  # size seen on the last load, kept across unloads
+        self.refcount = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Holds a loader per model name instead of the model itself.
+
+    `use(name)` loads the model on first use (concurrent callers wait for the
+    same load) and pins it while the caller holds it. `warm_async()` loads
+    every model registered with warm=True in a background thread so the API
+    can start serving immediately.
+    """
+
+    def __init__(self, budget_bytes: int = 0, check_interval: float = 30.0):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._warm_thread: Optional[threading.Thread] = None
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.budget_bytes = budget_bytes
+        self.check_interval = check_interval
+
+    def configure(self, budget_bytes: Optional[int] = None, check_interval: Optional[float] = None):
+        if budget_bytes is not None:
+            self.budget_bytes = budget_bytes
+        if check_interval is not None:
+            self.check_interval = check_interval
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warm: bool = True,
+        size_bytes: Optional[Callable[[Any], int]] = None,
+        idle_timeout: float = 0,
+        unloader: Optional[Callable[[Any], None]] = None
+    ):
+        """
+        Register a loader. The first registration of a name wins; later ones are ignored.
+
+        Args:
+            size_bytes: Returns the loaded model's resident size (for the RAM budget)
+            idle_timeout: Seconds unused before the model is unloaded (0 = never)
+            unloader: Releases the model's resources (optional, e.g. `close()`)
+        """
+        with self._lock:
+            if name in self._entries:
+                return
+            self._entries[name] = _Entry(name, loader, warm, size_bytes, idle_timeout, unloader)
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """Borrow a model for the duration of a request (None if it can't be loaded)"""
+        entry = self._entry(name)
+        model = self._acquire(entry)
+        try:
+            yield model
+        finally:
+            if model is not None:
+                with self._lock:
+                    entry.refcount -= 1
+                    entry.last_used = time.time()
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it now if needed, without pinning it.
+        Prefer `use()` for anything longer than a quick check."""
+        with self.use(name) as model:
+            return model
+
+    def peek(self, name: str) -> Any:
+        """Return the model only if it is already loaded (never triggers a load)"""
+        entry = self._entries.get(name)
+        return entry.model if entry is not None and entry.state == READY else None
+
+    def state(self, name: str) -> str:
+        entry = self._entries.get(name)
+        return entry.state if entry is not None else UNAVAILABLE
+
+    def is_ready(self, names: Optional[Iterable[str]] = None) -> bool:
+        """True once every (warm) model has finished loading or been found unavailable"""
+        entries = [self._entries[n] for n in names] if names else [e for e in self._entries.values() if e.warm]
+        return all(e.state != LOADING and (e.state != PENDING or e.loads > 0) for e in entries)
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(e.size_bytes for e in self._entries.values() if e.state == READY)
+
+    def status(self) -> Dict[str, Dict]:
+        now = time.time()
+        with self._lock:
+            return {
+                name: {
+                    "state": e.state,
+                    "load_seconds": round(e.load_seconds, 3) if e.load_seconds is not None else None,
+                    "error": e.error,
+                    "warm": e.warm,
+                    "size_mb": round(e.size_bytes / (1024 * 1024), 1) if e.state == READY else 0,
+                    "in_use": e.refcount,
+                    "idle_seconds": round(now - e.last_used, 1) if e.state == READY else None,
+                    "loads": e.loads
+                }
+                for name, e in self._entries.items()
+            }
+
+    def unload(self, name: str) -> bool:
+        """Unload a model if nobody is using it. Returns True if it was unloaded."""
+        entry = self._entry(name)
+        if not entry.lock.acquire(blocking=False):
+            return False  # currently loading
+        try:
+            with self._lock:
+                if entry.state != READY or entry.refcount > 0:
+                    return False
+                model = entry.model
+                entry.model = None
+                entry.state = PENDING
+                freed = entry.size_bytes
+                entry.size_bytes = 0
+        finally:
+            entry.lock.release()
+
+        if entry.unloader is not None:
+            try:
+                entry.unloader(model)
+            except Exception as e:
+                logger.warning(f"Unloader for {name} failed: {e}")
+        del model
+        gc.collect()
+        logger.info(f"Unloaded model {name} (freed ~{freed / (1024 * 1024):.0f}MB)")
+        return True
+
+    def warm_async(self, then: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Load all warm models in a background thread, then run `then` (if given)"""
+        if self._warm_thread is not None:
+            return self._warm_thread
+
+        def warm():
+            for name, entry in list(self._entries.items()):
+                if entry.warm:
+                    self.get(name)
+            if then is not None:
+                try:
+                    then()
+                except Exception as e:
+                    logger.error(f"Post warm-up hook failed: {e}")
+            logger.info(f"Model warm-up finished: {self.status()}")
+
+        self._warm_thread = threading.Thread(target=warm, name="model-warmup", daemon=True)
+        self._warm_thread.start()
+        return self._warm_thread
+
+    def start_reaper(self):
+        """Start the background thread that unloads idle models"""
+        if self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _entry(self, name: str) -> _Entry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+        return entry
+
+    def _acquire(self, entry: _Entry) -> Any:
+        if entry.state in (UNAVAILABLE, FAILED):
+            return None
+
+        with entry.lock:
+            if entry.state == PENDING:
+                self._load(entry)
+            with self._lock:
+                if entry.state != READY:
+                    return None
+                entry.refcount += 1
+                entry.last_used = time.time()
+                return entry.model
+
+    def _load(self, entry: _Entry):
+        self._make_room(entry)
+        entry.state = LOADING
+        start = time.perf_counter()
+        try:
+            model = entry.loader()
+            entry.model = model
+            entry.state = READY if model is not None else UNAVAILABLE
+        except Exception as e:
+            logger.error(f"Failed to load model {entry.name}: {e}")
+            entry.error = str(e)
+            entry.state = FAILED
+        entry.load_seconds = time.perf_counter() - start
+        entry.loads += 1
+        entry.last_used = time.time()
+
+        if entry.state == READY and entry.size_estimator is not None:
+            try:
+                entry.size_bytes = int(entry.size_estimator(entry.model))
+                entry.expected_bytes = entry.size_bytes
+            except Exception as e:
+                logger.debug(f"Could not measure size of {entry.name}: {e}")
+        logger.info(f"Model {entry.name} {entry.state} after {entry.load_seconds:.2f}s")
+
+    def _make_room(self, incoming: _Entry):
+        """Unload idle models (least recently used first) until the incoming one fits the budget"""
+        if self.budget_bytes <= 0:
+            return
+
+        # Size is only known after the first load; assume the same size on reloads
+        needed = incoming.expected_bytes
+        with self._lock:
+            idle = sorted(
+                (e for e in self._entries.values() if e is not incoming and e.state == READY and e.refcount == 0),
+                key=lambda e: e.last_used
+            )
+        for entry in idle:
+            if self.resident_bytes() + needed <= self.budget_bytes:
+                return
+            self.unload(entry.name)
+
+        if self.resident_bytes() + needed > self.budget_bytes:
+            logger.warning(
+                f"Loading {incoming.name} exceeds the model RAM budget "
+                f"({self.budget_bytes / (1024 * 1024):.0f}MB); models in use cannot be unloaded"
+            )
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.check_interval):
+            now = time.time()
+            for name, entry in list(self._entries.items()):
+                if (
+                    entry.idle_timeout > 0
+                    and entry.state == READY
+                    and entry.refcount == 0
+                    and now - entry.last_used >= entry.idle_timeout
+                ):
+                    self.unload(name)
+
+
+_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    """Get the process-wide model registry"""
+    return _registry
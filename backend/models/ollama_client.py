@@ -0,0 +1,125 @@
+"""Shared keep-alive HTTP client for the Ollama API"""
+import json
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class OllamaClient:
+    """
+    Thin wrapper around one pooled `requests.Session`.
+
+    Connections are reused across requests (HTTP keep-alive) instead of opening
+    a new TCP connection per generation, and every generate request carries
+    Ollama's `keep_alive` so the model stays loaded between requests.
+    """
+
+    def __init__(self, base_url: str = None, keep_alive: str = None, pool_size: int = None):
+        self.base_url = (base_url or Config.OLLAMA_BASE_URL).rstrip("/")
+        self.keep_alive = keep_alive or Config.OLLAMA_KEEP_ALIVE
+        pool_size = pool_size or Config.OLLAMA_POOL_SIZE
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def list_models(self, timeout: float = 3) -> Optional[List[Dict]]:
+        """Return the installed models, or None if Ollama is unreachable"""
+        response = self.session.get(f"{self.base_url}/api/tags", timeout=timeout)
+        if response.status_code != 200:
+            return None
+        return response.json().get("models", [])
+
+    def pull(self, model: str, timeout: float = 300) -> bool:
+        response = self.session.post(
+            f"{self.base_url}/api/pull",
+            json={"name": model, "stream": False},
+            timeout=timeout
+        )
+        return response.status_code == 200
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict] = None,
+        timeout: float = None,
+        format: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream response text from /api/generate (newline-delimited JSON).
+        Closing the iterator closes the HTTP stream, which stops generation.
+        `format="json"` turns on Ollama's constrained JSON output."""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": options or {}
+        }
+        if format:
+            payload["format"] = format
+
+        with self.session.post(
+            f"{self.base_url}/api/generate",
+            json=payload,
+            stream=True,
+            timeout=timeout or Config.OLLAMA_TIMEOUT
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Ollama API error: {response.status_code}")
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                token = chunk.get("response", "")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    break
+
+    def embed(self, model: str, texts: List[str], timeout: float = None) -> np.ndarray:
+        """Embed a batch of texts with one /api/embed request. Returns an (n, dim) float32 matrix."""
+        response = self.session.post(
+            f"{self.base_url}/api/embed",
+            json={"model": model, "input": texts, "keep_alive": self.keep_alive},
+            timeout=timeout or Config.OLLAMA_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama embed error: {response.status_code} {response.text[:200]}")
+
+        embeddings = response.json().get("embeddings") or []
+        if len(embeddings) != len(texts):
+            raise RuntimeError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def close(self):
+        self.session.close()
+
+
+def get_ollama_client() -> OllamaClient:
+    """Get the process-wide Ollama client"""
+    global _client
+
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+            logger.info(f"Created pooled Ollama client for {_client.base_url}")
+    return _client
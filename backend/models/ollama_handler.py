@@ -1,5 +1,12 @@
 import os
+import importlib.util
+import json
 import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from backend.config import Config
+from .model_registry import get_registry, READY, UNAVAILABLE, FAILED
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ollama_handler")
@@ -7,47 +14,137 @@ logger = logging.getLogger("ollama_handler")
 MODEL_FILENAME = "mistral-7b-instruct-v0.2.Q4_K_M.gguf"
 MODEL_PATH = os.path.join(os.path.dirname(__file__), MODEL_FILENAME)
 
-_llm = None
-
-try:
-    from llama_cpp import Llama
-
-    if os.path.exists(MODEL_PATH):
-        _llm = Llama(
-            model_path=MODEL_PATH,
-            n_ctx=4096,
-            n_threads=6,
-            n_batch=512,
-            verbose=False
-        )
-        logger.info(f"Loaded GGUF model: {MODEL_PATH}")
-    else:
+
+def _load_llm():
+    """Load the GGUF model (called lazily through the model registry)"""
+    try:
+        from llama_cpp import Llama, LlamaRAMCache
+    except Exception as e:
+        logger.error(f"llama_cpp not available: {e}")
+        return None
+
+    if not os.path.exists(MODEL_PATH):
         logger.error(f"Model file missing: {MODEL_PATH}")
+        return None
+
+    # mmap lets the OS page the weights back in quickly after an idle unload;
+    # mlock pins them in RAM (needs a sufficient RLIMIT_MEMLOCK)
+    llm = Llama(
+        model_path=MODEL_PATH,
+        n_ctx=4096,
+        n_threads=6,
+        n_batch=512,
+        use_mmap=Config.LLM_USE_MMAP,
+        use_mlock=Config.LLM_USE_MLOCK,
+        verbose=False
+    )
+    logger.info(f"Loaded GGUF model: {MODEL_PATH}")
+
+    # Saved KV states keyed by prompt tokens. llama-cpp restores the state
+    # with the longest matching prefix, so only the new suffix is prefilled.
+    if Config.LLM_PREFIX_CACHE_BYTES > 0:
+        llm.set_cache(LlamaRAMCache(capacity_bytes=Config.LLM_PREFIX_CACHE_BYTES))
+    return llm
+
+
+def _close_llm(llm):
+    close = getattr(llm, "close", None)
+    if close is not None:
+        close()
 
-except Exception as e:
-    logger.exception("Failed to load llama_cpp model: %s", str(e))
-    _llm = None
+
+get_registry().register(
+    "llm",
+    _load_llm,
+    size_bytes=lambda llm: os.path.getsize(MODEL_PATH),
+    idle_timeout=Config.LLM_IDLE_TIMEOUT,
+    unloader=_close_llm
+)
+
+# The Llama instance is not re-entrant
+_llm_lock = threading.Lock()
+
+# Compiled grammars keyed by their JSON schema (building a grammar parses the GBNF)
+_grammars: Dict[str, Any] = {}
+_grammars_lock = threading.Lock()
+_grammar_failed = False
+
+
+def _grammar_for(json_schema: Optional[Dict[str, Any]]):
+    """Return a llama-cpp grammar restricting output to `json_schema`, or None"""
+    global _grammar_failed
+    if json_schema is None:
+        return None
+
+    key = json.dumps(json_schema, sort_keys=True)
+    with _grammars_lock:
+        if key in _grammars:
+            return _grammars[key]
+        try:
+            # The bundled schema converter; LlamaGrammar.from_json_schema only exists in newer releases
+            from llama_cpp.llama_grammar import LlamaGrammar, json_schema_to_gbnf
+            grammar = LlamaGrammar.from_string(json_schema_to_gbnf(key), verbose=False)
+        except Exception as e:
+            if not _grammar_failed:
+                logger.error(f"JSON-schema grammars unavailable, structured output is NOT constrained: {e}")
+                _grammar_failed = True
+            grammar = None
+        _grammars[key] = grammar
+        return grammar
+
+
+def get_llm():
+    """Get the llama-cpp model, loading it on first use"""
+    return get_registry().get("llm")
 
 
 class OllamaHandler:
-    def __init__(self):
-        self.model = _llm
+    @property
+    def prefix_cache(self):
+        model = get_registry().peek("llm")
+        return getattr(model, "cache", None)
 
     def is_available(self):
-        return self.model is not None
+        """True if the model is loaded or can be loaded (does not trigger loading)"""
+        state = get_registry().state("llm")
+        if state == READY:
+            return True
+        if state in (UNAVAILABLE, FAILED):
+            return False
+        return os.path.exists(MODEL_PATH) and importlib.util.find_spec("llama_cpp") is not None
 
-    def generate(self, prompt: str):
-        if self.model is None:
-            return None
+    def warm_prefixes(self, prefixes: Iterable[str]):
+        """Prefill common prompt prefixes (e.g. mode instructions) into the prefix cache"""
+        with get_registry().use("llm") as model:
+            if model is None or getattr(model, "cache", None) is None:
+                return
 
+            for prefix in prefixes:
+                if not prefix:
+                    continue
+                try:
+                    tokens = model.tokenize(f"[INST] {prefix}\n\n".encode("utf-8"))
+                    with _llm_lock:
+                        model.reset()
+                        model.eval(tokens)
+                        model.cache[tokens] = model.save_state()
+                    logger.info(f"Cached prefix state ({len(tokens)} tokens)")
+                except Exception as e:
+                    logger.warning(f"Failed to warm prompt prefix: {e}")
+
+    def generate(self, prompt: str):
         try:
             formatted_prompt = f"[INST] {prompt} [/INST]"
 
-            output = self.model(
-                prompt=formatted_prompt,
-                max_tokens=512,
-                temperature=0.5,
-            )
+            with get_registry().use("llm") as model:
+                if model is None:
+                    return None
+                with _llm_lock:
+                    output = model(
+                        prompt=formatted_prompt,
+                        max_tokens=512,
+                        temperature=0.5,
+                    )
 
             if isinstance(output, dict) and "choices" in output:
                 return output["choices"][0]["text"].strip()
@@ -57,3 +154,34 @@ class OllamaHandler:
         except Exception as e:
             logger.exception("Generation error:", e)
             return None
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.5,
+        json_schema: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Yield generated text pieces as llama-cpp produces them.
+        With `json_schema`, sampling is constrained by a grammar so the output is schema-valid JSON."""
+        formatted_prompt = f"[INST] {prompt} [/INST]"
+        grammar = _grammar_for(json_schema)
+
+        # The model stays pinned (not idle-unloaded) until the stream is exhausted or closed
+        with get_registry().use("llm") as model:
+            if model is None:
+                raise RuntimeError("Local LLM is not available")
+
+            with _llm_lock:
+                stream = model(
+                    prompt=formatted_prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    grammar=grammar,
+                    stream=True,
+                )
+
+                for chunk in stream:
+                    text = chunk["choices"][0].get("text", "")
+                    if text:
+                        yield text
@@ -0,0 +1,198 @@
+"""Fast batch grading of quiz answers"""
+import concurrent.futures
+import difflib
+import json
+import logging
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.models.inference_scheduler import PRIORITY_QUIZ
+
+logger = logging.getLogger(__name__)
+
+# Numbers keep their sign and decimal point ("-273.15"); other punctuation splits words
+_TOKEN = re.compile(r"(?<!\w)-?\d+(?:\.\d+)*|\w+", re.UNICODE)
+_NUMBER = re.compile(r"^-?\d+(?:\.\d+)*$")
+_ARTICLES = {"a", "an", "the"}
+_CHOICE = re.compile(r"^\(?([a-d])\)?[.):]?(\s|$)")
+
+CHOICE_TYPES = {"mcq", "true_false"}
+
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "correct": {"type": "boolean"},
+        "reason": {"type": "string"}
+    },
+    "required": ["correct", "reason"]
+}
+
+
+def normalize_answer(text: str) -> str:
+    """Lowercase and drop punctuation (except in numbers), articles and extra whitespace"""
+    return " ".join(t for t in _TOKEN.findall((text or "").lower()) if t not in _ARTICLES)
+
+
+def numeric_tokens(normalized: str) -> set:
+    """The numbers in a normalized answer, compared by value ("3.50" == "3.5")"""
+    numbers = set()
+    for token in normalized.split():
+        if _NUMBER.match(token):
+            try:
+                numbers.add(float(token))
+            except ValueError:
+                # Version-like tokens such as "1.2.3"
+                numbers.add(token)
+    return numbers
+
+
+class AnswerGrader:
+    """
+    Grades a whole quiz in one pass.
+
+    Choice questions compare the option letter. When the reference contains
+    numbers, the answer must contain exactly the same ones: otherwise it is
+    wrong, or borderline if it only adds numbers. Free-text answers are then
+    checked cheapest first: normalized exact match, fuzzy match (typos),
+    then cosine similarity of embeddings computed in a single batch for
+    every answer and reference. Only answers whose similarity falls between
+    the reject and accept thresholds are sent to the LLM, concurrently.
+    """
+
+    def __init__(
+        self,
+        embedding_manager,
+        llm=None,
+        accept_similarity: float = 0.85,
+        reject_similarity: float = 0.6,
+        fuzzy_ratio: float = 0.9,
+        llm_timeout: float = 30.0
+    ):
+        self.embedding_manager = embedding_manager
+        self.llm = llm
+        self.accept_similarity = accept_similarity
+        self.reject_similarity = reject_similarity
+        self.fuzzy_ratio = fuzzy_ratio
+        self.llm_timeout = llm_timeout
+
+    def grade(self, items: List[Dict]) -> List[Dict]:
+        """
+        Grade answers against reference answers.
+
+        Args:
+            items: Dicts with "answer", "correct_answer" and optionally "type" and "question"
+
+        Returns:
+            One result per item: {"correct", "score", "method"} (plus "reason" for LLM rulings)
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        semantic = []
+        borderline = []
+
+        for i, item in enumerate(items):
+            answer = normalize_answer(item.get("answer", ""))
+            reference = normalize_answer(item.get("correct_answer", ""))
+
+            if not answer:
+                results[i] = {"correct": False, "score": 0.0, "method": "empty"}
+            elif item.get("type") in CHOICE_TYPES:
+                results[i] = self._grade_choice(item)
+            elif numeric_tokens(reference) and numeric_tokens(answer) != numeric_tokens(reference):
+                # Similar wording says nothing about "1944" vs "1945"
+                results[i] = {"correct": False, "score": 0.0, "method": "numeric"}
+                if numeric_tokens(answer) > numeric_tokens(reference):
+                    borderline.append(i)
+            elif answer == reference:
+                results[i] = {"correct": True, "score": 1.0, "method": "exact"}
+            else:
+                ratio = difflib.SequenceMatcher(None, answer, reference).ratio()
+                if ratio >= self.fuzzy_ratio:
+                    results[i] = {"correct": True, "score": round(ratio, 3), "method": "fuzzy"}
+                else:
+                    semantic.append(i)
+
+        if semantic:
+            borderline += self._grade_semantic(items, semantic, results)
+        if borderline:
+            self._grade_with_llm(items, borderline, results)
+
+        return results
+
+    def _grade_choice(self, item: Dict) -> Dict:
+        """Compare option letters, accepting answers like "b", "B)" or "(b) ..." """
+        match = _CHOICE.match((item.get("answer") or "").strip().lower())
+        chosen = match.group(1) if match else None
+        if chosen is None and item.get("type") == "true_false":
+            chosen = {"true": "a", "false": "b"}.get(normalize_answer(item.get("answer", "")))
+        correct = chosen is not None and chosen == (item.get("correct_answer") or "").strip().lower()[:1]
+        return {"correct": correct, "score": 1.0 if correct else 0.0, "method": "choice"}
+
+    def _grade_semantic(self, items: List[Dict], indexes: List[int], results: List[Optional[Dict]]) -> List[int]:
+        """Score answers by cosine similarity; returns the borderline indexes"""
+        answers = [items[i].get("answer", "") for i in indexes]
+        references = [items[i].get("correct_answer", "") for i in indexes]
+        matrix = self.embedding_manager.embed_matrix(answers + references)
+
+        if matrix is None:
+            logger.warning("Embeddings unavailable for grading; sending answers to the LLM")
+            for i in indexes:
+                results[i] = {"correct": False, "score": 0.0, "method": "unscored"}
+            return list(indexes)
+
+        a, b = matrix[:len(indexes)], matrix[len(indexes):]
+        norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+        norms[norms == 0] = 1.0
+        scores = np.einsum("ij,ij->i", a, b) / norms
+
+        borderline = []
+        for i, score in zip(indexes, scores.tolist()):
+            results[i] = {
+                "correct": score >= self.accept_similarity,
+                "score": round(score, 3),
+                "method": "semantic"
+            }
+            if self.reject_similarity <= score < self.accept_similarity:
+                borderline.append(i)
+        return borderline
+
+    def _grade_with_llm(self, items: List[Dict], indexes: List[int], results: List[Optional[Dict]]):
+        """Ask the LLM to rule on borderline answers (concurrently); keeps the similarity verdict on failure"""
+        if self.llm is None or not self.llm.is_available():
+            return
+
+        jobs = {}
+        for i in indexes:
+            item = items[i]
+            prompt = f"""You are grading a quiz answer. Decide whether the student's answer means the same as the reference answer. Ignore spelling and wording differences.
+
+Question: {item.get("question", "")}
+Reference answer: {item.get("correct_answer", "")}
+Student answer: {item.get("answer", "")}
+
+Respond as JSON: {{"correct": true or false, "reason": "one short sentence"}}"""
+            try:
+                job = self.llm.submit(
+                    prompt, max_tokens=80, temperature=0.0,
+                    priority=PRIORITY_QUIZ, json_schema=VERDICT_SCHEMA
+                )
+            except Exception as e:
+                logger.warning(f"Could not queue LLM grading: {e}")
+                break
+            if job is not None:
+                jobs[job.future] = (i, job)
+
+        done, not_done = concurrent.futures.wait(list(jobs), timeout=self.llm_timeout)
+        for future in not_done:
+            jobs[future][1].cancel()
+
+        for future in done:
+            i, _ = jobs[future]
+            try:
+                verdict = json.loads(future.result() or "")
+                results[i]["correct"] = bool(verdict["correct"])
+                results[i]["reason"] = verdict.get("reason", "")
+                results[i]["method"] = "llm"
+            except Exception as e:
+                logger.warning(f"LLM grading failed for answer {i + 1}: {e}")
@@ -0,0 +1,330 @@
+"""Pre-generated quiz questions per document, topped up in the background"""
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .quiz_generator import is_duplicate_question
+
+logger = logging.getLogger(__name__)
+
+QUIZ_TYPES = ["simple", "advanced"]
+
+# Upper bound on the excerpt sent to the model for one background generation
+MAX_CONTEXT_CHARS = 3000
+
+
+class QuestionBank:
+    """
+    SQLite store of generated questions, indexed by document, page, difficulty
+    and quiz type. Document quizzes are drawn from here instead of generating
+    live; the least-served questions are handed out first.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.init_db()
+
+    def init_db(self):
+        """Initialize question bank tables"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS question_bank (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id TEXT NOT NULL,
+                page INTEGER,
+                difficulty TEXT NOT NULL,
+                quiz_type TEXT NOT NULL,
+                question TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                served INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_question_bank_lookup
+            ON question_bank (document_id, difficulty, quiz_type, page)
+        """)
+
+        conn.commit()
+        conn.close()
+
+    def add_questions(
+        self,
+        document_id: str,
+        page: Optional[int],
+        difficulty: str,
+        quiz_type: str,
+        questions: List[Dict]
+    ) -> int:
+        """Store questions, skipping ones that repeat a question already banked for the document. Returns the number added."""
+        existing = self._questions(document_id, difficulty, quiz_type)
+        fresh = []
+        for question in questions:
+            if not is_duplicate_question(question, existing):
+                existing.append(question)
+                fresh.append(question)
+        if not fresh:
+            return 0
+
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany(
+            """INSERT INTO question_bank (document_id, page, difficulty, quiz_type, question, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [(document_id, page, difficulty, quiz_type, json.dumps(q), now) for q in fresh]
+        )
+        conn.commit()
+        conn.close()
+        return len(fresh)
+
+    def draw(
+        self,
+        sources: Iterable[Tuple[str, Optional[int]]],
+        difficulty: str,
+        quiz_type: str,
+        num_questions: int
+    ) -> Optional[List[Dict]]:
+        """
+        Return `num_questions` banked questions generated from exactly these
+        (document_id, page) sources, least-served first, or None if they
+        can't fill the quiz. Other pages of the same documents are never
+        used: they may cover unrelated chapters. A page of None matches
+        questions banked from chunks without a page number.
+        """
+        pairs = {(d, p) for d, p in sources if d}
+        if not pairs:
+            return None
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            source_clause = " OR ".join(["(document_id = ? AND page IS ?)"] * len(pairs))
+            cursor.execute(
+                f"""SELECT id, question FROM question_bank
+                    WHERE ({source_clause}) AND difficulty = ? AND quiz_type = ?
+                    ORDER BY served ASC, RANDOM()
+                    LIMIT ?""",
+                [*(v for pair in pairs for v in pair), difficulty, quiz_type, num_questions * 3]
+            )
+            rows = cursor.fetchall()
+
+            chosen: List[Tuple[int, Dict]] = []
+            for row_id, raw in rows:
+                question = json.loads(raw)
+                if not is_duplicate_question(question, [q for _, q in chosen]):
+                    chosen.append((row_id, question))
+                if len(chosen) == num_questions:
+                    break
+
+            if len(chosen) < num_questions:
+                conn.close()
+                return None
+
+            cursor.executemany(
+                "UPDATE question_bank SET served = served + 1 WHERE id = ?",
+                [(row_id,) for row_id, _ in chosen]
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Question bank lookup failed: {e}")
+            return None
+
+        questions = [q for _, q in chosen]
+        random.shuffle(questions)
+        return questions
+
+    def count(self, document_id: str, difficulty: str, quiz_type: str) -> int:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM question_bank WHERE document_id = ? AND difficulty = ? AND quiz_type = ?",
+            (document_id, difficulty, quiz_type)
+        )
+        total = cursor.fetchone()[0]
+        conn.close()
+        return total
+
+    def page_counts(self, document_id: str, difficulty: str, quiz_type: str) -> Dict[int, int]:
+        """Number of banked questions per page"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT page, COUNT(*) FROM question_bank
+               WHERE document_id = ? AND difficulty = ? AND quiz_type = ?
+               GROUP BY page""",
+            (document_id, difficulty, quiz_type)
+        )
+        counts = dict(cursor.fetchall())
+        conn.close()
+        return counts
+
+    def delete_document(self, document_id: str) -> int:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM question_bank WHERE document_id = ?", (document_id,))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    def stats(self) -> Dict:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT document_id), COALESCE(SUM(served), 0) FROM question_bank")
+        total, documents, served = cursor.fetchone()
+        conn.close()
+        return {"questions": total, "documents": documents, "served": served}
+
+    def _questions(self, document_id: str, difficulty: str, quiz_type: str) -> List[Dict]:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT question FROM question_bank WHERE document_id = ? AND difficulty = ? AND quiz_type = ?",
+            (document_id, difficulty, quiz_type)
+        )
+        questions = [json.loads(r[0]) for r in cursor.fetchall()]
+        conn.close()
+        return questions
+
+
+class QuestionBankWorker:
+    """
+    Background thread that fills the question bank while the LLM is idle.
+
+    Newly ingested documents are queued with `enqueue()`; on start every
+    stored document is queued so banks left short by a restart get topped up.
+    Each round generates one batch for the least-covered page of the first
+    (difficulty, quiz type) level that still has a page below `target`
+    questions, at background priority so user requests always go first.
+    The target is per page because quizzes are only drawn from the pages
+    their retrieval hit.
+    """
+
+    def __init__(
+        self,
+        bank: QuestionBank,
+        quiz_generator,
+        chroma_store,
+        llm,
+        target: int = 5,
+        batch_size: int = 5,
+        idle_interval: float = 10.0,
+        difficulties: Optional[List[str]] = None
+    ):
+        self.bank = bank
+        self.quiz_generator = quiz_generator
+        self.chroma_store = chroma_store
+        self.llm = llm
+        self.target = target
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.levels = [(d.strip(), t) for d in (difficulties or ["medium"]) if d.strip() for t in QUIZ_TYPES]
+        self._queue: List[str] = []
+        # (document, difficulty, quiz type, page) that produced nothing new
+        self._exhausted = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="question-bank", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def enqueue(self, document_id: str):
+        """Schedule a document for (re)filling"""
+        with self._lock:
+            if document_id not in self._queue:
+                self._queue.append(document_id)
+            self._exhausted = {key for key in self._exhausted if key[0] != document_id}
+        self._wake.set()
+
+    def forget(self, document_id: str):
+        with self._lock:
+            if document_id in self._queue:
+                self._queue.remove(document_id)
+
+    def pending(self) -> List[str]:
+        with self._lock:
+            return list(self._queue)
+
+    def _run(self):
+        for doc in self.chroma_store.get_document_info():
+            self.enqueue(doc["document_id"])
+
+        while not self._stop.is_set():
+            self._wake.wait(self.idle_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+
+            # Keep going while there is work and nobody else needs the LLM
+            while self.pending() and self._is_idle() and not self._stop.is_set():
+                try:
+                    self._fill_once()
+                except Exception as e:
+                    logger.error(f"Question bank refill failed: {e}")
+                    break
+
+    def _is_idle(self) -> bool:
+        return self.llm.is_available() and self.llm.scheduler.is_idle()
+
+    def _fill_once(self):
+        document_id = self.pending()[0]
+        chunks = self.chroma_store.get_document_chunks(document_id)
+        pages: Dict[Optional[int], List[str]] = {}
+        for chunk in chunks:
+            pages.setdefault(chunk["metadata"].get("page"), []).append(chunk["text"])
+
+        level, page = None, None
+        for difficulty, quiz_type in self.levels:
+            short = self._pages_below_target(document_id, difficulty, quiz_type, pages)
+            if short:
+                level, page = (difficulty, quiz_type), short[0]
+                break
+        if level is None:
+            # Full (or the document is gone)
+            self.forget(document_id)
+            return
+
+        difficulty, quiz_type = level
+        context = "\n\n".join(pages[page])[:MAX_CONTEXT_CHARS]
+        questions = self.quiz_generator.generate_bank_questions(
+            context, self.batch_size, difficulty=difficulty, quiz_type=quiz_type
+        )
+        added = self.bank.add_questions(document_id, page, difficulty, quiz_type, questions)
+        logger.info(f"Question bank: +{added} {difficulty}/{quiz_type} questions for {document_id} (page {page})")
+        if added == 0:
+            # Generation failed or only produced repeats; skip the page instead
+            # of spinning (it is retried on the next start or re-upload)
+            with self._lock:
+                self._exhausted.add((document_id, difficulty, quiz_type, page))
+
+    def _pages_below_target(
+        self,
+        document_id: str,
+        difficulty: str,
+        quiz_type: str,
+        pages: Dict[Optional[int], List[str]]
+    ) -> List[Optional[int]]:
+        """Pages with fewer than `target` banked questions, least covered first"""
+        counts = self.bank.page_counts(document_id, difficulty, quiz_type)
+        with self._lock:
+            exhausted = {key[3] for key in self._exhausted if key[:3] == (document_id, difficulty, quiz_type)}
+        short = [p for p in pages if counts.get(p, 0) < self.target and p not in exhausted]
+        return sorted(short, key=lambda p: (counts.get(p, 0), p if p is not None else 0))
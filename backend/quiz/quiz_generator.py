@@ -1,14 +1,128 @@
 """Quiz generation module"""
+import concurrent.futures
+import json
 import logging
-from typing import List, Dict, Optional
+import re
+from typing import Iterator, List, Dict, Optional, Set, Tuple
+from backend.config import Config
 from backend.models.llm_manager import LLMManager
+from backend.models.inference_scheduler import PRIORITY_QUIZ, PRIORITY_BACKGROUND
 
 logger = logging.getLogger(__name__)
 
+# Generation budget per question; a 10-question quiz doesn't fit the default 512 tokens
+TOKENS_PER_QUESTION = 200
+
+
+SIMPLE_TYPES = ["mcq", "true_false"]
+ADVANCED_TYPES = ["fill_blank", "short_answer"]
+
+# Questions sharing at least this fraction of their words count as duplicates
+DUPLICATE_OVERLAP = 0.8
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+
+
+def question_schema(advanced: bool = False, question_type: Optional[str] = None) -> Dict:
+    """JSON schema for one quiz question (optionally pinned to a single question type)"""
+    types = [question_type] if question_type else (ADVANCED_TYPES if advanced else SIMPLE_TYPES)
+    if advanced:
+        return {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string", "enum": types},
+                "question": {"type": "string"},
+                "correct_answer": {"type": "string"},
+                "explanation": {"type": "string"}
+            },
+            "required": ["type", "question", "correct_answer", "explanation"]
+        }
+    
+    return {
+        "type": "object",
+        "properties": {
+            "type": {"type": "string", "enum": types},
+            "question": {"type": "string"},
+            "options": {"type": "array", "items": {"type": "string"}, "minItems": 2, "maxItems": 4},
+            "correct_answer": {"type": "string", "enum": ["A", "B", "C", "D"]},
+            "explanation": {"type": "string"}
+        },
+        "required": ["type", "question", "options", "correct_answer", "explanation"]
+    }
+
+
+def quiz_schema(num_questions: int, advanced: bool = False) -> Dict:
+    """JSON schema for a quiz, used to constrain generation to valid output"""
+    return {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "items": question_schema(advanced),
+                "minItems": num_questions,
+                "maxItems": num_questions
+            }
+        },
+        "required": ["questions"]
+    }
+
+
+def _load_json_object(response: Optional[str]) -> Optional[Dict]:
+    """Constrained output parses directly; otherwise the outermost {...} is extracted"""
+    if not response:
+        return None
+    
+    try:
+        data = json.loads(response)
+    except ValueError:
+        json_start = response.find('{')
+        json_end = response.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            return None
+        try:
+            data = json.loads(response[json_start:json_end])
+        except ValueError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_quiz_json(response: Optional[str]) -> Optional[Dict]:
+    """Parse a generated quiz. Returns None unless there is a questions list."""
+    quiz_data = _load_json_object(response)
+    if quiz_data is None or not isinstance(quiz_data.get("questions"), list):
+        return None
+    return quiz_data
+
+
+def parse_question_json(response: Optional[str]) -> Optional[Dict]:
+    """Parse a single generated question. Returns None unless it has question text."""
+    question = _load_json_object(response)
+    if question is None or not str(question.get("question", "")).strip():
+        return None
+    return question
+
+
+def _question_words(question: Dict) -> Set[str]:
+    return set(_NON_WORD.sub(" ", str(question.get("question", "")).lower()).split())
+
+
+def is_duplicate_question(question: Dict, existing: List[Dict]) -> bool:
+    """True if the question's wording (mostly) repeats one already accepted"""
+    words = _question_words(question)
+    if not words:
+        return True
+    for other in existing:
+        other_words = _question_words(other)
+        if other_words and len(words & other_words) / len(words | other_words) >= DUPLICATE_OVERLAP:
+            return True
+    return False
+
 
 class QuizGenerator:
-    def __init__(self, llm_handler: LLMManager = None):
+    def __init__(self, llm_handler: LLMManager = None, response_cache=None, question_bank=None):
         self.llm = llm_handler or LLMManager()
+        self.response_cache = response_cache
+        self.question_bank = question_bank
     
     def generate_quiz(
         self,
@@ -16,10 +130,14 @@ class QuizGenerator:
         num_questions: int = 5,
         difficulty: str = "medium",
         quiz_type: str = "simple",
-        context: Optional[str] = None
+        context: Optional[str] = None,
+        document_ids: Optional[List[str]] = None,
+        sources: Optional[List[Tuple[str, Optional[int]]]] = None
     ) -> Dict:
         """
         Generate quiz questions.
+        Document quizzes are served from the question bank when it has enough
+        questions; otherwise they are generated live.
         
         Args:
             topic: Topic or subject for quiz
@@ -27,25 +145,230 @@ class QuizGenerator:
             difficulty: easy, medium, or hard
             quiz_type: "simple" (MCQ/True-False) or "advanced" (Fill-in-blank/Short Answer)
             context: Optional document context for RAG-based quizzes
+            document_ids: Documents the context came from (for cache invalidation)
+            sources: (document_id, page) pairs the context came from; bank questions must come from these
         
         Returns:
             Dictionary with quiz questions, options, answers, explanations
         """
         num_questions = max(5, min(10, num_questions))
         
+        banked = self._draw_from_bank(sources, difficulty, quiz_type, num_questions)
+        if banked is not None:
+            return {"questions": banked}
+        
+        # Cache scope: the topic is matched (semantically) within one quiz shape
+        cache_mode = f"quiz_{quiz_type}_{difficulty}_{num_questions}"
+        if self.response_cache is not None:
+            cached = self.response_cache.get(topic, cache_mode, "en", context)
+            if cached is not None:
+                try:
+                    return json.loads(cached)
+                except ValueError:
+                    logger.warning("Ignoring unparseable cached quiz")
+        
+        if quiz_type == "simple":
+            quiz = self._generate_simple_quiz(topic, num_questions, difficulty, context)
+        else:
+            quiz = self._generate_advanced_quiz(topic, num_questions, difficulty, context)
+        
+        if quiz is None:
+            return self._generate_fallback_quiz(topic, num_questions, advanced=quiz_type != "simple")
+        
+        if self.response_cache is not None:
+            self.response_cache.put(
+                topic, cache_mode, "en", json.dumps(quiz),
+                context=context, document_ids=document_ids or []
+            )
+        return quiz
+    
+    def generate_quiz_stream(
+        self,
+        topic: str,
+        num_questions: int = 5,
+        difficulty: str = "medium",
+        quiz_type: str = "simple",
+        context: Optional[str] = None,
+        document_ids: Optional[List[str]] = None,
+        sources: Optional[List[Tuple[str, Optional[int]]]] = None
+    ) -> Iterator[Dict]:
+        """
+        Generate a quiz as one job per question and yield each question as soon as it parses.
+        
+        The jobs are queued together, so they run concurrently on every free
+        backend slot and the first question arrives after a single question's
+        generation time. Unparseable or repeated questions are regenerated
+        once per slot; slots that still fail or time out get fallback
+        questions, so exactly num_questions are yielded. Closing the iterator cancels the jobs still running.
+        Raises SchedulerBusyError when the request queue is full.
+        """
+        num_questions = max(5, min(10, num_questions))
+        advanced = quiz_type != "simple"
+        
+        banked = self._draw_from_bank(sources, difficulty, quiz_type, num_questions)
+        if banked is not None:
+            yield from banked
+            return
+        
+        cache_mode = f"quiz_{quiz_type}_{difficulty}_{num_questions}"
+        if self.response_cache is not None:
+            cached = parse_quiz_json(self.response_cache.get(topic, cache_mode, "en", context))
+            if cached is not None:
+                yield from cached["questions"]
+                return
+        
+        types = ADVANCED_TYPES if advanced else SIMPLE_TYPES
+        accepted: List[Dict] = []
+        pending: Dict[concurrent.futures.Future, tuple] = {}
+        # Slots already regenerated once after a parse failure or duplicate
+        retried = set()
+        
+        def submit(slot: int):
+            question_type = types[slot % len(types)]
+            prompt = self._question_prompt(topic, difficulty, question_type, context, slot, num_questions, accepted)
+            job = self.llm.submit(
+                prompt,
+                max_tokens=TOKENS_PER_QUESTION,
+                temperature=0.8,
+                priority=PRIORITY_QUIZ,
+                json_schema=question_schema(advanced, question_type)
+            )
+            if job is not None:
+                pending[job.future] = (job, slot)
+        
+        try:
+            for slot in range(num_questions):
+                submit(slot)
+            
+            if not pending:
+                yield from self._generate_fallback_quiz(topic, num_questions, advanced=advanced)["questions"]
+                return
+            
+            while pending:
+                done, _ = concurrent.futures.wait(
+                    list(pending),
+                    timeout=Config.LLM_REQUEST_TIMEOUT,
+                    return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.warning(f"Quiz generation timed out with {len(accepted)}/{num_questions} questions")
+                    break
+                
+                for future in done:
+                    _, slot = pending.pop(future)
+                    question = None
+                    try:
+                        question = parse_question_json(future.result())
+                    except Exception as e:
+                        logger.warning(f"Quiz question {slot + 1} failed: {e}")
+                    
+                    if question is not None and not is_duplicate_question(question, accepted):
+                        accepted.append(question)
+                        yield question
+                    elif slot not in retried:
+                        retried.add(slot)
+                        logger.info(f"Regenerating quiz question {slot + 1} (unparseable or duplicate)")
+                        submit(slot)
+        finally:
+            for job, _ in pending.values():
+                job.cancel()
+        
+        # Failed or timed-out slots are filled like the non-streaming endpoint does
+        missing = num_questions - len(accepted)
+        if missing > 0:
+            logger.warning(f"Filling {missing} quiz question(s) with fallback questions")
+            fallback = self._generate_fallback_quiz(topic, num_questions, advanced=advanced)["questions"]
+            yield from fallback[len(accepted):]
+            return
+        
+        if self.response_cache is not None:
+            self.response_cache.put(
+                topic, cache_mode, "en", json.dumps({"questions": accepted}),
+                context=context, document_ids=document_ids or []
+            )
+    
+    def generate_bank_questions(
+        self,
+        context: str,
+        num_questions: int,
+        difficulty: str = "medium",
+        quiz_type: str = "simple"
+    ) -> List[Dict]:
+        """Generate questions about a document excerpt at background priority (for the question bank)"""
+        topic = "the document excerpt below"
         if quiz_type == "simple":
-            return self._generate_simple_quiz(topic, num_questions, difficulty, context)
+            quiz = self._generate_simple_quiz(topic, num_questions, difficulty, context, priority=PRIORITY_BACKGROUND)
         else:
-            return self._generate_advanced_quiz(topic, num_questions, difficulty, context)
+            quiz = self._generate_advanced_quiz(topic, num_questions, difficulty, context, priority=PRIORITY_BACKGROUND)
+        if quiz is None:
+            return []
+        return [q for q in quiz["questions"] if isinstance(q, dict) and str(q.get("question", "")).strip()]
+    
+    def _draw_from_bank(
+        self,
+        sources: Optional[List[Tuple[str, Optional[int]]]],
+        difficulty: str,
+        quiz_type: str,
+        num_questions: int
+    ) -> Optional[List[Dict]]:
+        if not sources or self.question_bank is None:
+            return None
+        banked = self.question_bank.draw(sources, difficulty, quiz_type, num_questions)
+        if banked is not None:
+            logger.info(f"Served {len(banked)} quiz questions from the question bank")
+        return banked
+    
+    def _question_prompt(
+        self,
+        topic: str,
+        difficulty: str,
+        question_type: str,
+        context: Optional[str],
+        index: int,
+        total: int,
+        accepted: List[Dict]
+    ) -> str:
+        """Prompt for a single question of a given type"""
+        context_text = f"\n\nContext from documents:\n{context}" if context else ""
+        
+        formats = {
+            "mcq": "a Multiple Choice Question with exactly 4 options; correct_answer is the letter (A, B, C or D)",
+            "true_false": "a True/False question with options [\"True\", \"False\"]; correct_answer is A (True) or B (False)",
+            "fill_blank": "a Fill-in-the-blank question using _____ for the blank; correct_answer is the missing text",
+            "short_answer": "an open-ended Short Answer question needing a 2-3 sentence answer; correct_answer is a sample answer"
+        }
+        
+        options_line = ""
+        if question_type not in ADVANCED_TYPES:
+            options_line = '\n  "options": ["Option A", "Option B", "Option C", "Option D"],'
+        
+        avoid_text = ""
+        if accepted:
+            avoid_text = "\n\nDo not repeat any of these questions:\n" + "\n".join(f"- {q['question']}" for q in accepted)
+        
+        return f"""Write question {index + 1} of {total} for a {difficulty} difficulty quiz about: {topic}
+
+Write {formats[question_type]}. Cover a different aspect of the topic than the other questions, and include a brief explanation (1-2 sentences).
+
+Format as JSON:
+{{
+  "type": "{question_type}",
+  "question": "Question text",{options_line}
+  "correct_answer": "...",
+  "explanation": "Brief explanation"
+}}{avoid_text}{context_text}
+
+Return ONLY valid JSON, no additional text."""
     
     def _generate_simple_quiz(
         self,
         topic: str,
         num_questions: int,
         difficulty: str,
-        context: Optional[str]
-    ) -> Dict:
-        """Generate simple quiz (MCQ and True/False)"""
+        context: Optional[str],
+        priority: int = PRIORITY_QUIZ
+    ) -> Optional[Dict]:
+        """Generate simple quiz (MCQ and True/False). Returns None if generation fails."""
         
         context_text = f"\n\nContext from documents:\n{context}" if context else ""
         
@@ -74,32 +397,27 @@ Format as JSON:
 
 Return ONLY valid JSON, no additional text."""
         
-        response = self.llm.generate(prompt)
+        response = self.llm.generate(
+            prompt,
+            max_tokens=TOKENS_PER_QUESTION * num_questions,
+            priority=priority,
+            json_schema=quiz_schema(num_questions)
+        )
         
-        # Parse response (basic JSON extraction)
-        try:
-            import json
-            # Try to extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response[json_start:json_end]
-                quiz_data = json.loads(json_str)
-                return quiz_data
-        except Exception as e:
-            logger.error(f"Failed to parse quiz JSON: {e}")
-        
-        # Fallback: generate simple structure
-        return self._generate_fallback_quiz(topic, num_questions)
+        quiz_data = parse_quiz_json(response)
+        if quiz_data is None:
+            logger.error("Failed to parse quiz JSON")
+        return quiz_data
     
     def _generate_advanced_quiz(
         self,
         topic: str,
         num_questions: int,
         difficulty: str,
-        context: Optional[str]
-    ) -> Dict:
-        """Generate advanced quiz (Fill-in-blank and Short Answer)"""
+        context: Optional[str],
+        priority: int = PRIORITY_QUIZ
+    ) -> Optional[Dict]:
+        """Generate advanced quiz (Fill-in-blank and Short Answer). Returns None if generation fails."""
         
         context_text = f"\n\nContext from documents:\n{context}" if context else ""
         
@@ -127,20 +445,17 @@ Format as JSON:
 
 Return ONLY valid JSON, no additional text."""
         
-        response = self.llm.generate(prompt)
+        response = self.llm.generate(
+            prompt,
+            max_tokens=TOKENS_PER_QUESTION * num_questions,
+            priority=priority,
+            json_schema=quiz_schema(num_questions, advanced=True)
+        )
         
-        try:
-            import json
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response[json_start:json_end]
-                quiz_data = json.loads(json_str)
-                return quiz_data
-        except Exception as e:
-            logger.error(f"Failed to parse advanced quiz JSON: {e}")
-        
-        return self._generate_fallback_quiz(topic, num_questions, advanced=True)
+        quiz_data = parse_quiz_json(response)
+        if quiz_data is None:
+            logger.error("Failed to parse advanced quiz JSON")
+        return quiz_data
     
     def _generate_fallback_quiz(self, topic: str, num_questions: int, advanced: bool = False) -> Dict:
         """Generate fallback quiz structure if LLM parsing fails"""
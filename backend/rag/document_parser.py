@@ -1,55 +1,33 @@
 """Complete document parser supporting PDF, DOCX, PPTX, TXT, images, and code files"""
 import os
+import importlib
 import logging
+from functools import lru_cache
 from typing import List, Dict, Tuple
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
-# PDF parsing
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
+
+# Parser libraries (docling, PyMuPDF, python-docx, ...) are heavy to import,
+# so they are only imported the first time a document needs them.
+@lru_cache(maxsize=None)
+def _optional_import(module_name: str):
+    """Import a module on first use, returning None if it is not installed"""
     try:
-        import pypdf
-        PYMUPDF_AVAILABLE = False
-        PYPDF_AVAILABLE = True
+        return importlib.import_module(module_name)
     except ImportError:
-        PYMUPDF_AVAILABLE = False
-        PYPDF_AVAILABLE = False
-        logger.warning("PyMuPDF and pypdf not available")
-
-try:
-    from docling.datamodel.base_models import InputFormat
-    from docling.document_converter import DocumentConverter
-    DOCLING_AVAILABLE = True
-except ImportError:
-    DOCLING_AVAILABLE = False
-    logger.warning("Docling not available, will use PyMuPDF fallback")
-
-# DOCX parsing
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-# PPTX parsing
-try:
-    from pptx import Presentation
-    PPTX_AVAILABLE = True
-except ImportError:
-    PPTX_AVAILABLE = False
-
-# Image OCR
-try:
-    from PIL import Image
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-    logger.warning("Tesseract OCR not available")
+        logger.warning(f"{module_name} not available")
+        return None
+
+
+@lru_cache(maxsize=1)
+def _get_docling_converter():
+    """Build the Docling converter once (it loads layout models)"""
+    docling = _optional_import("docling.document_converter")
+    if docling is None:
+        return None
+    return docling.DocumentConverter()
 
 
 def extract_pdf(path: str) -> List[Dict[str, any]]:
@@ -57,9 +35,9 @@ def extract_pdf(path: str) -> List[Dict[str, any]]:
     pages = []
     
     # Try Docling first
-    if DOCLING_AVAILABLE:
+    converter = _get_docling_converter()
+    if converter is not None:
         try:
-            converter = DocumentConverter()
             result = converter.convert(path)
             doc_text = result.document.export_to_text()
             # Split by pages if possible
@@ -76,7 +54,8 @@ def extract_pdf(path: str) -> List[Dict[str, any]]:
             logger.warning(f"Docling failed, falling back to PyMuPDF: {e}")
     
     # Fallback to PyMuPDF
-    if PYMUPDF_AVAILABLE:
+    fitz = _optional_import("fitz")
+    if fitz is not None:
         try:
             doc = fitz.open(path)
             for page_num in range(len(doc)):
@@ -91,10 +70,10 @@ def extract_pdf(path: str) -> List[Dict[str, any]]:
             logger.error(f"PyMuPDF extraction failed: {e}")
     
     # Fallback to pypdf
-    if PYPDF_AVAILABLE:
+    pypdf = _optional_import("pypdf")
+    if pypdf is not None:
         try:
-            from pypdf import PdfReader
-            reader = PdfReader(path)
+            reader = pypdf.PdfReader(path)
             for page_num, page in enumerate(reader.pages, 1):
                 text = page.extract_text()
                 if text.strip():
@@ -109,11 +88,12 @@ def extract_pdf(path: str) -> List[Dict[str, any]]:
 
 def extract_docx(path: str) -> List[Dict[str, any]]:
     """Extract text from DOCX file"""
-    if not DOCX_AVAILABLE:
+    docx = _optional_import("docx")
+    if docx is None:
         raise Exception("python-docx not available")
     
     try:
-        doc = Document(path)
+        doc = docx.Document(path)
         paragraphs = []
         for para in doc.paragraphs:
             if para.text.strip():
@@ -128,11 +108,12 @@ def extract_docx(path: str) -> List[Dict[str, any]]:
 
 def extract_pptx(path: str) -> List[Dict[str, any]]:
     """Extract text from PPTX file"""
-    if not PPTX_AVAILABLE:
+    pptx = _optional_import("pptx")
+    if pptx is None:
         raise Exception("python-pptx not available")
     
     try:
-        prs = Presentation(path)
+        prs = pptx.Presentation(path)
         slides = []
         for slide_num, slide in enumerate(prs.slides, 1):
             slide_text = []
@@ -149,11 +130,13 @@ def extract_pptx(path: str) -> List[Dict[str, any]]:
 
 def extract_image(path: str) -> List[Dict[str, any]]:
     """Extract text from image using OCR"""
-    if not TESSERACT_AVAILABLE:
+    pil_image = _optional_import("PIL.Image")
+    pytesseract = _optional_import("pytesseract")
+    if pil_image is None or pytesseract is None:
         raise Exception("Tesseract OCR not available")
     
     try:
-        image = Image.open(path)
+        image = pil_image.open(path)
         text = pytesseract.image_to_string(image)
         if text.strip():
             return [{"page": 1, "text": text}]
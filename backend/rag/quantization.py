@@ -0,0 +1,352 @@
+"""Compressed vector codes (scalar int8, product quantization) for approximate search"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "int8", "pq")
+
+_BLOCK_ROWS = 16384
+
+
+def _finish(f, path: str):
+    """Flush a `<path>.tmp` file to disk and move it into place, so a crash never leaves a truncated code file"""
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.replace(path + ".tmp", path)
+
+
+class Int8Codes:
+    """
+    Per-row symmetric int8 codes: x ~= code * scale / 127. Takes 1 byte per
+    dimension (4x less than float32) plus the row's scale and exact squared
+    norm, which keep the approximate squared-L2 distance well calibrated.
+    """
+
+    kind = "int8"
+
+    def __init__(self, prefix: str, rows: int, dim: int):
+        self.codes = np.memmap(prefix + ".q8", dtype=np.int8, mode="r", shape=(rows, dim))
+        self.norms = np.memmap(prefix + ".q8n", dtype=np.float32, mode="r", shape=(rows, 2))
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(prefix + ".q8") and os.path.exists(prefix + ".q8n")
+
+    @classmethod
+    def build(cls, prefix: str, vectors: np.ndarray) -> "Int8Codes":
+        with open(prefix + ".q8.tmp", "wb") as codes_file, open(prefix + ".q8n.tmp", "wb") as norms_file:
+            for start in range(0, len(vectors), _BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+                scale = np.abs(block).max(axis=1)
+                scale[scale == 0] = 1.0
+                codes = np.rint(block / scale[:, None] * 127.0).astype(np.int8)
+                sq_norms = np.einsum("ij,ij->i", block, block)
+                codes_file.write(codes.tobytes())
+                norms_file.write(np.stack([scale, sq_norms], axis=1).astype(np.float32).tobytes())
+            _finish(norms_file, prefix + ".q8n")
+            _finish(codes_file, prefix + ".q8")
+        return cls(prefix, len(vectors), vectors.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.norms.nbytes
+
+    def distances(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate squared L2 distance from q to the given rows (default: all)"""
+        total = self.codes.shape[0] if rows is None else len(rows)
+        out = np.empty(total, dtype=np.float32)
+        q_sq = float(q @ q)
+        for start in range(0, total, _BLOCK_ROWS):
+            index = slice(start, start + _BLOCK_ROWS) if rows is None else rows[start:start + _BLOCK_ROWS]
+            codes, norms = self.codes[index], self.norms[index]
+            dots = (codes @ q) * (norms[:, 0] / 127.0)
+            out[start:start + len(codes)] = norms[:, 1] - 2.0 * dots + q_sq
+        return out
+
+
+class PQCodes:
+    """
+    Product quantization: each vector is split into `subspaces` slices and
+    every slice is stored as the index of its nearest of 256 centroids
+    (1 byte). 384 dims in 96 subspaces is 16x smaller than float32. Distances
+    come from per-query lookup tables (asymmetric distance computation).
+    Centroids are trained per segment with k-means on a sample of its rows.
+    """
+
+    kind = "pq"
+    centroids_per_subspace = 256
+
+    def __init__(self, prefix: str, rows: int, dim: int):
+        self.centroids = np.load(prefix + ".pqc.npy")
+        subspaces = self.centroids.shape[0]
+        self.codes = np.memmap(prefix + ".pq", dtype=np.uint8, mode="r", shape=(rows, subspaces))
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(prefix + ".pq") and os.path.exists(prefix + ".pqc.npy")
+
+    @classmethod
+    def build(
+        cls,
+        prefix: str,
+        vectors: np.ndarray,
+        subspaces: int,
+        iterations: int = 12,
+        train_rows: int = 20000,
+        seed: int = 0
+    ) -> "PQCodes":
+        rows, dim = vectors.shape
+        sub_dim = dim // subspaces
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(rows, size=min(rows, train_rows), replace=False))], dtype=np.float32)
+
+        centroids = np.empty((subspaces, cls.centroids_per_subspace, sub_dim), dtype=np.float32)
+        for j in range(subspaces):
+            centroids[j] = _kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], cls.centroids_per_subspace, iterations, rng)
+
+        with open(prefix + ".pqc.npy.tmp", "wb") as f:
+            np.save(f, centroids)
+            _finish(f, prefix + ".pqc.npy")
+        with open(prefix + ".pq.tmp", "wb") as f:
+            for start in range(0, rows, _BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+                codes = np.empty((len(block), subspaces), dtype=np.uint8)
+                for j in range(subspaces):
+                    codes[:, j] = _nearest(block[:, j * sub_dim:(j + 1) * sub_dim], centroids[j])
+                f.write(codes.tobytes())
+            _finish(f, prefix + ".pq")
+        return cls(prefix, rows, dim)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.centroids.nbytes
+
+    def distances(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate squared L2 distance from q to the given rows (default: all)"""
+        subspaces, _, sub_dim = self.centroids.shape
+        q_sub = q.reshape(subspaces, 1, sub_dim)
+        table = ((self.centroids - q_sub) ** 2).sum(axis=2)  # (subspaces, 256)
+        total = self.codes.shape[0] if rows is None else len(rows)
+        out = np.empty(total, dtype=np.float32)
+        columns = np.arange(subspaces)
+        for start in range(0, total, _BLOCK_ROWS):
+            index = slice(start, start + _BLOCK_ROWS) if rows is None else rows[start:start + _BLOCK_ROWS]
+            codes = self.codes[index]
+            out[start:start + len(codes)] = table[columns, codes].sum(axis=1)
+        return out
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * (x @ centroids.T)
+    return distances.argmin(axis=1)
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points"""
+    centroids = x[rng.choice(len(x), size=k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        for d in range(x.shape[1]):
+            sums = np.bincount(assign, weights=x[:, d], minlength=k)
+            nonempty = counts > 0
+            centroids[nonempty, d] = sums[nonempty] / counts[nonempty]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty))]
+    return centroids
+
+
+def pq_subspaces_for(dim: int, requested: int = 0) -> int:
+    """Subspace count for `dim`: `requested` if it divides dim, else the largest divisor <= dim // 4"""
+    if requested > 0 and dim % requested == 0:
+        return requested
+    for m in range(max(1, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def open_codes(
+    mode: str,
+    prefix: str,
+    vectors: np.ndarray,
+    pq_subspaces: int = 0,
+    pq_min_rows: int = 2048
+):
+    """
+    Open (or build, if missing) the compressed codes of one segment.
+
+    `pq` needs enough rows to train its centroids; smaller segments use int8
+    until compaction merges them. Returns None for mode "none".
+    """
+    if mode == "none":
+        return None
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization '{mode}' (use {', '.join(QUANTIZATION_MODES)})")
+
+    rows, dim = vectors.shape
+    if mode == "pq" and rows >= pq_min_rows:
+        codes = _open_existing(PQCodes, prefix, rows, dim)
+        return codes or PQCodes.build(prefix, vectors, pq_subspaces_for(dim, pq_subspaces))
+
+    codes = _open_existing(Int8Codes, prefix, rows, dim)
+    return codes or Int8Codes.build(prefix, vectors)
+
+
+def _open_existing(kind, prefix: str, rows: int, dim: int):
+    """Open codes built earlier, or None if they are missing or don't match the rows (rebuilt by the caller)"""
+    if not kind.exists(prefix):
+        return None
+    try:
+        codes = kind(prefix, rows, dim)
+    except (OSError, ValueError, EOFError) as e:
+        logger.warning(f"Rebuilding unreadable {kind.kind} codes {prefix}: {e}")
+        return None
+    if codes.codes.nbytes != os.path.getsize(codes.codes.filename):
+        logger.warning(f"Rebuilding {kind.kind} codes {prefix}: size does not match {rows} rows")
+        return None
+    return codes
+
+
+class CompressedTier:
+    """
+    Compressed copies of every chunk vector, kept per document beside a
+    vector store that cannot hold them itself (Chroma's HNSW files are
+    float32). Each document has its chunk ids (`<key>.ids.json`), its
+    float32 vectors (`<key>.f32`, memory mapped) and their codes. Queries
+    scan only the codes and re-rank a shortlist of top_k x rerank_factor
+    rows at full precision, so only those float32 rows are paged in.
+
+    Distances follow the store's HNSW space: squared L2 for "l2" and
+    1 - cosine for "cosine" (vectors are normalized first). "ip" has no
+    L2 equivalent and is not supported.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        mode: str,
+        space: str = "l2",
+        rerank_factor: int = 8,
+        pq_subspaces: int = 0,
+        pq_min_rows: int = 2048
+    ):
+        if mode not in QUANTIZATION_MODES or mode == "none":
+            raise ValueError(f"Unknown quantization '{mode}' (use int8 or pq)")
+        if space not in ("l2", "cosine"):
+            raise ValueError(f"Compressed vectors need the l2 or cosine space, not '{space}'")
+        self.directory = directory
+        self.mode = mode
+        self.space = space
+        self.rerank_factor = max(1, rerank_factor)
+        self.pq_subspaces = pq_subspaces
+        self.pq_min_rows = pq_min_rows
+        self._documents: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        for filename in os.listdir(directory):
+            if not filename.endswith(".ids.json"):
+                continue
+            prefix = os.path.join(directory, filename[:-len(".ids.json")])
+            try:
+                with open(prefix + ".ids.json", "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                self._documents[entry["document_id"]] = self._open(prefix, entry["ids"], entry["dim"])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Dropping unreadable compressed vectors {prefix}: {e}")
+        logger.info(f"Loaded {self.mode} codes for {len(self._documents)} documents")
+
+    def _prefix(self, document_id: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(document_id.encode("utf-8")).hexdigest())
+
+    def _open(self, prefix: str, ids: List[str], dim: int) -> tuple:
+        vectors = np.memmap(prefix + ".f32", dtype=np.float32, mode="r", shape=(len(ids), dim))
+        codes = open_codes(self.mode, prefix, vectors, pq_subspaces=self.pq_subspaces, pq_min_rows=self.pq_min_rows)
+        return ids, vectors, codes
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.space == "cosine":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+        return vectors
+
+    def document_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._documents)
+
+    def add(self, document_id: str, ids: List[str], vectors: np.ndarray):
+        """Store (or replace) a document's vectors and build their codes"""
+        vectors = self._prepare(vectors)
+        prefix = self._prefix(document_id)
+        self.delete(document_id)
+        with open(prefix + ".f32.tmp", "wb") as f:
+            f.write(np.ascontiguousarray(vectors).tobytes())
+            _finish(f, prefix + ".f32")
+        entry = self._open(prefix, list(ids), vectors.shape[1])
+        # The id list is written last: it marks the document's files as complete
+        with open(prefix + ".ids.json.tmp", "w", encoding="utf-8") as f:
+            json.dump({"document_id": document_id, "dim": vectors.shape[1], "ids": list(ids)}, f)
+            _finish(f, prefix + ".ids.json")
+        with self._lock:
+            self._documents[document_id] = entry
+
+    def delete(self, document_id: str):
+        with self._lock:
+            self._documents.pop(document_id, None)
+        prefix = self._prefix(document_id)
+        for suffix in (".ids.json", ".f32", ".q8", ".q8n", ".pq", ".pqc.npy"):
+            try:
+                os.remove(prefix + suffix)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Still mapped by a running query (Windows); add() overwrites it
+                logger.warning(f"Could not remove {prefix + suffix}: {e}")
+
+    def search(self, query: np.ndarray, top_k: int, document_filter: Optional[str] = None) -> List[Tuple[float, str, str]]:
+        """(distance, document_id, chunk_id) of the nearest chunks, closest first"""
+        q = self._prepare(query)
+        with self._lock:
+            if document_filter:
+                documents = [(document_filter, self._documents[document_filter])] if document_filter in self._documents else []
+            else:
+                documents = list(self._documents.items())
+
+        candidates = []
+        for document_id, (ids, vectors, codes) in documents:
+            if not ids or vectors.shape[1] != q.shape[0]:
+                continue
+            rows = np.arange(len(ids))
+            shortlist = min(len(ids), top_k * self.rerank_factor)
+            if shortlist < len(ids):
+                rows = np.sort(np.argpartition(codes.distances(q), shortlist - 1)[:shortlist])
+            diff = vectors[rows] - q
+            distances = np.einsum("ij,ij->i", diff, diff)
+            if self.space == "cosine":
+                distances = distances / 2.0
+            k = min(top_k, len(rows))
+            for i in np.argpartition(distances, k - 1)[:k]:
+                candidates.append((max(float(distances[i]), 0.0), document_id, ids[rows[i]]))
+        return heapq.nsmallest(top_k, candidates, key=lambda c: c[0])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            documents = list(self._documents.values())
+        return {
+            "quantization": self.mode,
+            "documents": len(documents),
+            "chunks": sum(len(ids) for ids, _, _ in documents),
+            "vector_bytes": sum(vectors.nbytes for _, vectors, _ in documents),
+            "code_bytes": sum(codes.nbytes for _, _, codes in documents)
+        }
@@ -1,50 +1,564 @@
-from models.embedding_manager import embed_text
+"""In-process vector store: append-only segments, memory-mapped vectors, periodic compaction"""
+import json
+import heapq
+import logging
+import os
+import threading
+from typing import Callable, List, Dict, Optional, Sequence, Union
 
-import faiss
 import numpy as np
-import os
-import pickle
 
-# Store location
-FAISS_INDEX_PATH = "backend/rag/faiss.index"
-DOC_STORE_PATH = "backend/rag/docs.pkl"
+from backend.db.document_catalog import DocumentCatalog
+from backend.db.lexical_index import LexicalIndex, hybrid_retrieve
+from backend.db.retrieval_cache import RetrievalCache
+from .quantization import open_codes
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+TOMBSTONE_FILE = "deleted.log"
+
+
+def _fsync_write(path: str, data: bytes, mode: str = "wb"):
+    with open(path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class _Segment:
+    """
+    One immutable batch of rows: vectors in `<name>.f32` (raw float32) and one
+    JSON record per row in `<name>.jsonl`, both memory mapped, plus optional
+    compressed codes (`<name>.q8*` / `<name>.pq*`). Only row ids, document ids
+    and record offsets are kept in memory. The mappings stay readable for
+    queries already running when compaction removes the files.
+    """
+
+    def __init__(self, directory: str, name: str, rows: int, dim: int):
+        self.name = name
+        self.rows = rows
+        self.prefix = os.path.join(directory, name)
+        self.vector_path = self.prefix + ".f32"
+        self.record_path = self.prefix + ".jsonl"
+        self.codes = None
+        self.vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(rows, dim))
+        self.record_data = np.memmap(self.record_path, dtype=np.uint8, mode="r")
+        self.deleted = np.zeros(rows, dtype=bool)
+        self._sq_norms = None
+
+        ids, document_ids, offsets = [], [], [0]
+        with open(self.record_path, "rb") as f:
+            for _ in range(rows):
+                line = f.readline()
+                offsets.append(offsets[-1] + len(line))
+                record = json.loads(line)
+                ids.append(record["id"])
+                document_ids.append(record["metadata"].get("document_id", ""))
+        self.ids = ids
+        self.document_ids = np.array(document_ids, dtype=object)
+        self.offsets = offsets
+
+    @property
+    def sq_norms(self) -> np.ndarray:
+        if self._sq_norms is None:
+            self._sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        return self._sq_norms
+
+    @property
+    def live_rows(self) -> int:
+        return self.rows - int(self.deleted.sum())
+
+    def raw_record(self, row: int) -> bytes:
+        return self.record_data[self.offsets[row]:self.offsets[row + 1]].tobytes()
+
+    def records(self, rows: Sequence[int]) -> List[Dict]:
+        return [json.loads(self.raw_record(row)) for row in rows]
+
+
+class RagStore:
+    """
+    Vector store with the same interface as ChromaStore, kept in a directory.
+
+    Every add writes one new segment (vectors + records) and then atomically
+    replaces a small manifest listing the committed segments, so ingesting a
+    chunk costs one sequential write of that chunk. Deletes append to a
+    tombstone log. Compaction merges small segments and rewrites segments
+    with many deleted rows. Files not named by the manifest are leftovers of
+    an interrupted write and are removed on load.
+
+    Distances are squared L2, as with ChromaStore's default collection.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        catalog: Optional[DocumentCatalog] = None,
+        retrieval_cache: Optional[RetrievalCache] = None,
+        max_segments: int = 16,
+        compact_deleted_ratio: float = 0.3,
+        quantization: str = "none",
+        rerank_factor: int = 8,
+        pq_subspaces: int = 0,
+        pq_min_rows: int = 2048,
+        lexical_index: Optional[LexicalIndex] = None,
+        rrf_k: int = 60
+    ):
+        self.persist_directory = persist_directory
+        self.catalog = catalog
+        self.retrieval_cache = retrieval_cache
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        self.max_segments = max(2, max_segments)
+        self.compact_deleted_ratio = compact_deleted_ratio
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        self.pq_subspaces = pq_subspaces
+        self.pq_min_rows = pq_min_rows
+        self.dim: Optional[int] = None
+        self._next_segment = 0
+        self._segments: List[_Segment] = []
+        self._lock = threading.RLock()
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        self._load()
+        logger.info(f"Loaded vector store: {len(self._segments)} segments, {self.get_collection_size()} chunks")
+
+        if self.catalog is not None:
+            self.backfill_catalog()
+        if self.lexical_index is not None:
+            self.backfill_lexical_index()
+
+    # Persistence
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.persist_directory, filename)
+
+    def _load(self):
+        manifest_path = self._path(MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.dim = manifest.get("dim")
+            self._next_segment = manifest.get("next_segment", 0)
+            for entry in manifest.get("segments", []):
+                self._segments.append(self._open_segment(entry["name"], entry["rows"]))
+
+        by_name = {s.name: s for s in self._segments}
+        tombstone_path = self._path(TOMBSTONE_FILE)
+        if os.path.exists(tombstone_path):
+            with open(tombstone_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn final line from an interrupted delete
+                        continue
+                    segment = by_name.get(entry.get("segment"))
+                    if segment is not None:
+                        segment.deleted[entry["rows"]] = True
+
+        live = {s.name for s in self._segments}
+        for filename in os.listdir(self.persist_directory):
+            if filename.startswith("seg-") and filename.split(".")[0] not in live:
+                self._remove_file(self._path(filename))
+
+    def _open_segment(self, name: str, rows: int) -> _Segment:
+        segment = _Segment(self.persist_directory, name, rows, self.dim)
+        segment.codes = open_codes(
+            self.quantization,
+            segment.prefix,
+            segment.vectors,
+            pq_subspaces=self.pq_subspaces,
+            pq_min_rows=self.pq_min_rows
+        )
+        return segment
+
+    def _write_manifest(self):
+        manifest = {
+            "format": 1,
+            "dim": self.dim,
+            "next_segment": self._next_segment,
+            "segments": [{"name": s.name, "rows": s.rows} for s in self._segments]
+        }
+        tmp_path = self._path(MANIFEST_FILE + ".tmp")
+        _fsync_write(tmp_path, json.dumps(manifest).encode("utf-8"))
+        os.replace(tmp_path, self._path(MANIFEST_FILE))
+
+    def _write_segment(self, vectors: np.ndarray, records: Sequence[bytes]) -> _Segment:
+        """Write a segment's files and codes (not yet visible until the manifest names it)"""
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        _fsync_write(self._path(f"{name}.f32"), np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        _fsync_write(self._path(f"{name}.jsonl"), b"".join(records))
+        return self._open_segment(name, len(records))
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError as e:
+            # Still mapped by a running query (Windows); the next load removes it
+            logger.warning(f"Could not remove {path}: {e}")
+
+    # Writes
+
+    def add_document_chunks(
+        self,
+        document_id: str,
+        document_name: str,
+        chunks: List[tuple],
+        embeddings: Union[np.ndarray, Sequence[np.ndarray]],
+        upload_time: str = None,
+        byte_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        file_path: Optional[str] = None
+    ):
+        """
+        Add document chunks to the vector store.
+
+        Args:
+            document_id: Unique identifier for the document
+            document_name: Original filename
+            chunks: List of (chunk_text, metadata_dict) tuples
+            embeddings: (n, dim) float32 matrix or sequence of vectors (one per chunk)
+            upload_time: ISO format timestamp
+            byte_size, content_hash, file_path: Source file details for the document catalog
+        """
+        self.add_documents([{
+            "document_id": document_id,
+            "document_name": document_name,
+            "chunks": chunks,
+            "embeddings": embeddings,
+            "upload_time": upload_time,
+            "byte_size": byte_size,
+            "content_hash": content_hash,
+            "file_path": file_path
+        }])
+
+    def add_documents(self, documents: List[Dict]):
+        """
+        Bulk add: every document in one segment and one manifest write.
+        Each dict takes the keyword arguments of `add_document_chunks`.
+        """
+        matrices, records, catalog_rows, lexical_rows = [], [], [], {}
+        for doc in documents:
+            chunks, embeddings = doc.get("chunks"), doc.get("embeddings")
+            if not chunks or embeddings is None or len(embeddings) == 0:
+                logger.warning(f"No chunks or embeddings provided for {doc.get('document_id')}")
+                continue
+            if len(chunks) != len(embeddings):
+                raise ValueError("Number of chunks must match number of embeddings")
+
+            for idx, (chunk_text, chunk_metadata) in enumerate(chunks):
+                metadata = {
+                    "document_id": doc["document_id"],
+                    "document_name": doc["document_name"],
+                    "chunk_index": idx,
+                    **chunk_metadata
+                }
+                if doc.get("upload_time"):
+                    metadata["upload_time"] = doc["upload_time"]
+                record = {"id": f"{doc['document_id']}_chunk_{idx}", "text": chunk_text, "metadata": metadata}
+                records.append(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                lexical_rows.setdefault(doc["document_id"], []).append((record["id"], chunk_text, metadata))
+            matrices.append(np.atleast_2d(np.asarray(doc["embeddings"], dtype=np.float32)))
+            catalog_rows.append({**doc, "chunk_count": len(chunks)})
+
+        if not records:
+            return
+        vectors = np.concatenate(matrices)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dim})")
+
+            self._segments.append(self._write_segment(vectors, records))
+            self._write_manifest()
+            self._maybe_compact()
+
+        if self.lexical_index is not None:
+            for document_id, rows in lexical_rows.items():
+                self.lexical_index.add_chunks(document_id, rows)
+
+        self._collection_changed()
+        if self.catalog is not None:
+            self.catalog.upsert_many(catalog_rows)
+
+        logger.info(f"Added {len(records)} chunks for {len(catalog_rows)} document(s)")
+
+    def delete_document(self, document_id: str):
+        """Delete all chunks for a specific document"""
+        try:
+            deleted = 0
+            with self._lock:
+                entries = []
+                for segment in self._segments:
+                    rows = np.flatnonzero((segment.document_ids == document_id) & ~segment.deleted)
+                    if len(rows):
+                        entries.append((segment, rows))
+                        deleted += len(rows)
+
+                if entries:
+                    log = b"".join(
+                        json.dumps({"segment": s.name, "rows": rows.tolist()}).encode("utf-8") + b"\n"
+                        for s, rows in entries
+                    )
+                    _fsync_write(self._path(TOMBSTONE_FILE), log, mode="ab")
+                    for segment, rows in entries:
+                        segment.deleted[rows] = True
+                    self._maybe_compact()
+
+            if self.lexical_index is not None:
+                self.lexical_index.delete_document(document_id)
+
+            if deleted:
+                self._collection_changed()
+                logger.info(f"Deleted {deleted} chunks for document {document_id}")
+
+            if self.catalog is not None:
+                self.catalog.remove(document_id)
+            return deleted
+        except Exception as e:
+            logger.error(f"Error deleting document {document_id}: {e}")
+            return 0
+
+    def _maybe_compact(self):
+        """Merge the smaller half of the segments when there are too many, plus any mostly-deleted segment"""
+        candidates = {
+            s.name for s in self._segments
+            if s.rows and (s.rows - s.live_rows) / s.rows > self.compact_deleted_ratio
+        }
+        if len(self._segments) > self.max_segments:
+            by_size = sorted(self._segments, key=lambda s: s.live_rows)
+            candidates.update(s.name for s in by_size[:len(by_size) // 2 + 1])
+        if candidates:
+            self.compact([s for s in self._segments if s.name in candidates])
+
+    def compact(self, segments: Optional[List[_Segment]] = None):
+        """Rewrite the given segments (default: all) as one, dropping deleted rows"""
+        with self._lock:
+            segments = list(self._segments if segments is None else segments)
+            if not segments:
+                return
+            vectors, records = [], []
+            for segment in segments:
+                rows = np.flatnonzero(~segment.deleted)
+                if len(rows):
+                    vectors.append(np.asarray(segment.vectors[rows]))
+                    records.extend(segment.raw_record(row) for row in rows)
+
+            merged = [s.name for s in segments]
+            remaining = [s for s in self._segments if s.name not in merged]
+            if records:
+                remaining.append(self._write_segment(np.concatenate(vectors), records))
+            self._segments = remaining
+            self._write_manifest()
+
+            # Tombstones for segments that still exist are carried over; the rest are gone
+            log = b"".join(
+                json.dumps({"segment": s.name, "rows": np.flatnonzero(s.deleted).tolist()}).encode("utf-8") + b"\n"
+                for s in self._segments if s.deleted.any()
+            )
+            tmp_path = self._path(TOMBSTONE_FILE + ".tmp")
+            _fsync_write(tmp_path, log)
+            os.replace(tmp_path, self._path(TOMBSTONE_FILE))
+
+            for segment in segments:
+                for filename in os.listdir(self.persist_directory):
+                    if filename.split(".")[0] == segment.name:
+                        self._remove_file(self._path(filename))
+            logger.info(f"Compacted {len(segments)} segments ({len(records)} live chunks)")
+
+    # Reads
+
+    def query(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        document_filter: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Query the vector store for similar chunks.
+
+        Args:
+            query_embedding: Query vector (float32 array)
+            top_k: Number of results to return
+            document_filter: Optional document_id to filter by
+
+        Returns:
+            List of result dictionaries with text, metadata, and distance
+        """
+        with self._lock:
+            segments = list(self._segments)
+        if not segments or top_k <= 0:
+            return []
+
+        q = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {q.shape[0]} does not match the store ({self.dim})")
+        q_sq = float(q @ q)
+
+        candidates = []
+        for segment in segments:
+            live = ~segment.deleted
+            if document_filter:
+                live &= segment.document_ids == document_filter
+            rows = np.flatnonzero(live)
+            if not len(rows):
+                continue
+
+            if segment.codes is not None:
+                rows, distances = self._rerank_candidates(segment, rows, q, top_k)
+            elif len(rows) == segment.rows:
+                distances = segment.sq_norms - 2.0 * (segment.vectors @ q) + q_sq
+            else:
+                distances = segment.sq_norms[rows] - 2.0 * (segment.vectors[rows] @ q) + q_sq
+            k = min(top_k, len(rows))
+            best = np.argpartition(distances, k - 1)[:k]
+            candidates.extend((float(distances[i]), segment, int(rows[i])) for i in best)
+
+        formatted_results = []
+        for distance, segment, row in heapq.nsmallest(top_k, candidates, key=lambda c: c[0]):
+            record = segment.records([row])[0]
+            formatted_results.append({
+                "id": record["id"],
+                "text": record["text"],
+                "metadata": record["metadata"],
+                "distance": max(distance, 0.0)
+            })
+        return formatted_results
 
-# Global objects
-embedding_dim = 384  # MiniLM-L6-v2 output size
-index = None
-docs = []
+    def _rerank_candidates(self, segment: _Segment, rows: np.ndarray, q: np.ndarray, top_k: int):
+        """
+        Shortlist rows by their compressed codes, then compute exact distances
+        for the shortlist only (so only those float32 rows are read).
+        """
+        approx = segment.codes.distances(q, None if len(rows) == segment.rows else rows)
+        shortlist = min(len(rows), top_k * self.rerank_factor)
+        if shortlist < len(rows):
+            rows = rows[np.sort(np.argpartition(approx, shortlist - 1)[:shortlist])]
+        diff = segment.vectors[rows] - q
+        return rows, np.einsum("ij,ij->i", diff, diff)
 
-def load_store():
-    global index, docs
-    
-    if os.path.exists(FAISS_INDEX_PATH):
-        index = faiss.read_index(FAISS_INDEX_PATH)
-    else:
-        index = faiss.IndexFlatL2(embedding_dim)
+    def stats(self) -> Dict:
+        """Segment count, live chunks and bytes of float32 vectors vs compressed codes"""
+        with self._lock:
+            segments = list(self._segments)
+        return {
+            "segments": len(segments),
+            "chunks": sum(s.live_rows for s in segments),
+            "quantization": self.quantization,
+            "vector_bytes": sum(s.vectors.nbytes for s in segments),
+            "code_bytes": sum(s.codes.nbytes for s in segments if s.codes is not None)
+        }
 
-    if os.path.exists(DOC_STORE_PATH):
-        with open(DOC_STORE_PATH, "rb") as f:
-            docs.extend(pickle.load(f))
+    def query_text(
+        self,
+        query_text: str,
+        embed: Callable[[str], Optional[np.ndarray]],
+        top_k: int = 5,
+        document_filter: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Query by text, serving repeated queries from the retrieval cache.
+        With a lexical index, keyword queries skip `embed` and the rest are
+        hybrid (vector + BM25); `embed` is only called on a cache miss.
+        """
+        version = None
+        if self.retrieval_cache is not None:
+            cached, version = self.retrieval_cache.get(query_text, top_k, document_filter)
+            if cached is not None:
+                return cached
 
-load_store()
+        results, cacheable = hybrid_retrieve(
+            query_text,
+            embed,
+            self.query,
+            self.lexical_index,
+            top_k=top_k,
+            document_filter=document_filter,
+            rrf_k=self.rrf_k
+        )
 
+        if cacheable and self.retrieval_cache is not None:
+            self.retrieval_cache.put(query_text, top_k, document_filter, version, results)
+        return results
 
-def save_store():
-    faiss.write_index(index, FAISS_INDEX_PATH)
-    with open(DOC_STORE_PATH, "wb") as f:
-        pickle.dump(docs, f)
+    def _collection_changed(self):
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.bump()
 
+    def get_document_chunks(self, document_id: str) -> List[Dict]:
+        """Get all chunks of a document (text and metadata) in chunk order"""
+        try:
+            with self._lock:
+                segments = list(self._segments)
+            chunks = []
+            for segment in segments:
+                rows = np.flatnonzero((segment.document_ids == document_id) & ~segment.deleted)
+                chunks.extend(
+                    {"id": r["id"], "text": r["text"], "metadata": r["metadata"]}
+                    for r in segment.records(rows)
+                )
+            chunks.sort(key=lambda c: c["metadata"].get("chunk_index", 0))
+            return chunks
+        except Exception as e:
+            logger.error(f"Error getting chunks for document {document_id}: {e}")
+            return []
 
-def add_document(text: str, embedding: np.ndarray):
-    global index, docs
-    
-    embedding = embedding.astype("float32")  # FAISS requires float32
+    def get_document_info(self) -> List[Dict]:
+        """Get metadata about all documents in the store"""
+        if self.catalog is not None:
+            try:
+                return self.catalog.list()
+            except Exception as e:
+                logger.error(f"Error reading document catalog: {e}")
+        return self._scan_document_info()
 
-    index.add(np.array([embedding]))  
-    docs.append(text)
+    def backfill_catalog(self):
+        """Populate the catalog from the store once (e.g. after the catalog database was removed)"""
+        if self.catalog.count() > 0 or self.get_collection_size() == 0:
+            return
+        documents = self._scan_document_info()
+        self.catalog.upsert_many(documents)
+        logger.info(f"Backfilled document catalog with {len(documents)} documents")
 
-    save_store()
+    def backfill_lexical_index(self):
+        """Index existing chunk text once (for stores created before the lexical index existed)"""
+        if self.lexical_index.count() > 0 or self.get_collection_size() == 0:
+            return
+        documents = self._scan_document_info()
+        for doc in documents:
+            chunks = self.get_document_chunks(doc["document_id"])
+            self.lexical_index.add_chunks(doc["document_id"], [(c["id"], c["text"], c["metadata"]) for c in chunks])
+        logger.info(f"Backfilled lexical index with {len(documents)} documents")
 
+    def _scan_document_info(self) -> List[Dict]:
+        """Group chunk records by document (reads every record)"""
+        try:
+            with self._lock:
+                segments = list(self._segments)
+            doc_info = {}
+            for segment in segments:
+                for record in segment.records(np.flatnonzero(~segment.deleted)):
+                    metadata = record["metadata"]
+                    doc_id_key = metadata.get("document_id", "unknown")
+                    if doc_id_key not in doc_info:
+                        doc_info[doc_id_key] = {
+                            "document_id": doc_id_key,
+                            "document_name": metadata.get("document_name", "Unknown"),
+                            "upload_time": metadata.get("upload_time", ""),
+                            "chunk_count": 0
+                        }
+                    doc_info[doc_id_key]["chunk_count"] += 1
+            return list(doc_info.values())
+        except Exception as e:
+            logger.error(f"Error getting document info: {e}")
+            return []
 
-def get_all_docs():
-    return docs
\ No newline at end of file
+    def get_collection_size(self) -> int:
+        """Get total number of chunks in the store"""
+        with self._lock:
+            return sum(s.live_rows for s in self._segments)
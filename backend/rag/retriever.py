@@ -1,24 +1,17 @@
-import numpy as np
-from backend.rag.rag_store import index, docs
-from models.embedding_manager import embed_text
-
-from backend.models.ollama_handler import OllamaHandler
-
-# Use the SAME embedder used by chat
-ollama = OllamaHandler()
+"""Plain-text retrieval over the configured vector store"""
+from typing import Callable, List, Optional
 
-def query_rag(query: str, top_k: int = 3):
-    if len(docs) == 0:
-        return []
-
-    # Use ollama embedder
-    query_emb = ollama.embedder.encode(query).astype("float32")
+import numpy as np
 
-    D, I = index.search(np.array([query_emb]), top_k)
 
-    results = []
-    for idx in I[0]:
-        if idx < len(docs):
-            results.append(docs[idx])
+def query_rag(store, embed: Callable[[str], Optional[np.ndarray]], query: str, top_k: int = 3) -> List[str]:
+    """
+    Return the texts of the chunks most similar to `query`.
 
-    return results
\ No newline at end of file
+    Args:
+        store: ChromaStore or RagStore
+        embed: Text -> float32 vector (e.g. EmbeddingManager.embed)
+        query: Query text
+        top_k: Number of chunks to return
+    """
+    return [result["text"] for result in store.query_text(query, embed, top_k=top_k)]
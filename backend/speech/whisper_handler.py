@@ -3,50 +3,69 @@ import logging
 import os
 from typing import Optional, Tuple
 
-logger = logging.getLogger(__name__)
-
-_whisper_model = None
+from backend.config import Config
+from backend.models.model_registry import get_registry
 
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-    logger.warning("OpenAI Whisper not available")
+logger = logging.getLogger(__name__)
 
-try:
-    from faster_whisper import WhisperModel
-    FASTER_WHISPER_AVAILABLE = True
-except ImportError:
-    FASTER_WHISPER_AVAILABLE = False
+# Approximate int8/fp32 footprints, used when the model doesn't expose its parameters
+_WHISPER_SIZES_MB = {"tiny": 75, "base": 150, "small": 500, "medium": 1500, "large": 3000}
 
 
-def load_whisper_model(model_size: str = "base"):
-    """Load Whisper model (prefer faster-whisper if available)"""
-    global _whisper_model
-    
-    if _whisper_model is not None:
-        return _whisper_model
-    
-    if FASTER_WHISPER_AVAILABLE:
+def _load_whisper(model_size: str):
+    """Load Whisper model (prefer faster-whisper if available). Imports happen here, not at module load."""
+    try:
+        from faster_whisper import WhisperModel
         try:
-            _whisper_model = WhisperModel(model_size, device="cpu", compute_type="int8")
+            model = WhisperModel(model_size, device="cpu", compute_type="int8")
             logger.info(f"Loaded faster-whisper model: {model_size}")
-            return _whisper_model
+            return model
         except Exception as e:
             logger.warning(f"Failed to load faster-whisper: {e}, trying openai-whisper")
+    except ImportError:
+        pass
     
-    if WHISPER_AVAILABLE:
-        try:
-            _whisper_model = whisper.load_model(model_size)
-            logger.info(f"Loaded OpenAI Whisper model: {model_size}")
-            return _whisper_model
-        except Exception as e:
-            logger.error(f"Failed to load OpenAI Whisper: {e}")
+    try:
+        import whisper
+    except ImportError:
+        logger.warning("OpenAI Whisper not available")
+        return None
+    
+    try:
+        model = whisper.load_model(model_size)
+        logger.info(f"Loaded OpenAI Whisper model: {model_size}")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load OpenAI Whisper: {e}")
     
     return None
 
 
+def _whisper_bytes(model, model_size: str) -> int:
+    if hasattr(model, "parameters"):  # openai-whisper is a torch module
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    return _WHISPER_SIZES_MB.get(model_size.split(".")[0], 500) * 1024 * 1024
+
+
+def _register_whisper(model_size: str) -> str:
+    name = f"whisper_{model_size}"
+    # Whisper is only needed for voice input, so it is not warmed at startup
+    # and is unloaded again once voice input goes quiet
+    get_registry().register(
+        name,
+        lambda: _load_whisper(model_size),
+        warm=False,
+        size_bytes=lambda model: _whisper_bytes(model, model_size),
+        idle_timeout=Config.WHISPER_IDLE_TIMEOUT
+    )
+    return name
+
+
+def load_whisper_model(model_size: str = "base"):
+    """Get the Whisper model, loading it on first use"""
+    return get_registry().get(_register_whisper(model_size))
+
+
 def transcribe_audio(
     audio_path: str,
     model_size: str = "base",
@@ -66,34 +85,36 @@ def transcribe_audio(
     if not os.path.exists(audio_path):
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
-    model = load_whisper_model(model_size)
-    if model is None:
-        raise Exception("Whisper model not available")
-    
-    try:
-        # Use faster-whisper if available
-        if FASTER_WHISPER_AVAILABLE and isinstance(model, WhisperModel):
-            segments, info = model.transcribe(
-                audio_path,
-                language=language,
-                beam_size=5
-            )
-            text = " ".join([segment.text for segment in segments])
-            detected_lang = info.language
-            return text.strip(), detected_lang
+    # Hold the model for the whole transcription (faster-whisper decodes lazily
+    # while the segments are iterated) so it can't be unloaded mid-request
+    with get_registry().use(_register_whisper(model_size)) as model:
+        if model is None:
+            raise Exception("Whisper model not available")
         
-        # Fallback to OpenAI Whisper
-        if WHISPER_AVAILABLE:
-            result = model.transcribe(audio_path, language=language)
-            text = result["text"]
-            detected_lang = result.get("language", "unknown")
-            return text.strip(), detected_lang
+        try:
+            # Use faster-whisper if available
+            if type(model).__module__.startswith("faster_whisper"):
+                segments, info = model.transcribe(
+                    audio_path,
+                    language=language,
+                    beam_size=5
+                )
+                text = " ".join([segment.text for segment in segments])
+                detected_lang = info.language
+                return text.strip(), detected_lang
+            
+            # Fallback to OpenAI Whisper
+            if type(model).__module__.startswith("whisper"):
+                result = model.transcribe(audio_path, language=language)
+                text = result["text"]
+                detected_lang = result.get("language", "unknown")
+                return text.strip(), detected_lang
+            
+            raise Exception("No Whisper implementation available")
         
-        raise Exception("No Whisper implementation available")
-    
-    except Exception as e:
-        logger.error(f"Transcription failed: {e}")
-        raise
+        except Exception as e:
+            logger.error(f"Transcription failed: {e}")
+            raise
 
 
 def detect_language(audio_path: str, model_size: str = "base") -> str:
@@ -0,0 +1 @@
+"""Maintenance and benchmarking tools"""
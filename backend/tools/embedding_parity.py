@@ -0,0 +1,109 @@
+"""
+Compare a candidate embedding backend against the fp32 reference.
+
+    python -m backend.tools.embedding_parity --candidate int8 [--texts file.txt]
+
+Only backends that run the same model as fp32 can be compared (an Ollama
+embedding model is a different model, usually with a different dimension).
+Reports per-text cosine agreement between the two backends' vectors,
+whether nearest-neighbour rankings survive, and the encode speed and model
+size of each. Exits non-zero if the mean cosine falls below --min-cosine.
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from backend.config import Config
+from backend.models.embedding_backends import (
+    create_backend,
+    QuantizedSentenceTransformerBackend,
+    SentenceTransformerBackend,
+)
+from backend.models.embedding_manager import EMBEDDING_MODEL_NAME, EmbeddingManager
+
+# Backends that load EMBEDDING_MODEL_NAME itself, so their vectors are comparable with fp32
+LOCAL_BACKENDS = {SentenceTransformerBackend.name, QuantizedSentenceTransformerBackend.name}
+
+SAMPLE_TEXTS = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The mitochondria is the powerhouse of the cell.",
+    "Newton's second law states that force equals mass times acceleration.",
+    "World War II ended in 1945 after the surrender of Germany and Japan.",
+    "A prime number has exactly two distinct positive divisors.",
+    "The French Revolution began in 1789 with the storming of the Bastille.",
+    "Water boils at 100 degrees Celsius at sea level.",
+    "Supply and demand determine the market price of goods.",
+    "DNA carries the genetic instructions of living organisms.",
+    "The derivative of sin(x) is cos(x).",
+    "Shakespeare wrote Hamlet, Macbeth and Romeo and Juliet.",
+    "Plate tectonics explains earthquakes and the formation of mountains.",
+    "An algorithm's time complexity describes how its runtime grows with input size.",
+    "The Pythagorean theorem relates the sides of a right triangle.",
+    "Enzymes speed up chemical reactions without being consumed.",
+    "Democracy is a system of government in which citizens elect representatives.",
+]
+
+
+def _time_encode(backend, texts: List[str], repeats: int):
+    backend.encode(texts[:2])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        vectors = backend.encode(texts)
+    return vectors, (time.perf_counter() - start) / repeats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidate", default="int8", choices=sorted(LOCAL_BACKENDS), help="backend to check against fp32")
+    parser.add_argument("--texts", help="file with one text per line (default: built-in sample)")
+    parser.add_argument("--threads", type=int, default=Config.EMBEDDING_THREADS, help="torch threads (0 = default)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed encode passes per backend")
+    parser.add_argument("--top-k", type=int, default=5, help="neighbours compared for ranking agreement")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="fail below this mean cosine")
+    args = parser.parse_args(argv)
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    reference = create_backend("fp32", EMBEDDING_MODEL_NAME, num_threads=args.threads).load()
+    candidate = create_backend(args.candidate, EMBEDDING_MODEL_NAME, num_threads=args.threads).load()
+
+    ref_vectors, ref_time = _time_encode(reference, texts, args.repeats)
+    cand_vectors, cand_time = _time_encode(candidate, texts, args.repeats)
+
+    # Row-wise cosine between the two backends' vectors for the same text
+    cosines = np.diag(EmbeddingManager.similarity_matrix(ref_vectors, cand_vectors))
+
+    # Nearest-neighbour agreement: overlap of each text's top-k neighbours
+    k = min(args.top_k, len(texts) - 1)
+    overlap = 0.0
+    if k > 0:
+        ref_sim = EmbeddingManager.similarity_matrix(ref_vectors, ref_vectors)
+        cand_sim = EmbeddingManager.similarity_matrix(cand_vectors, cand_vectors)
+        np.fill_diagonal(ref_sim, -np.inf)
+        np.fill_diagonal(cand_sim, -np.inf)
+        ref_top = np.argsort(-ref_sim, axis=1)[:, :k]
+        cand_top = np.argsort(-cand_sim, axis=1)[:, :k]
+        overlap = float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]))
+
+    print(f"texts: {len(texts)}")
+    print(f"cosine fp32 vs {args.candidate}: mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+    print(f"top-{k} neighbour overlap: {overlap:.1%}")
+    print(f"encode time: fp32 {ref_time * 1000:.1f}ms, {args.candidate} {cand_time * 1000:.1f}ms "
+          f"({ref_time / cand_time:.2f}x)")
+    print(f"model size: fp32 {reference.size_bytes() / 2**20:.1f}MB, "
+          f"{args.candidate} {candidate.size_bytes() / 2**20:.1f}MB")
+
+    if cosines.mean() < args.min_cosine:
+        print(f"FAIL: mean cosine below {args.min_cosine}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Pick HNSW settings for the stored corpus by measuring them.
+
+    python -m backend.tools.hnsw_autotune [--queries 200] [--k 5] [--m 8,16,32]
+
+Loads the chunk embeddings from the Chroma collection (or --synthetic
+vectors) and uses a sample of them as queries, with exact top-k computed by
+brute force. For every M / construction_ef pair it builds an index with
+hnswlib (the library behind Chroma's HNSW segment). Then, for each search_ef,
+it reports recall@k, p50/p99 single-query latency, build time and index
+size. The fastest setting that reaches --target-recall is printed as
+HNSW_* environment settings.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from backend.config import Config
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_collection_vectors(persist_directory: str, collection_name: str, limit: int) -> np.ndarray:
+    """Read up to `limit` stored embeddings from a Chroma collection"""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=persist_directory, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(name=collection_name)
+    batch = collection.get(include=["embeddings"], limit=limit or None)
+    return np.asarray(batch["embeddings"], dtype=np.float32)
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int, space: str, block: int = 256) -> np.ndarray:
+    """Brute-force nearest neighbours (row indexes), in the same metric hnswlib uses"""
+    if space == "cosine":
+        data = data / np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    sq_norms = np.einsum("ij,ij->i", data, data)
+    out = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), block):
+        q = queries[start:start + block]
+        dots = q @ data.T
+        # l2: |x|^2 - 2 q.x (|q|^2 is constant per row); ip/cosine: -q.x
+        distances = sq_norms - 2.0 * dots if space == "l2" else -dots
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+        out[start:start + block] = np.take_along_axis(top, order, axis=1)
+    return out
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chroma-path", default=Config.CHROMA_PATH)
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--limit", type=int, default=0, help="max stored vectors to load (0 = all)")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the collection")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of --synthetic vectors")
+    parser.add_argument("--space", default=Config.HNSW_SPACE, choices=["l2", "ip", "cosine"])
+    parser.add_argument("--queries", type=int, default=200, help="stored chunks sampled as queries")
+    parser.add_argument("--k", type=int, default=Config.TOP_K_RESULTS, help="recall@k")
+    parser.add_argument("--m", type=_int_list, default=[8, 16, 32], help="comma-separated M values")
+    parser.add_argument("--construction-ef", type=_int_list, default=[100, 200], help="comma-separated construction_ef values")
+    parser.add_argument("--search-ef", type=_int_list, default=[10, 20, 40, 80, 160], help="comma-separated search_ef values")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        import hnswlib
+    except ImportError:
+        print("hnswlib is not installed (it comes with chromadb as chroma-hnswlib)")
+        return 2
+
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        data = rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    else:
+        data = load_collection_vectors(args.chroma_path, args.collection, args.limit)
+    if len(data) <= args.k:
+        print(f"Need more than {args.k} vectors, found {len(data)}")
+        return 1
+
+    queries = data[rng.choice(len(data), size=min(args.queries, len(data)), replace=False)]
+    start = time.perf_counter()
+    truth = exact_top_k(data, queries, args.k, args.space)
+    brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"vectors: {len(data)} x {data.shape[1]}, queries: {len(queries)}, space: {args.space}, k: {args.k}")
+    print(f"brute force: {brute_ms:.3f}ms/query (batched)")
+    print(f"{'M':>4} {'c_ef':>5} {'s_ef':>5} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'size MB':>8}")
+
+    rows = []
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            index = hnswlib.Index(space=args.space, dim=data.shape[1])
+            index.init_index(max_elements=len(data), M=m, ef_construction=construction_ef, random_seed=args.seed)
+            start = time.perf_counter()
+            index.add_items(data, np.arange(len(data)))
+            build_s = time.perf_counter() - start
+
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "index.bin")
+                index.save_index(path)
+                size_mb = os.path.getsize(path) / 2**20
+
+            index.set_num_threads(1)
+            for search_ef in args.search_ef:
+                index.set_ef(max(search_ef, args.k))
+                found = np.empty((len(queries), args.k), dtype=np.int64)
+                latencies = np.empty(len(queries))
+                for i, q in enumerate(queries):
+                    t = time.perf_counter()
+                    labels, _ = index.knn_query(q, k=args.k)
+                    latencies[i] = (time.perf_counter() - t) * 1000
+                    found[i] = labels[0]
+                recall = recall_at_k(found, truth)
+                p50, p99 = np.percentile(latencies, [50, 99])
+                rows.append((m, construction_ef, search_ef, recall, p50, p99, build_s, size_mb))
+                print(f"{m:>4} {construction_ef:>5} {search_ef:>5} {recall:>7.3f} {p50:>8.3f} {p99:>8.3f} "
+                      f"{build_s:>8.2f} {size_mb:>8.1f}")
+
+    good = [r for r in rows if r[3] >= args.target_recall]
+    if not good:
+        best = max(rows, key=lambda r: r[3])
+        print(f"No setting reached recall {args.target_recall}; best was {best[3]:.3f} "
+              f"(M={best[0]}, construction_ef={best[1]}, search_ef={best[2]})")
+        return 1
+
+    best = min(good, key=lambda r: (r[5], r[7]))
+    print(f"\nFastest p99 at recall >= {args.target_recall}:")
+    print(f"HNSW_SPACE={args.space} HNSW_M={best[0]} HNSW_CONSTRUCTION_EF={best[1]} HNSW_SEARCH_EF={best[2]}")
+    if (best[0], best[1]) != (Config.HNSW_M, Config.HNSW_CONSTRUCTION_EF) or args.space != Config.HNSW_SPACE:
+        print("(build settings differ from the current ones: start once with HNSW_REBUILD_ON_START=true)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Measure what compressed vector codes cost in recall.
+
+    python -m backend.tools.quantization_recall [--store dravis_data/vector_store | --synthetic N]
+
+Loads float32 vectors from a segment store (VECTOR_STORE_BACKEND=segments),
+the Chroma collection or --synthetic data, samples some as queries and
+computes exact top-k. For int8 and pq codes, and for each re-rank factor,
+it reports recall@k after full-precision re-ranking, the bytes per vector
+(and compression ratio) and query latency. Exits non-zero if the chosen
+--quantization / --rerank-factor pair misses --min-recall.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from backend.config import Config
+from backend.rag.quantization import Int8Codes, PQCodes, pq_subspaces_for
+from backend.rag.rag_store import MANIFEST_FILE
+from backend.tools.hnsw_autotune import exact_top_k, load_collection_vectors, recall_at_k
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_store_vectors(store_path: str) -> np.ndarray:
+    """Read every committed segment's float32 vectors (deleted rows included)"""
+    with open(os.path.join(store_path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    parts = [
+        np.fromfile(os.path.join(store_path, f"{entry['name']}.f32"), dtype=np.float32).reshape(entry["rows"], manifest["dim"])
+        for entry in manifest["segments"]
+    ]
+    return np.concatenate(parts) if parts else np.empty((0, manifest["dim"] or 0), dtype=np.float32)
+
+
+def evaluate(codes, data: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, rerank_factor: int):
+    shortlist = min(len(data), k * rerank_factor)
+    found = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        approx = codes.distances(q)
+        rows = np.argpartition(approx, shortlist - 1)[:shortlist]
+        diff = data[rows] - q
+        exact = np.einsum("ij,ij->i", diff, diff)
+        found[i] = rows[np.argsort(exact)[:k]]
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return recall_at_k(found, truth), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--store", help="segment store directory (default: the Chroma collection)")
+    source.add_argument("--synthetic", type=int, default=0, help="use N random vectors")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of --synthetic vectors")
+    parser.add_argument("--chroma-path", default=Config.CHROMA_PATH)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=Config.TOP_K_RESULTS)
+    parser.add_argument("--rerank-factors", type=_int_list, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--pq-subspaces", type=int, default=Config.VECTOR_STORE_PQ_SUBSPACES)
+    parser.add_argument("--quantization", default=Config.VECTOR_STORE_QUANTIZATION, choices=["int8", "pq", "none"],
+                        help="setting checked against --min-recall")
+    parser.add_argument("--rerank-factor", type=int, default=Config.VECTOR_STORE_RERANK_FACTOR)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        data = rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    elif args.store:
+        data = load_store_vectors(args.store)
+    else:
+        data = load_collection_vectors(args.chroma_path, "documents", 0)
+    if len(data) <= args.k:
+        print(f"Need more than {args.k} vectors, found {len(data)}")
+        return 1
+
+    queries = data[rng.choice(len(data), size=min(args.queries, len(data)), replace=False)]
+    truth = exact_top_k(data, queries, args.k, "l2")
+    float_bytes = data.shape[1] * 4
+    print(f"vectors: {len(data)} x {data.shape[1]} ({float_bytes} bytes each as float32), queries: {len(queries)}, k: {args.k}")
+    print(f"{'codes':>6} {'bytes':>6} {'ratio':>6} {'rerank':>7} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+
+    checked = None
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        int8 = Int8Codes.build(os.path.join(tmp, "int8"), data)
+        int8_build = time.perf_counter() - start
+        start = time.perf_counter()
+        pq = PQCodes.build(os.path.join(tmp, "pq"), data, pq_subspaces_for(data.shape[1], args.pq_subspaces), seed=args.seed)
+        pq_build = time.perf_counter() - start
+
+        for codes in (int8, pq):
+            per_vector = codes.codes.shape[1] + (8 if codes.kind == "int8" else 0)
+            for factor in args.rerank_factors:
+                recall, p50, p99 = evaluate(codes, data, queries, truth, args.k, factor)
+                print(f"{codes.kind:>6} {per_vector:>6} {float_bytes / per_vector:>5.1f}x {factor:>7} "
+                      f"{recall:>7.3f} {p50:>8.3f} {p99:>8.3f}")
+            if codes.kind == args.quantization:
+                checked = evaluate(codes, data, queries, truth, args.k, args.rerank_factor)[0]
+        print(f"build time: int8 {int8_build:.2f}s, pq {pq_build:.2f}s (pq codebooks {pq.centroids.nbytes / 1024:.0f}KB)")
+
+    if checked is not None:
+        print(f"{args.quantization} with rerank factor {args.rerank_factor}: recall@{args.k} {checked:.3f}")
+        if checked < args.min_recall:
+            print(f"FAIL: recall below {args.min_recall}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""In-memory progress tracking for long-running operations (e.g. uploads)"""
+import threading
+import time
+from typing import Dict, Optional
+
+
+class ProgressTracker:
+    """
+    Keyed progress records that clients can poll. Finished records are
+    dropped after `retention_seconds` so the table stays small.
+    """
+
+    def __init__(self, retention_seconds: float = 3600):
+        self.retention_seconds = retention_seconds
+        self._records: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: Optional[str], stage: Optional[str] = None, done: Optional[int] = None, total: Optional[int] = None):
+        if not key:
+            return
+        with self._lock:
+            if key not in self._records:
+                self._prune()
+            record = self._records.setdefault(key, {"stage": "started", "done": 0, "total": 0})
+            if stage is not None:
+                record["stage"] = stage
+            if done is not None:
+                record["done"] = done
+            if total is not None:
+                record["total"] = total
+            record["percent"] = round(100.0 * record["done"] / record["total"], 1) if record["total"] else 0.0
+            record["updated_at"] = time.time()
+
+    def finish(self, key: Optional[str], error: Optional[str] = None):
+        if not key:
+            return
+        self.update(key, stage="failed" if error else "done")
+        with self._lock:
+            record = self._records[key]
+            record["finished"] = True
+            if error:
+                record["error"] = error
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._records.get(key)
+            return dict(record) if record is not None else None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for key in [k for k, r in self._records.items() if r.get("finished") and r["updated_at"] < cutoff]:
+            del self._records[key]
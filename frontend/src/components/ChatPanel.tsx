@@ -1,5 +1,5 @@
 import React, { useEffect, useRef, useState } from "react";
-import { sendMessage, exportChatHistory } from "../utils/api";
+import { streamMessage, exportChatHistory } from "../utils/api";
 
 interface Message {
   sender: "user" | "ai";
@@ -44,16 +44,25 @@ export default function ChatPanel({ setStatus }: { setStatus: (s: string) => voi
     setLoading(true);
     
     try {
-      const res = await sendMessage(currentInput, useDocuments, mode);
-      setStatus("online");
-      
       const aiMessage: Message = {
         sender: "ai",
-        text: res.response || "No response",
+        text: "",
         timestamp: new Date().toISOString()
       };
-      
       setMessages(prev => [...prev, aiMessage]);
+
+      // Replace the last (streaming) AI message with updated text
+      const updateLast = (text: string) =>
+        setMessages(prev => [...prev.slice(0, -1), { ...prev[prev.length - 1], text }]);
+
+      let streamed = "";
+      const res = await streamMessage(currentInput, useDocuments, mode, (token) => {
+        streamed += token;
+        updateLast(streamed);
+      });
+      setStatus("online");
+
+      updateLast(res.response || streamed || "No response");
     } catch (err) {
       setStatus("offline");
       const errorMessage: Message = {
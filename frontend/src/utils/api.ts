@@ -38,6 +38,62 @@ export async function sendMessage(
   }
 }
 
+export async function streamMessage(
+  message: string,
+  useDocuments: boolean = false,
+  mode: string = "normal",
+  onToken: (token: string) => void = () => {}
+): Promise<ChatResponse> {
+  try {
+    const r = await fetch(`${BASE}/api/chat/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        message,
+        use_documents: useDocuments,
+        mode
+      })
+    });
+    if (!r.ok || !r.body) {
+      return { response: "Network error", error: `HTTP ${r.status}` };
+    }
+
+    const reader = r.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let final: ChatResponse = { response: "", error: "stream_closed" };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // SSE events are separated by a blank line
+      let sep = buffer.indexOf("\n\n");
+      while (sep !== -1) {
+        const line = buffer.slice(0, sep).trim();
+        buffer = buffer.slice(sep + 2);
+        if (line.startsWith("data:")) {
+          const event = JSON.parse(line.slice(5));
+          if (event.token) {
+            onToken(event.token);
+          }
+          if (event.done) {
+            final = event;
+          }
+        }
+        sep = buffer.indexOf("\n\n");
+      }
+    }
+    return final;
+  } catch (e) {
+    return {
+      response: "Network error",
+      error: String(e)
+    };
+  }
+}
+
 export async function uploadFile(file: File) {
   const fd = new FormData();
   fd.append("file", file);
@@ -0,0 +1,47 @@
+"""Numbers in free-text answers must match exactly, whatever the wording similarity"""
+import numpy as np
+import pytest
+
+from backend.quiz.grader import AnswerGrader, normalize_answer
+
+
+class _SameVectorEmbedder:
+    """Worst case for the similarity check: every answer embeds identically"""
+
+    def embed_matrix(self, texts):
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+@pytest.fixture
+def grader():
+    return AnswerGrader(_SameVectorEmbedder())
+
+
+def _grade(grader, answer, reference):
+    return grader.grade([{"type": "short_answer", "answer": answer, "correct_answer": reference}])[0]
+
+
+def test_normalize_keeps_sign_and_decimal_point():
+    assert normalize_answer("-273.15 °C.") == "-273.15 c"
+    assert normalize_answer("The years 1939-1945") == "years 1939 1945"
+
+
+@pytest.mark.parametrize("answer, reference", [
+    ("273.15", "-273.15"),
+    ("10^23", "6.02 x 10^22"),
+    ("6.02 x 10^22", "6.02 x 10^23"),
+    ("ended in 1944", "ended in 1945"),
+])
+def test_different_numbers_are_wrong(grader, answer, reference):
+    result = _grade(grader, answer, reference)
+    assert result["correct"] is False
+    assert result["method"] == "numeric"
+
+
+@pytest.mark.parametrize("answer, reference", [
+    ("-273.15", "-273.15 degrees"),
+    ("3.50", "3.5"),
+    ("it ended in 1945", "The war ended in 1945."),
+])
+def test_same_numbers_can_match(grader, answer, reference):
+    assert _grade(grader, answer, reference)["correct"] is True
@@ -0,0 +1,50 @@
+"""Compressed vector codes: crash-safe code files and the tier searched beside Chroma"""
+import os
+
+import numpy as np
+import pytest
+
+from backend.rag.quantization import CompressedTier, open_codes
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((300, 16)).astype(np.float32)
+
+
+@pytest.mark.parametrize("mode, suffix", [("int8", ".q8"), ("int8", ".q8n"), ("pq", ".pq"), ("pq", ".pqc.npy")])
+def test_truncated_codes_are_rebuilt(tmp_path, vectors, mode, suffix):
+    prefix = str(tmp_path / "seg-000001")
+    expected = open_codes(mode, prefix, vectors, pq_min_rows=100).distances(vectors[0])
+
+    with open(prefix + suffix, "r+b") as f:
+        f.truncate(os.path.getsize(prefix + suffix) // 2)
+
+    codes = open_codes(mode, prefix, vectors, pq_min_rows=100)
+    assert codes.kind == mode
+    np.testing.assert_allclose(codes.distances(vectors[0]), expected, rtol=1e-5)
+
+
+def test_interrupted_build_leaves_no_final_file(tmp_path, vectors):
+    prefix = str(tmp_path / "seg-000001")
+    # A crash mid-build only ever leaves the temporary file behind
+    with open(prefix + ".q8.tmp", "wb") as f:
+        f.write(b"\0" * 10)
+
+    codes = open_codes("int8", prefix, vectors)
+    assert codes.codes.shape == vectors.shape
+
+
+@pytest.mark.parametrize("mode, space", [("int8", "l2"), ("pq", "cosine")])
+def test_compressed_tier_matches_exact_search(tmp_path, vectors, mode, space):
+    tier = CompressedTier(str(tmp_path), mode, space=space, rerank_factor=8, pq_min_rows=100)
+    ids = [f"doc_chunk_{i}" for i in range(len(vectors))]
+    tier.add("doc", ids, vectors)
+    query = vectors[7] + 0.01
+
+    hits = CompressedTier(str(tmp_path), mode, space=space, pq_min_rows=100).search(query, 5)
+    assert hits[0][1:] == ("doc", "doc_chunk_7")
+    assert [d for d, _, _ in hits] == sorted(d for d, _, _ in hits)
+
+    tier.delete("doc")
+    assert tier.search(query, 5) == [] and os.listdir(tmp_path) == []
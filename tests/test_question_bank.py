@@ -0,0 +1,55 @@
+"""The background worker must cover every page, since quizzes draw only from retrieved pages"""
+import pytest
+
+from backend.quiz.question_bank import QuestionBank, QuestionBankWorker
+
+
+class _Store:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_document_chunks(self, document_id):
+        return [{"text": f"text of page {p}", "metadata": {"page": p}} for p in self.pages]
+
+
+class _Generator:
+    """Returns distinct questions about whatever excerpt it is given"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_bank_questions(self, context, num_questions, difficulty="medium", quiz_type="simple"):
+        questions = []
+        for _ in range(num_questions):
+            self.calls += 1
+            words = " ".join(f"w{self.calls}x{i}" for i in range(6))
+            questions.append({"type": "mcq", "question": f"{words}?"})
+        return questions
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return QuestionBank(str(tmp_path / "bank.db"))
+
+
+def _fill(bank, pages):
+    worker = QuestionBankWorker(bank, _Generator(), _Store(pages), llm=None, target=5, batch_size=5)
+    worker.enqueue("doc")
+    while worker.pending():
+        worker._fill_once()
+    return worker
+
+
+def test_fills_every_page_and_draws_from_a_later_one(bank):
+    _fill(bank, list(range(1, 21)))
+
+    assert bank.page_counts("doc", "medium", "simple") == {p: 5 for p in range(1, 21)}
+    questions = bank.draw([("doc", 17), ("doc", 18)], "medium", "simple", 8)
+    assert questions is not None and len(questions) == 8
+    assert bank.draw([("doc", 21)], "medium", "simple", 5) is None
+
+
+def test_pageless_chunks_can_be_drawn(bank):
+    _fill(bank, [None])
+
+    assert bank.draw([("doc", None)], "medium", "advanced", 5) is not None
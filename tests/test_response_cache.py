@@ -0,0 +1,34 @@
+"""Semantic matches in the response cache must not cross different questions"""
+import numpy as np
+import pytest
+
+from backend.db.response_cache import ResponseCache
+
+
+class _SameVectorEmbedder:
+    """Worst case for the similarity check: every prompt embeds identically"""
+
+    def embed(self, text):
+        return np.ones(8, dtype=np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache.db"), embedding_manager=_SameVectorEmbedder(), similarity_threshold=0.92)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("what is 2+3", "what is 2+4"),
+    ("what is 2+3", "what is 2*3"),
+    ("define mitosis", "define meiosis"),
+    ("when did world war 2 end", "why did world war 2 end"),
+    ("who discovered penicillin", "when was penicillin discovered"),
+])
+def test_different_questions_miss(cache, stored, asked):
+    cache.put(stored, "normal", "en", "answer")
+    assert cache.get(asked, "normal", "en") is None
+
+
+def test_rephrasing_hits(cache):
+    cache.put("what is photosynthesis", "normal", "en", "answer")
+    assert cache.get("Explain photosynthesis?", "normal", "en") == "answer"